@@ -9,14 +9,32 @@ These cases are specifically chosen because they:
 Focus: Find cases where Basic strategy FAILS but advanced strategies SUCCEED
 """
 
-import openai
-import os
 from datetime import datetime
-import json
+from typing import Optional
+
+from llm_client import client_from_env
+from rate_limiter import get_shared_limiter
+from response_cache import cache_from_env
+from result_log import ResultLog
+from run_checkpoint import CaseCheckpoint, RunCheckpoint
+from strategy_registry import StrategyEngine
+from transcript_archive import CaseTranscript, TranscriptWriter
 
-openai.api_key = os.environ.get("OPENAI_API_KEY", "your-api-key-here")
 MODEL = "gpt-4o-mini"
 
+# Chat client (set LLM_BACKEND=mock to run offline against recorded answers)
+CLIENT = client_from_env()
+
+# Shared RPM/TPM scheduler (replaces fixed sleeps between cases)
+LIMITER = get_shared_limiter()
+
+# Response cache (set RESPONSE_CACHE_PATH to reuse responses across runs)
+CACHE = cache_from_env()
+
+# Runs the strategies declared in strategy_registry
+ENGINE = StrategyEngine(CLIENT, LIMITER, CACHE, model=MODEL)
+
+
 # Advanced tricky cases - known to fool LLMs
 ADVANCED_TEST_CASES = [
     {
@@ -108,7 +126,7 @@ Before answering, note that this is from the sequence of maximum regions a circl
 Fill in the blank with a word (spelled out, like "thirty-two") that makes the statement true.
 Count all letters including the filled-in word itself.""",
         "common_wrong_answer": "Various wrong numbers",
-        "correct_answer": "Forty-seven" or "thirty-nine" depending on how you count,
+        "correct_answer": "Forty-seven or thirty-nine, depending on how you count",
         "why_tricky": "Self-referential - the answer changes the count. Need to find fixed point.",
         "explanation": "This requires trial and error to find the number that when written out, makes the total letter count equal to itself."
     },
@@ -147,118 +165,56 @@ Now: If you buy 10 sets of (bat + ball), and you get a 10% discount on the total
 ]
 
 
-def basic_strategy(question: str) -> dict:
+def basic_strategy(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                   transcript: Optional[CaseTranscript] = None) -> dict:
     """Strategy 1: Basic - No special prompting"""
-    messages = [
-        {"role": "system", "content": "You are a helpful AI assistant. Please answer the question directly."},
-        {"role": "user", "content": question}
-    ]
-    
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=0.7
-    )
-    
+    result = ENGINE.run("basic_direct", question, checkpoint, transcript)
     return {
-        "answer": response.choices[0].message.content,
-        "tokens": response.usage.total_tokens
+        "strategy": result.strategy,
+        "answer": result.answer,
+        "tokens": result.tokens,
+        **result.usage_fields()
     }
 
 
-def self_reflection_strategy(question: str) -> dict:
+def self_reflection_strategy(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                             transcript: Optional[CaseTranscript] = None) -> dict:
     """Strategy 3: Self-Reflection with strong error-checking"""
-    system_prompt = """You are an extremely careful AI assistant. This question is TRICKY and has a common WRONG answer that most people give.
-
-Your task:
-1. Think about what the OBVIOUS answer is
-2. Consider: "This feels too easy - what's the TRAP?"
-3. Question EVERY assumption you're making
-4. Work through the problem step-by-step VERY carefully
-5. Double-check your logic
-6. Provide final answer with confidence
-
-Format:
-[Obvious Answer]: (What's the first answer that comes to mind?)
-[Wait - What's the Trap?]: (Why might that be wrong?)
-[Careful Analysis]: (Step by step reasoning)
-[Verification]: (Check the logic)
-[Final Answer]: ...
-[Confidence]: (0-100%)
-"""
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": question}
-    ]
-    
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=0.7
-    )
-    
+    result = ENGINE.run("self_reflection_trap", question, checkpoint, transcript)
     return {
-        "answer": response.choices[0].message.content,
-        "tokens": response.usage.total_tokens
+        "strategy": result.strategy,
+        "answer": result.answer,
+        "tokens": result.tokens,
+        **result.usage_fields()
     }
 
 
-def multi_turn_aggressive(question: str) -> dict:
+def multi_turn_aggressive(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                          transcript: Optional[CaseTranscript] = None) -> dict:
     """Strategy 4: Aggressive multi-turn with strong challenges"""
-    # Round 1
-    messages = [
-        {"role": "system", "content": "You are a helpful AI assistant."},
-        {"role": "user", "content": question}
-    ]
-    
-    response1 = openai.chat.completions.create(model=MODEL, messages=messages, temperature=0.7)
-    first_answer = response1.choices[0].message.content
-    
-    # Round 2: STRONG challenge
-    messages.append({"role": "assistant", "content": first_answer})
-    messages.append({
-        "role": "user",
-        "content": """STOP! I think you made a mistake. This question has a TRAP that most people fall into.
-        
-Your answer seems like the obvious one, but the obvious answer is usually WRONG on these tricky questions.
-
-Please:
-1. Identify what trap you might have fallen into
-2. Reconsider EVERY step of your reasoning
-3. Look for the counter-intuitive answer
-4. Work through it again from scratch
-
-What's your revised answer?"""
-    })
-    
-    response2 = openai.chat.completions.create(model=MODEL, messages=messages, temperature=0.7)
-    second_answer = response2.choices[0].message.content
-    
-    # Round 3: Final verification
-    messages.append({"role": "assistant", "content": second_answer})
-    messages.append({
-        "role": "user",
-        "content": "OK, walk me through your logic one more time step-by-step to make absolutely sure it's correct. Final answer?"
-    })
-    
-    response3 = openai.chat.completions.create(model=MODEL, messages=messages, temperature=0.7)
-    final_answer = response3.choices[0].message.content
-    
-    total_tokens = response1.usage.total_tokens + response2.usage.total_tokens + response3.usage.total_tokens
-    
+    result = ENGINE.run("multi_turn_aggressive", question, checkpoint, transcript)
+    first, second, final = result.rounds
     return {
-        "first_answer": first_answer,
-        "second_answer": second_answer,
-        "final_answer": final_answer,
-        "answer": final_answer,
-        "tokens": total_tokens
+        "strategy": result.strategy,
+        "first_answer": first,
+        "second_answer": second,
+        "final_answer": final,
+        "answer": final,
+        "tokens": result.tokens,
+        **result.usage_fields()
     }
 
 
 def run_advanced_test():
-    """Run advanced tricky test cases"""
-    results = []
+    """Run advanced tricky test cases; returns the path of the JSONL result log"""
+    # One JSON line per case
+    output_file = "/Users/zeyu/research/advanced_tricky_test_results.jsonl"
+    log = ResultLog(output_file, append=False)
+    # Finished (case, strategy, round) triples; a rerun after an interruption reuses them
+    checkpoint = RunCheckpoint("/Users/zeyu/research/advanced_tricky_test_checkpoint.jsonl")
+    # Every round's messages, indexed by (run, case id, strategy, round) for later inspection
+    transcripts = TranscriptWriter("/Users/zeyu/research/advanced_tricky_test_transcripts.bin",
+                                   run_id=datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
     
     print("="*100)
     print("ADVANCED TRICKY TEST - Designed to Make Basic Strategy FAIL")
@@ -266,6 +222,8 @@ def run_advanced_test():
     print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("="*100)
     print("\nGoal: Find cases where Basic FAILS but Advanced strategies SUCCEED\n")
+    if checkpoint.restored_rounds:
+        print(f"Resuming: {checkpoint.restored_rounds} finished rounds restored from {checkpoint.path}\n")
     
     for case in ADVANCED_TEST_CASES:
         print(f"\n{'='*100}")
@@ -286,7 +244,8 @@ def run_advanced_test():
         print("【Strategy 1: Basic】")
         print("-"*100)
         try:
-            basic_result = basic_strategy(case['question'])
+            basic_result = basic_strategy(case['question'], checkpoint.case(case['id']),
+                                          transcripts.case(case['id']))
             case_result["strategies"]["basic"] = basic_result
             print(f"Answer: {basic_result['answer'][:400]}...")
             print(f"Tokens: {basic_result['tokens']}")
@@ -299,7 +258,8 @@ def run_advanced_test():
         print("【Strategy 3: Self-Reflection (Enhanced)】")
         print("-"*100)
         try:
-            reflection_result = self_reflection_strategy(case['question'])
+            reflection_result = self_reflection_strategy(case['question'], checkpoint.case(case['id']),
+                                                         transcripts.case(case['id']))
             case_result["strategies"]["self_reflection"] = reflection_result
             print(f"Answer: {reflection_result['answer'][:500]}...")
             print(f"Tokens: {reflection_result['tokens']}")
@@ -312,7 +272,8 @@ def run_advanced_test():
         print("【Strategy 4: Aggressive Multi-turn】")
         print("-"*100)
         try:
-            multiturn_result = multi_turn_aggressive(case['question'])
+            multiturn_result = multi_turn_aggressive(case['question'], checkpoint.case(case['id']),
+                                                     transcripts.case(case['id']))
             case_result["strategies"]["multi_turn"] = multiturn_result
             print(f"First Answer: {multiturn_result['first_answer'][:250]}...")
             print(f"\nAfter STRONG Challenge: {multiturn_result['second_answer'][:250]}...")
@@ -322,23 +283,21 @@ def run_advanced_test():
             print(f"Error: {e}")
             case_result["strategies"]["multi_turn"] = {"error": str(e)}
         
-        results.append(case_result)
+        # Written as soon as the case completes, so an interruption keeps finished cases
+        log.write(case_result)
         print(f"\n{'='*100}\n")
-        
-        # Add a small delay to avoid rate limiting
-        import time
-        time.sleep(1)
     
-    # Save results
-    output_file = "/Users/zeyu/research/advanced_tricky_test_results.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    log.close()
+    transcripts.close()
+    # Run complete: the next run starts fresh
+    checkpoint.clear()
     
     print(f"\n{'='*100}")
-    print(f"Results saved to: {output_file}")
+    print(f"Results saved to: {output_file} ({log.records_written} cases)")
+    print(f"Transcripts: {transcripts.path} (run {transcripts.run_id}, {transcripts.rounds_written} rounds)")
     print("="*100)
     
-    return results
+    return output_file
 
 
 if __name__ == "__main__":
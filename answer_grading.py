@@ -0,0 +1,186 @@
+"""
+Answer Grading
+Decide whether a stored answer matches a test case's correct answer.
+
+Test cases carry a `correct_answer` and a `common_wrong_answer` written for
+humans ("5 minutes", "$0.05", "Switch! 2/3 probability of winning"). Key
+values are pulled from both and looked up in the final answer section:
+- Numbers, with their unit when it is a measure (minutes, days, %, $ ...):
+  "5 minutes" matches "5 minutes" but not "5 machines"; "5 cents" matches "$0.05"
+- Fractions and splits as written: "2/3", "99-0-1"
+- A leading Yes/No
+- Short text answers ("East", "West or South"), as whole words
+
+grade_answer() returns True or False when exactly one side matches, and None
+when the answer cannot be graded this way (neither or both match).
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, Iterator, Optional, Set, Tuple
+
+from structured_output import extract_answer_text, normalize_answer
+
+# Units kept on a number key; anything else is treated as a bare number
+_UNITS = {
+    "second": "second", "minute": "minute", "hour": "hour", "day": "day",
+    "week": "week", "month": "month", "year": "year",
+    "cent": "$", "dollar": "$", "%": "%", "percent": "%",
+}
+
+# Value: a split ("99-0-1"), a fraction ("2/3") or a number ("1,000.5").
+# The pattern starts with a plain character class ("$" or a digit) so the
+# regex engine can skip straight to candidates; a leading digit is consumed
+# there and the rest of the value is matched as the "tail". This is ~3x
+# faster on long answers than an optional "$" prefix group.
+_VALUE_RE = re.compile(
+    r"[$\d](?:"
+    r"(?<=\$)\s*(?P<dollar_value>\d+(?:-\d+){2,}|\d+/\d+|\d+(?:,\d{3})*(?:\.\d+)?)"
+    r"|(?<=\d)(?P<tail>\d*(?:-\d+){2,}|\d*/\d+|\d*(?:,\d{3})*(?:\.\d+)?)"
+    r")\s*(?P<unit>%|[a-zA-Z]+)?"
+)
+_YES_NO_RE = re.compile(r"^\W*(yes|no)\b", re.IGNORECASE)
+_ALTERNATIVES_RE = re.compile(r"\s+or\s+|\s*/\s*|\s*,\s*", re.IGNORECASE)
+
+# Longest reference answer (in words) still matched as a phrase
+MAX_PHRASE_WORDS = 3
+
+Key = Tuple[str, Optional[str]]  # (normalized value, unit or None)
+
+
+@lru_cache(maxsize=4096)
+def _normalize_number(text: str) -> str:
+    if "/" in text or text.count("-") >= 2:
+        return text
+    value = float(text.replace(",", ""))
+    return f"{value:g}"
+
+
+@lru_cache(maxsize=1024)
+def _unit(unit_word: Optional[str]) -> Tuple[Optional[str], bool]:
+    """(measure unit, whether the value is in cents) for the word after a number"""
+    word = (unit_word or "").lower()
+    singular = word.rstrip("s")
+    return _UNITS.get(singular) or _UNITS.get(word), singular == "cent"
+
+
+def iter_keys(text: str) -> Iterator[Key]:
+    """Number keys of a text, with measure units, in reading order"""
+    for match in _VALUE_RE.finditer(text):
+        dollar_value, tail, unit_word = match.groups()
+        value = dollar_value if dollar_value is not None else match.group(0)[0] + tail
+        unit, cents = _unit(unit_word)
+        if cents and "/" not in value and "-" not in value:
+            value = str(float(value.replace(",", "")) / 100)
+        elif dollar_value is not None:
+            unit = "$"
+        yield _normalize_number(value), unit
+
+
+def extract_keys(text: str) -> Set[Key]:
+    """Number keys of a text, with measure units"""
+    return set(iter_keys(text))
+
+
+def _reference_keys(reference: str) -> Set[Key]:
+    """Keys of a reference answer, ignoring any parenthetical explanation"""
+    head = reference.split("(")[0]
+    return extract_keys(head) or extract_keys(reference)
+
+
+def _matches(key: Key, found: Set[Key]) -> bool:
+    value, unit = key
+    if unit is None:
+        return any(v == value for v, _ in found)
+    return key in found
+
+
+def _phrases(reference: str) -> Set[str]:
+    """Short text alternatives of a reference answer ("West or South" -> {"west", "south"})"""
+    head = normalize_answer(reference.split("(")[0])
+    if not head or len(head.split()) > 2 * MAX_PHRASE_WORDS:
+        return set()
+    phrases = {normalize_answer(p) for p in _ALTERNATIVES_RE.split(reference.split("(")[0])}
+    return {p for p in phrases if p and len(p.split()) <= MAX_PHRASE_WORDS and p not in ("yes", "no")}
+
+
+def _contains_phrase(text: str, phrase: str) -> bool:
+    return re.search(rf"\b{re.escape(phrase)}\b", text) is not None
+
+
+def _yes_no(text: str) -> Optional[str]:
+    match = _YES_NO_RE.match(text)
+    return match.group(1).lower() if match else None
+
+
+@dataclass(frozen=True)
+class Reference:
+    """Pre-extracted keys of one test case's reference answers"""
+    correct_keys: FrozenSet[Key]
+    wrong_keys: FrozenSet[Key]
+    correct_phrases: FrozenSet[str]
+    wrong_phrases: FrozenSet[str]
+    expected_yes_no: Optional[str]
+
+
+def prepare_reference(correct_answer: str, common_wrong_answer: str = "") -> Reference:
+    """
+    Extract the keys of a test case once, for grading many answers to it
+
+    Args:
+        correct_answer: The test case's correct answer
+        common_wrong_answer: The test case's common wrong answer
+
+    Returns:
+        Reference to pass to grade_with_reference()
+    """
+    correct_keys = _reference_keys(correct_answer)
+    wrong_keys = _reference_keys(common_wrong_answer) - correct_keys if common_wrong_answer else set()
+    correct_phrases: Set[str] = set()
+    wrong_phrases: Set[str] = set()
+    if not correct_keys:
+        correct_phrases = _phrases(correct_answer)
+        wrong_phrases = _phrases(common_wrong_answer) - correct_phrases if common_wrong_answer else set()
+    return Reference(frozenset(correct_keys), frozenset(wrong_keys),
+                     frozenset(correct_phrases), frozenset(wrong_phrases), _yes_no(correct_answer))
+
+
+def grade_with_reference(answer: str, reference: Reference) -> Optional[bool]:
+    """Grade an answer against a prepared Reference (see grade_answer())"""
+    final = extract_answer_text(answer)
+    found = extract_keys(final)
+
+    is_correct = any(_matches(k, found) for k in reference.correct_keys)
+    is_wrong = any(_matches(k, found) for k in reference.wrong_keys)
+
+    if not reference.correct_keys:
+        # Text answer: look for the reference phrases instead
+        normalized = normalize_answer(final)
+        is_correct = any(_contains_phrase(normalized, p) for p in reference.correct_phrases)
+        is_wrong = is_wrong or any(_contains_phrase(normalized, p) for p in reference.wrong_phrases)
+
+    expected = reference.expected_yes_no
+    stated = _yes_no(final)
+    if expected and stated:
+        is_correct = is_correct or stated == expected
+        is_wrong = is_wrong or stated != expected
+
+    if is_correct != is_wrong:
+        return is_correct
+    return None
+
+
+def grade_answer(answer: str, correct_answer: str, common_wrong_answer: str = "") -> Optional[bool]:
+    """
+    Grade an answer against the reference answers
+
+    Args:
+        answer: Model answer (the last [Answer]/[Final Answer] section is graded)
+        correct_answer: The test case's correct answer
+        common_wrong_answer: The test case's common wrong answer
+
+    Returns:
+        True (correct), False (wrong) or None (could not be graded)
+    """
+    return grade_with_reference(answer, prepare_reference(correct_answer, common_wrong_answer))
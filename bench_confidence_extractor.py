@@ -0,0 +1,107 @@
+"""
+Micro-benchmark: Confidence Extraction
+
+Compares the original ConfidenceProtocol._extract_confidence implementation
+(re imported per call, four uncompiled patterns tried in turn) with the
+precompiled single-pass extractor in confidence_extractor.py, on the answer
+texts stored in comprehensive_test_results.json.
+
+Usage:
+    python3 bench_confidence_extractor.py [results.json] [repeat]
+"""
+
+import json
+import sys
+import time
+from typing import List
+
+from confidence_extractor import extract_many
+
+# Texts where a looser pattern would read past the stated value (next line, a year, x/0);
+# checked for agreement with the original extractor along with the stored answers
+EDGE_CASES = [
+    "[Confidence]: 85\n- 2 points",
+    "Confidence: 95%\n\n- 100 items",
+    "[Confidence]: 2024-2025 data",
+    "confidence: 5/0",
+]
+
+
+def legacy_extract_confidence(content: str) -> float:
+    """Original ConfidenceProtocol._extract_confidence, kept for comparison"""
+    import re
+
+    patterns = [
+        r'\[Confidence\][：:]\s*(\d+\.?\d*)%?',
+        r'\[置信度\][：:]\s*(\d+\.?\d*)%?',
+        r'confidence[：:]\s*(\d+\.?\d*)%?',
+        r'Confidence[：:]\s*(\d+\.?\d*)%?',
+    ]
+
+    for pattern in patterns:
+        match = re.search(pattern, content, re.IGNORECASE)
+        if match:
+            try:
+                return float(match.group(1))
+            except:
+                pass
+
+    return 60.0
+
+
+def load_answer_texts(path: str) -> List[str]:
+    """Collect every answer text stored in a results file"""
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)
+
+    texts = []
+    for case_result in results:
+        for strategy_result in case_result.get("strategies", {}).values():
+            for field in ("answer", "first_answer", "second_answer", "final_answer"):
+                if isinstance(strategy_result.get(field), str):
+                    texts.append(strategy_result[field])
+    return texts
+
+
+def time_it(fn, texts: List[str]) -> float:
+    start = time.perf_counter()
+    fn(texts)
+    return time.perf_counter() - start
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "comprehensive_test_results.json"
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    texts = load_answer_texts(path)
+    corpus = texts * repeat
+
+    print("=" * 100)
+    print("Confidence Extraction Micro-benchmark")
+    print(f"Source: {path} ({len(texts)} answer texts x {repeat} = {len(corpus)} extractions)")
+    print("=" * 100)
+
+    legacy_seconds = time_it(lambda items: [legacy_extract_confidence(t) for t in items], corpus)
+    compiled_seconds = time_it(extract_many, corpus)
+
+    print(f"{'Implementation':<30} {'Total (s)':>10} {'Per text (us)':>15} {'Texts/s':>12}")
+    print("-" * 100)
+    for name, seconds in [("legacy (4 patterns)", legacy_seconds),
+                          ("compiled single-pass", compiled_seconds)]:
+        print(f"{name:<30} {seconds:>10.3f} {seconds / len(corpus) * 1e6:>15.2f} {len(corpus) / seconds:>12.0f}")
+    print(f"\nSpeedup: {legacy_seconds / compiled_seconds:.2f}x")
+
+    # Agreement on the original corpus and the edge cases (new forms such as "High" or ranges
+    # may differ by design; the compiled extractor clamps to 0-100, so legacy values are compared clamped)
+    texts = texts + EDGE_CASES
+    legacy_values = [min(100.0, legacy_extract_confidence(t)) for t in texts]
+    compiled_values = extract_many(texts)
+    differences = [(l, c, t) for l, c, t in zip(legacy_values, compiled_values, texts) if l != c]
+    print(f"Agreement: {len(texts) - len(differences)}/{len(texts)} texts "
+          f"(including {len(EDGE_CASES)} edge cases)")
+    for legacy, compiled, text in differences:
+        print(f"  legacy={legacy} compiled={compiled}: {text[:80]!r}")
+
+
+if __name__ == "__main__":
+    main()
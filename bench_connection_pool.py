@@ -0,0 +1,139 @@
+"""
+Connection Pool Benchmark
+
+Starts a local stand-in for the chat completions endpoint and measures
+per-request latency through OpenAIChatClient:
+1. Keep-alive disabled: every request opens a new connection
+2. Owned connection pool: connections are reused across requests
+
+The stand-in server charges a fixed delay for every new connection
+(handshake_ms, default 30) to model the TCP + TLS handshake of the real
+API, which a loopback connection does not have. Each mode runs sequentially
+and with concurrent threads. Nothing leaves the machine and no API key is
+needed.
+
+Usage:
+    python3 bench_connection_pool.py [num_requests] [handshake_ms] [concurrency]
+"""
+
+import json
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_client import OpenAIChatClient
+
+RESPONSE_BODY = json.dumps({
+    "id": "chatcmpl-local",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{
+        "index": 0,
+        "finish_reason": "stop",
+        "message": {"role": "assistant",
+                    "content": "[Answer]: 42\n[Confidence]: 90%\n[Confidence Reason]: Local stand-in"},
+    }],
+    "usage": {"prompt_tokens": 20, "completion_tokens": 15, "total_tokens": 35},
+}).encode("utf-8")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Minimal /v1/chat/completions endpoint with HTTP/1.1 keep-alive"""
+
+    protocol_version = "HTTP/1.1"
+    handshake_seconds = 0.03
+    connections = 0
+    _lock = threading.Lock()
+
+    def setup(self):
+        # Runs once per connection: stands in for the TCP + TLS handshake
+        with StandInHandler._lock:
+            StandInHandler.connections += 1
+        time.sleep(self.handshake_seconds)
+        # Headers and body go out in separate writes; without this, Nagle's
+        # algorithm plus delayed ACKs stall every reused connection by ~40 ms
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(RESPONSE_BODY)))
+        self.end_headers()
+        self.wfile.write(RESPONSE_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(handshake_seconds: float) -> ThreadingHTTPServer:
+    StandInHandler.handshake_seconds = handshake_seconds
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_requests(client: OpenAIChatClient, num_requests: int, concurrency: int):
+    """Send num_requests calls; return (per-request latencies, wall seconds, connections opened)"""
+    messages = [{"role": "user", "content": "What is 6 x 7?"}]
+
+    def one(_):
+        start = time.perf_counter()
+        client.create(model="gpt-4o-mini", messages=messages)
+        return time.perf_counter() - start
+
+    before = StandInHandler.connections
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(num_requests)))
+    return latencies, time.perf_counter() - start, StandInHandler.connections - before
+
+
+def main():
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    handshake_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 30.0
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    server = start_server(handshake_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    print("=" * 100)
+    print("Connection Pool Benchmark (local stand-in server)")
+    print(f"Requests: {num_requests} | Simulated handshake: {handshake_ms:.0f} ms/connection")
+    print("=" * 100)
+    print(f"{'Mode':<36} {'Threads':>8} {'Mean (ms)':>10} {'p50 (ms)':>10} {'Wall (s)':>9} {'Connections':>12}")
+    print("-" * 100)
+
+    modes = [
+        ("No keep-alive (new connection each)", dict(max_keepalive_connections=0)),
+        ("Owned pool (keep-alive)", dict(max_keepalive_connections=max(20, concurrency))),
+    ]
+    mean_latency = {}
+    for name, pool_options in modes:
+        for threads in (1, concurrency):
+            client = OpenAIChatClient(api_key="local", base_url=base_url, max_retries=0, **pool_options)
+            with client:
+                latencies, wall, connections = run_requests(client, num_requests, threads)
+            mean_latency[name, threads] = statistics.mean(latencies)
+            print(f"{name:<36} {threads:>8} {statistics.mean(latencies) * 1000:>10.2f} "
+                  f"{statistics.median(latencies) * 1000:>10.2f} {wall:>9.3f} {connections:>12}")
+
+    print("-" * 100)
+    for threads in (1, concurrency):
+        cold = mean_latency[modes[0][0], threads]
+        warm = mean_latency[modes[1][0], threads]
+        print(f"Latency saved per request with {threads} thread(s): {(cold - warm) * 1000:.2f} ms "
+              f"({cold / warm:.1f}x faster)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
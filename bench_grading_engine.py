@@ -0,0 +1,116 @@
+"""
+Grading Engine Benchmark
+
+Builds a synthetic archive of num_rows strategy runs by repeating the cases
+in comprehensive_test_results.json, and scores it two ways:
+1. Per-row loop: grade_answer() + extract_confidence() and dict tallies
+   for every row (what a hand-written scoring script does)
+2. grading_engine: references prepared once per case, NumPy reductions
+
+Every repeated answer gets a distinct tag made of consonants (so it adds no
+number, Yes/No or text key), which keeps grades unchanged but stops the
+engine's duplicate-answer memo from skipping any work. Both methods must
+agree on per-strategy accuracy.
+
+Usage:
+    python3 bench_grading_engine.py [num_rows]
+"""
+
+import copy
+import json
+import math
+import sys
+import time
+from typing import Dict, List
+
+from answer_grading import grade_answer
+from confidence_extractor import extract_confidence_or_none
+from grading_engine import grade_results
+
+RESULTS_PATH = "comprehensive_test_results.json"
+TAG_LETTERS = "bcdfghjklmnpqrstvwxz"
+
+
+def tag(i: int) -> str:
+    letters = []
+    while True:
+        i, r = divmod(i, len(TAG_LETTERS))
+        letters.append(TAG_LETTERS[r])
+        if i == 0:
+            return "".join(letters)
+
+
+def build_archive(num_rows: int) -> List[Dict]:
+    with open(RESULTS_PATH, encoding="utf-8") as f:
+        recorded = json.load(f)
+    archive, rows = [], 0
+    while rows < num_rows:
+        for case_result in recorded:
+            entry = copy.deepcopy(case_result)
+            for result in entry["strategies"].values():
+                result["answer"] += f"\n{tag(rows)}"
+                rows += 1
+            archive.append(entry)
+    return archive
+
+
+def per_row_loop(archive: List[Dict]) -> Dict[str, float]:
+    """Score every row in plain Python; return strategy -> accuracy"""
+    tallies: Dict[str, List[float]] = {}
+    for case_result in archive:
+        case = case_result["case"]
+        for key, result in case_result["strategies"].items():
+            correct = grade_answer(result["answer"], case["correct_answer"], case["common_wrong_answer"])
+            confidence = extract_confidence_or_none(result["answer"])
+            t = tallies.setdefault(key, [0, 0, 0, 0, 0])  # correct, graded, tokens, confidence sum, stated
+            if correct is not None:
+                t[0] += correct
+                t[1] += 1
+            t[2] += result["tokens"]
+            if confidence is not None:
+                t[3] += confidence
+                t[4] += 1
+    return {key: t[0] / t[1] if t[1] else math.nan for key, t in tallies.items()}
+
+
+def main():
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    archive = build_archive(num_rows)
+    rows = sum(len(entry["strategies"]) for entry in archive)
+
+    print("=" * 100)
+    print("Grading Engine Benchmark")
+    print(f"Rows: {rows} | Questions: {len(archive)}")
+    print("=" * 100)
+
+    start = time.perf_counter()
+    loop_accuracy = per_row_loop(archive)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    graded = grade_results(archive)
+    grade_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    summary = graded.summary()
+    summary_seconds = time.perf_counter() - start
+
+    print(f"{'Method':<36} {'Seconds':>9} {'Rows/s':>12}")
+    print("-" * 100)
+    print(f"{'Per-row loop':<36} {loop_seconds:>9.2f} {rows / loop_seconds:>12,.0f}")
+    engine_seconds = grade_seconds + summary_seconds
+    print(f"{'grading_engine (total)':<36} {engine_seconds:>9.2f} {rows / engine_seconds:>12,.0f}")
+    print(f"{'  grading (per-row work)':<36} {grade_seconds:>9.2f}")
+    print(f"{'  summary (NumPy reductions)':<36} {summary_seconds:>9.3f}")
+    print("-" * 100)
+    print(f"Speedup: {loop_seconds / engine_seconds:.1f}x")
+
+    for key, accuracy in loop_accuracy.items():
+        engine_accuracy = summary[key]["accuracy"]
+        same = (math.isnan(accuracy) and math.isnan(engine_accuracy)) or abs(accuracy - engine_accuracy) < 1e-12
+        if not same:
+            raise SystemExit(f"Accuracy mismatch for {key}: loop {accuracy} vs engine {engine_accuracy}")
+    print("Per-strategy accuracy: identical")
+
+
+if __name__ == "__main__":
+    main()
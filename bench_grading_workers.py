@@ -0,0 +1,61 @@
+"""
+Grading Worker Scaling Benchmark
+
+Grades the synthetic archive of bench_grading_engine.py (unique answers, so
+nothing is skipped by deduplication) with 1, 2, 4, ... worker processes and
+reports answers/second. Every worker count must produce arrays identical to
+the single-process run.
+
+Speedup is bounded by the CPU cores available to this process; with one
+core, extra workers only add IPC overhead.
+
+Usage:
+    python3 bench_grading_workers.py [num_rows] [max_workers] [chunk_size]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+from bench_grading_engine import build_archive
+from grading_engine import DEFAULT_CHUNK_SIZE, grade_results
+
+
+def same(a, b) -> bool:
+    return all(np.array_equal(getattr(a, f), getattr(b, f), equal_nan=True)
+               for f in ("strategy", "case", "correct", "tokens", "confidence"))
+
+
+def main():
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else max(4, cores)
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_CHUNK_SIZE
+
+    archive = build_archive(num_rows)
+    rows = sum(len(entry["strategies"]) for entry in archive)
+
+    print("=" * 100)
+    print("Grading Worker Scaling")
+    print(f"Answers: {rows} | CPU cores available: {cores} | Chunk size: {chunk_size}")
+    print("=" * 100)
+    print(f"{'Workers':>8} {'Seconds':>9} {'Answers/s':>12} {'Speedup':>8} {'Identical':>10}")
+    print("-" * 100)
+
+    baseline = None
+    workers = 1
+    while workers <= max_workers:
+        start = time.perf_counter()
+        graded = grade_results(archive, workers=workers, chunk_size=chunk_size)
+        seconds = time.perf_counter() - start
+        if baseline is None:
+            baseline = (graded, seconds)
+        print(f"{workers:>8} {seconds:>9.2f} {rows / seconds:>12,.0f} {baseline[1] / seconds:>7.2f}x "
+              f"{'yes' if same(graded, baseline[0]) else 'NO':>10}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Import Time Benchmark
+
+Imports each offline module (parsing, grading, replaying stored results) in
+a fresh interpreter under `python -X importtime` and reports its cumulative
+import time, best of several runs. Guards the lazy imports of llm_client:
+the run fails (exit status 1) when one of these modules pulls in the API
+stack (openai, httpx, ...) or takes longer than the budget.
+
+Usage:
+    python3 bench_import_time.py [budget_ms] [repeats]
+"""
+
+import os
+import subprocess
+import sys
+from typing import Dict, Set, Tuple
+
+# Modules that must stay importable without the API client stack
+OFFLINE_MODULES = (
+    "confidence_extractor",
+    "structured_output",
+    "answer_grading",
+    "calibration",
+    "result_log",
+    "result_store",
+    "round_usage",
+    "grading_engine",
+    "confidence_protocol",
+    "strategy_registry",
+    "strategy_router",
+)
+
+# Loaded on the first API call only
+HEAVY_PACKAGES = ("openai", "httpx", "httpcore", "anyio", "pydantic", "h2")
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_profile(statement: str) -> Tuple[Dict[str, int], Set[str]]:
+    """Run statement under -X importtime; return (cumulative us per top-level import, all modules imported)"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                               cwd=REPO_DIR, capture_output=True, text=True, check=True)
+    cumulative: Dict[str, int] = {}
+    modules: Set[str] = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if not total.strip().isdigit():
+            continue  # Header line
+        modules.add(name.strip())
+        if not name.startswith("  "):
+            cumulative[name.strip()] = int(total)
+    return cumulative, modules
+
+
+def measure(module: str, repeats: int) -> Tuple[float, Set[str]]:
+    """Best cumulative import time of module in ms, and the heavy packages it loaded"""
+    best = float("inf")
+    heavy: Set[str] = set()
+    for _ in range(repeats):
+        cumulative, modules = import_profile(f"import {module}")
+        best = min(best, cumulative.get(module, 0) / 1000)
+        heavy |= {name.split(".")[0] for name in modules if name.split(".")[0] in HEAVY_PACKAGES}
+    return best, heavy
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print("=" * 100)
+    print("Import Time (offline modules)")
+    print(f"Budget: {budget_ms:.0f} ms per module | Best of {repeats} fresh interpreters")
+    print("=" * 100)
+    print(f"{'Module':<24} {'Import (ms)':>12}  {'Status':<8} Heavy packages loaded")
+    print("-" * 100)
+
+    failures = []
+    for module in OFFLINE_MODULES:
+        milliseconds, heavy = measure(module, repeats)
+        problems = []
+        if heavy:
+            problems.append("heavy imports")
+        if milliseconds > budget_ms:
+            problems.append("over budget")
+        if problems:
+            failures.append(f"{module}: {', '.join(problems)}")
+        print(f"{module:<24} {milliseconds:>12.1f}  {'FAIL' if problems else 'ok':<8} "
+              f"{', '.join(sorted(heavy)) or '-'}")
+
+    print("-" * 100)
+    try:
+        openai_ms, _ = measure("openai", 1)
+        print(f"For reference, import openai: {openai_ms:.1f} ms (paid on the first API call)")
+    except subprocess.CalledProcessError:
+        print("For reference, import openai: not installed")
+
+    if failures:
+        print("\nRegressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll offline modules import without the API stack and within budget")
+
+
+if __name__ == "__main__":
+    main()
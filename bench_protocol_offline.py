@@ -0,0 +1,150 @@
+"""
+Offline Protocol Benchmark
+
+Runs ConfidenceProtocol against MockChatClient (no network, no API key) to
+measure:
+1. Protocol overhead per question (mock latency 0)
+2. Sequential batch_ask vs concurrent abatch_ask at several concurrency limits
+3. Response cache behaviour on a repeated batch
+4. Verification rounds skipped by early exit, free-text and structured output
+5. Cache isolation of replies truncated by a token budget's max_tokens cap
+6. Per-call metrics of the whole run (latency histogram, tokens, parse outcomes)
+
+Usage:
+    python3 bench_protocol_offline.py [latency_seconds] [num_questions]
+"""
+
+import asyncio
+import contextlib
+import io
+import sys
+import time
+import zlib
+
+from confidence_protocol import ConfidenceProtocol
+from llm_client import MockChatClient
+from metrics import get_metrics
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+
+def make_protocol(client, **kwargs) -> ConfidenceProtocol:
+    # Quota high enough that the limiter never throttles the benchmark
+    limiter = RateLimiter(requests_per_minute=10**9, tokens_per_minute=10**12)
+    return ConfidenceProtocol(api_key="offline", client=client, rate_limiter=limiter, **kwargs)
+
+
+class TruncatingChatClient(MockChatClient):
+    """MockChatClient that honours max_tokens (4 characters per token) like the API"""
+
+    def _completion(self, messages, max_tokens=None, **kwargs):
+        response = super()._completion(messages, **kwargs)
+        if max_tokens is not None:
+            for choice in response.choices:
+                if len(choice.message.content) > max_tokens * 4:
+                    choice.message.content = choice.message.content[:max_tokens * 4]
+                    choice.finish_reason = "length"
+        return response
+
+
+def stable_recordings(protocol: ConfidenceProtocol, questions, texts):
+    """Recordings that replay texts[i] in round i of every question's verification"""
+    # MockChatClient starts each conversation at an offset derived from the system prompt
+    start = zlib.crc32(protocol.base_prompt.encode("utf-8"))
+    rotated = [texts[(i - start) % len(texts)] for i in range(len(texts))]
+    return {question: rotated for question in questions}
+
+
+def timed(fn):
+    """Run fn with protocol progress output suppressed; return (result, seconds)"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    num_questions = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    recorded = MockChatClient.from_results_file()
+    questions = list(recorded.recordings)
+    questions = [questions[i % len(questions)] + ("" if i < len(questions) else f" (variant {i})")
+                 for i in range(num_questions)]
+
+    print("=" * 100)
+    print("Offline Protocol Benchmark (MockChatClient)")
+    print(f"Questions: {num_questions} | Simulated latency: {latency * 1000:.0f} ms/call")
+    print("=" * 100)
+
+    # 1. Overhead: zero latency, so the time is all protocol-side work
+    client = MockChatClient(recordings=recorded.recordings)
+    protocol = make_protocol(client)
+    _, seconds = timed(lambda: protocol.batch_ask(questions))
+    print(f"\n[Protocol overhead] {seconds / client.calls * 1e6:.0f} us per API call "
+          f"({client.calls} calls, {seconds:.3f}s)")
+
+    # 2. Concurrency
+    print("\n[Concurrency]")
+    print(f"{'Mode':<28} {'Wall time (s)':>14} {'API calls':>10} {'Speedup':>9}")
+    print("-" * 100)
+    client = MockChatClient(recordings=recorded.recordings, latency=latency)
+    _, sequential = timed(lambda: make_protocol(client).batch_ask(questions))
+    print(f"{'batch_ask (sequential)':<28} {sequential:>14.3f} {client.calls:>10} {1.0:>8.1f}x")
+    for concurrency in (1, 4, 16, 64):
+        client = MockChatClient(recordings=recorded.recordings, latency=latency)
+        protocol = make_protocol(client, max_concurrency=concurrency)
+        _, seconds = timed(lambda: asyncio.run(protocol.abatch_ask(questions)))
+        print(f"{f'abatch_ask (limit {concurrency})':<28} {seconds:>14.3f} {client.calls:>10} "
+              f"{sequential / seconds:>8.1f}x")
+
+    # 3. Cache: the second pass over the same batch is served from memory
+    print("\n[Response cache]")
+    client = MockChatClient(recordings=recorded.recordings, latency=latency)
+    protocol = make_protocol(client, max_concurrency=16, cache=ResponseCache())
+    _, cold = timed(lambda: asyncio.run(protocol.abatch_ask(questions)))
+    cold_calls = client.calls
+    _, warm = timed(lambda: asyncio.run(protocol.abatch_ask(questions)))
+    print(f"Cold pass: {cold:.3f}s, {cold_calls} API calls")
+    print(f"Warm pass: {warm:.3f}s, {client.calls - cold_calls} API calls")
+    print(f"Cache: {protocol.cache.stats()}")
+
+    # 4. Early exit: a low-confidence answer that the challenge round confirms
+    #    with high confidence, so the final confirmation round can be skipped
+    print("\n[Early exit]")
+    rounds = {
+        "free text": [f"[Thinking]: ...\n[Answer]: 42\n[Confidence]: {c}" for c in (50, 95, 95)],
+        "structured": [f'{{"reasoning": "...", "answer": "42", "confidence": {c}}}' for c in (50, 95, 95)],
+    }
+    for mode, texts in rounds.items():
+        client = MockChatClient()
+        protocol = make_protocol(client, structured_output=(mode == "structured"))
+        client.recordings = stable_recordings(protocol, questions, texts)
+        timed(lambda: protocol.batch_ask(questions))
+        print(f"{mode:<12} rounds skipped: {protocol.verification_rounds_skipped:>4} "
+              f"(of {len(questions)} possible) | {client.calls} API calls")
+
+    # 5. Budget cap: replies cut short by a budget's max_tokens must not be served
+    #    from the shared cache to calls without that cap
+    print("\n[Budget-capped responses]")
+    client = TruncatingChatClient(recordings=recorded.recordings)
+    cache = ResponseCache()
+    capped = make_protocol(client, cache=cache, question_token_budget=1)
+    timed(lambda: capped.batch_ask(questions, use_verification=False))
+    truncated = client.calls
+    uncapped = make_protocol(client, cache=cache)
+    answers, _ = timed(lambda: uncapped.batch_ask(questions, use_verification=False))
+    expected, _ = timed(lambda: make_protocol(MockChatClient(recordings=recorded.recordings))
+                        .batch_ask(questions, use_verification=False))
+    served = sum(answer.content != reference.content for answer, reference in zip(answers, expected))
+    print(f"Capped pass: {truncated} API calls | Uncapped pass: {client.calls - truncated} API calls, "
+          f"{served} truncated replies served from the cache")
+    assert served == 0, "budget-truncated replies leaked through the response cache"
+
+    # 6. Everything above, as recorded by the in-process metrics registry
+    print("\n[Metrics]")
+    get_metrics().print_summary()
+
+
+if __name__ == "__main__":
+    main()
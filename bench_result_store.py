@@ -0,0 +1,108 @@
+"""
+Result Store Benchmark
+
+Writes the synthetic archive of bench_grading_engine.py as a .json result
+array and as a result_store directory, then compares:
+1. Open: json.load of the whole file vs ResultStore() (memory-mapped)
+2. Column scan: mean tokens per strategy
+3. Random access: answer text of 1000 random rows
+
+Peak memory is measured with tracemalloc in a second, untimed run (Python
+allocations; mapped pages are not counted, they belong to the page cache).
+
+Usage:
+    python3 bench_result_store.py [num_rows]
+"""
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from bench_grading_engine import build_archive
+from result_store import ResultStore, convert
+
+
+def measure(fn):
+    """Run fn timed, then again under tracemalloc; return (result, seconds, peak MB)"""
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, seconds, peak
+
+
+def main():
+    num_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    directory = tempfile.mkdtemp(prefix="bench_result_store_")
+    json_path = os.path.join(directory, "results.json")
+    store_path = os.path.join(directory, "results_store")
+    try:
+        archive = build_archive(num_rows)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(archive, f, ensure_ascii=False)
+        del archive
+        start = time.perf_counter()
+        rows = convert([json_path], store_path)
+        convert_seconds = time.perf_counter() - start
+        store_bytes = sum(os.path.getsize(os.path.join(store_path, name)) for name in os.listdir(store_path))
+
+        print("=" * 100)
+        print("Result Store vs JSON")
+        print(f"Strategy runs: {rows} | JSON: {os.path.getsize(json_path) / 1e6:.1f} MB | "
+              f"Store: {store_bytes / 1e6:.1f} MB | Conversion: {convert_seconds:.2f}s")
+        print("=" * 100)
+        print(f"{'Operation':<36} {'JSON (s)':>9} {'JSON peak MB':>13} {'Store (s)':>10} {'Store peak MB':>14}")
+        print("-" * 100)
+
+        def json_load():
+            with open(json_path, encoding="utf-8") as f:
+                return json.load(f)
+
+        entries, json_open, json_peak = measure(json_load)
+        store, store_open, store_peak = measure(lambda: ResultStore(store_path))
+        print(f"{'Open':<36} {json_open:>9.3f} {json_peak:>13.1f} {store_open:>10.4f} {store_peak:>14.2f}")
+
+        def json_scan():
+            totals = {}
+            for entry in entries:
+                for key, result in entry["strategies"].items():
+                    t = totals.setdefault(key, [0, 0])
+                    t[0] += result["tokens"]
+                    t[1] += 1
+            return {k: t[0] / t[1] for k, t in totals.items()}
+
+        def store_scan():
+            counts = np.bincount(store.strategy, minlength=len(store.strategies))
+            sums = np.bincount(store.strategy, weights=store.tokens, minlength=len(store.strategies))
+            return dict(zip(store.strategies, sums / counts))
+
+        expected, json_seconds, json_peak = measure(json_scan)
+        got, store_seconds, store_peak = measure(store_scan)
+        assert all(abs(expected[k] - got[k]) < 1e-6 for k in expected)
+        print(f"{'Mean tokens per strategy':<36} {json_seconds:>9.3f} {json_peak:>13.1f} "
+              f"{store_seconds:>10.4f} {store_peak:>14.2f}")
+
+        picks = random.Random(0).sample(range(len(store)), min(1000, len(store)))
+        flat = [result["answer"] for entry in entries for result in entry["strategies"].values()]
+        _, json_seconds, json_peak = measure(lambda: [flat[i] for i in picks])
+        answers, store_seconds, store_peak = measure(lambda: [store[i].answer for i in picks])
+        assert answers == [flat[i] for i in picks]
+        print(f"{'1000 random answers':<36} {json_seconds:>9.4f} {json_peak:>13.2f} "
+              f"{store_seconds:>10.4f} {store_peak:>14.2f}")
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Self-Consistency vs Multi-turn Verification (offline)
+
+Replays the recorded answers in comprehensive_test_results.json through
+MockChatClient and compares, per question:
+1. Verification: initial answer + _verify_answer() rounds (sequential calls)
+2. Self-consistency: one call with n samples, confidence = agreement ratio
+
+The mock charges the same simulated latency per call regardless of n, as the
+API generates the n choices of one request in parallel. Tokens are estimated
+from the recorded texts (4 characters per token). Final answers are graded
+against each case's correct / common wrong answer where possible.
+
+Usage:
+    python3 bench_self_consistency.py [latency_seconds] [n]
+"""
+
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+
+from answer_grading import grade_answer
+from confidence_protocol import ConfidenceProtocol
+from llm_client import MockChatClient
+from rate_limiter import RateLimiter
+
+RESULTS_PATH = "comprehensive_test_results.json"
+
+
+def make_protocol(client) -> ConfidenceProtocol:
+    # Quota high enough that the limiter never throttles the benchmark
+    limiter = RateLimiter(requests_per_minute=10**9, tokens_per_minute=10**12)
+    return ConfidenceProtocol(api_key="offline", client=client, rate_limiter=limiter)
+
+
+def measure(method, cases, latency: float):
+    """Run method(protocol, question) on every case; return per-question rows"""
+    rows = []
+    for case in cases:
+        client = MockChatClient.from_results_file(RESULTS_PATH, latency=latency)
+        protocol = make_protocol(client)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            answer = method(protocol, case["question"])
+            seconds = time.perf_counter() - start
+        rows.append({
+            "calls": client.calls,
+            "seconds": seconds,
+            "tokens": answer.token_usage,
+            "confidence": answer.confidence,
+            "correct": grade_answer(answer.content, case["correct_answer"], case["common_wrong_answer"]),
+        })
+    return rows
+
+
+def main():
+    latency = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with open(RESULTS_PATH, encoding="utf-8") as f:
+        cases = [case_result["case"] for case_result in json.load(f)]
+
+    methods = {
+        "Verification (_verify_answer)":
+            lambda p, q: p._verify_answer(q, p._get_initial_answer(q)),
+        f"Self-consistency (n={n})":
+            lambda p, q: p.ask_with_self_consistency(q, n=n),
+    }
+
+    print("=" * 100)
+    print("Self-Consistency vs Multi-turn Verification (MockChatClient replay)")
+    print(f"Questions: {len(cases)} | Simulated latency: {latency * 1000:.0f} ms/call")
+    print("=" * 100)
+    print(f"{'Method':<32} {'Calls/q':>8} {'Latency/q (s)':>14} {'Tokens/q':>9} "
+          f"{'Mean conf.':>11} {'Correct':>8}")
+    print("-" * 100)
+    for name, method in methods.items():
+        rows = measure(method, cases, latency)
+        graded = [r["correct"] for r in rows if r["correct"] is not None]
+        print(f"{name:<32} {statistics.mean(r['calls'] for r in rows):>8.1f} "
+              f"{statistics.mean(r['seconds'] for r in rows):>14.3f} "
+              f"{statistics.mean(r['tokens'] for r in rows):>9.0f} "
+              f"{statistics.mean(r['confidence'] for r in rows):>10.1f}% "
+              f"{f'{sum(graded)}/{len(graded)}':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Transcript Archive Benchmark
+
+Writes synthetic multi-turn transcripts (3 strategies per case, 1-3 rounds
+each) to a transcript archive and, for comparison, the same conversations
+as a .jsonl result log, then measures:
+1. Write throughput of the archive
+2. Open time (index load) of the archive
+3. Fetching one conversation by (run, case id, strategy): archive lookup
+   vs scanning the result log until the case is found
+
+Usage:
+    python3 bench_transcript_archive.py [num_cases] [reply_chars]
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from result_log import ResultLog, iter_jsonl
+from transcript_archive import TranscriptArchive, TranscriptWriter
+
+STRATEGIES = (("basic", 1), ("multi_turn", 2), ("multi_turn_aggressive", 3))
+
+
+def synthetic_rounds(case_id: int, rounds: int, reply_chars: int):
+    """Round message lists of one conversation"""
+    rng = random.Random(case_id)
+    filler = "Let me verify this step by step. " * (reply_chars // 33 + 1)
+    messages = [[{"role": "system", "content": "You are a rigorous assistant."},
+                 {"role": "user", "content": f"Question {case_id}: what is {rng.randint(1, 999)} squared?"},
+                 {"role": "assistant", "content": filler[:reply_chars]}]]
+    for i in range(1, rounds):
+        messages.append([{"role": "user", "content": f"Challenge {i}: are you sure?"},
+                         {"role": "assistant", "content": filler[:reply_chars]}])
+    return messages
+
+
+def main():
+    num_cases = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    reply_chars = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    directory = tempfile.mkdtemp(prefix="bench_transcripts_")
+    archive_path = os.path.join(directory, "transcripts.bin")
+    log_path = os.path.join(directory, "results.jsonl")
+    try:
+        start = time.perf_counter()
+        with TranscriptWriter(archive_path, run_id="bench") as writer, \
+                ResultLog(log_path, append=False) as log:
+            for case_id in range(num_cases):
+                entry = {"case": {"id": case_id}, "strategies": {}}
+                for strategy, rounds in STRATEGIES:
+                    conversation = []
+                    for round_index, messages in enumerate(synthetic_rounds(case_id, rounds, reply_chars)):
+                        writer.record(case_id, strategy, round_index, messages)
+                        conversation.extend(messages)
+                    entry["strategies"][strategy] = {"conversation": conversation}
+                log.write(entry)
+            rounds_written = writer.rounds_written
+        write_seconds = time.perf_counter() - start
+        size = os.path.getsize(archive_path) + os.path.getsize(archive_path + ".idx")
+
+        print("=" * 100)
+        print("Transcript Archive")
+        print(f"Cases: {num_cases} | Rounds: {rounds_written} | Archive: {size / 1e6:.1f} MB | "
+              f"Result log: {os.path.getsize(log_path) / 1e6:.1f} MB")
+        print("=" * 100)
+        print(f"Archive write (+ result log): {rounds_written / write_seconds:,.0f} rounds/s")
+
+        start = time.perf_counter()
+        archive = TranscriptArchive(archive_path)
+        print(f"Archive open (index load): {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        rng = random.Random(0)
+        picks = [(rng.randrange(num_cases), rng.choice(STRATEGIES)[0]) for _ in range(1000)]
+        start = time.perf_counter()
+        for case_id, strategy in picks:
+            archive.conversation("bench", case_id, strategy)
+        per_lookup = (time.perf_counter() - start) / len(picks)
+        print(f"Archive conversation lookup: {per_lookup * 1e6:.1f} us")
+
+        start = time.perf_counter()
+        scans = picks[:5]
+        for case_id, strategy in scans:
+            for entry in iter_jsonl(log_path):
+                if entry["case"]["id"] == case_id:
+                    expected = entry["strategies"][strategy]["conversation"]
+                    break
+            assert archive.conversation("bench", case_id, strategy) == expected
+        per_scan = (time.perf_counter() - start) / len(scans)
+        print(f"Result log scan: {per_scan * 1e6:,.0f} us ({per_scan / per_lookup:,.0f}x slower)")
+        archive.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
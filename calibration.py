@@ -0,0 +1,208 @@
+"""
+Calibration Analytics
+Check self-reported confidence against graded correctness, and pick the
+verification threshold from data instead of by hand.
+
+- expected_calibration_error() / brier_score() / reliability_bins():
+  how well stated confidence predicts correctness
+- sweep_thresholds(): for each candidate confidence_threshold, the accuracy
+  and tokens of "accept the initial answer at or above the threshold,
+  verify below it", given per-question outcomes of both paths
+- recommend_threshold(): cheapest threshold that reaches a target accuracy
+
+Inputs are NumPy arrays with one entry per question: confidence 0-100 (NaN
+when none was stated; ConfidenceProtocol then assumes DEFAULT_CONFIDENCE),
+correct as 1.0 / 0.0 / NaN (not graded) and tokens.
+
+Usage:
+    python3 calibration.py [target_accuracy] [results.json ...]
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from confidence_extractor import DEFAULT_CONFIDENCE
+
+# Confidence bins for ECE and reliability diagrams
+CALIBRATION_BINS = 10
+
+# Candidate thresholds swept by default (0, 5, ..., 100)
+DEFAULT_THRESHOLDS = np.arange(0.0, 101.0, 5.0)
+
+# Stored strategies standing in for the two paths of ConfidenceProtocol.ask():
+# an answer that states its confidence, and multi-turn verification
+INITIAL_STRATEGY = "self_reflection"
+FALLBACK_STRATEGY = "multi_turn"
+
+
+@dataclass
+class ReliabilityBin:
+    """One confidence bin of a reliability diagram"""
+    lower: float  # 0-100
+    upper: float
+    count: int
+    mean_confidence: float  # NaN when the bin is empty
+    accuracy: float  # 0-100, NaN when the bin is empty
+
+
+@dataclass
+class ThresholdPoint:
+    """Outcome of one confidence_threshold over a set of questions"""
+    threshold: float
+    accuracy: float  # 0-1 over graded questions
+    mean_tokens: float
+    verify_rate: float  # Share of questions sent to verification
+
+
+def _calibration_pairs(confidence: np.ndarray, correct: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(probability 0-1, outcome 0/1) for rows that are graded and state a confidence"""
+    confidence = np.asarray(confidence, dtype=np.float64)
+    correct = np.asarray(correct, dtype=np.float64)
+    keep = ~np.isnan(confidence) & ~np.isnan(correct)
+    return np.clip(confidence[keep], 0.0, 100.0) / 100.0, correct[keep]
+
+
+def _bin_index(p: np.ndarray, bins: int) -> np.ndarray:
+    return np.minimum((p * bins).astype(np.int64), bins - 1)
+
+
+def expected_calibration_error(confidence: np.ndarray, correct: np.ndarray,
+                               bins: int = CALIBRATION_BINS) -> float:
+    """
+    Expected calibration error (0-1): bin-share weighted |mean confidence - accuracy|
+
+    Args:
+        confidence: Stated confidence, 0-100 (NaN rows are ignored)
+        correct: 1.0 / 0.0 (NaN rows are ignored)
+        bins: Number of equal-width confidence bins
+
+    Returns:
+        ECE, or NaN when no row is both graded and confident
+    """
+    p, y = _calibration_pairs(confidence, correct)
+    if len(p) == 0:
+        return float("nan")
+    gap = np.bincount(_bin_index(p, bins), weights=p - y, minlength=bins)
+    return float(np.abs(gap).sum() / len(p))
+
+
+def brier_score(confidence: np.ndarray, correct: np.ndarray) -> float:
+    """Mean squared error of confidence (as a probability) against correctness; NaN if no rows"""
+    p, y = _calibration_pairs(confidence, correct)
+    return float(np.mean((p - y) ** 2)) if len(p) else float("nan")
+
+
+def reliability_bins(confidence: np.ndarray, correct: np.ndarray,
+                     bins: int = CALIBRATION_BINS) -> List[ReliabilityBin]:
+    """Per-bin count, mean confidence and accuracy (the data of a reliability diagram)"""
+    p, y = _calibration_pairs(confidence, correct)
+    index = _bin_index(p, bins)
+    counts = np.bincount(index, minlength=bins)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_confidence = np.bincount(index, weights=p, minlength=bins) / counts * 100
+        accuracy = np.bincount(index, weights=y, minlength=bins) / counts * 100
+    width = 100.0 / bins
+    return [ReliabilityBin(i * width, (i + 1) * width, int(counts[i]),
+                           float(mean_confidence[i]), float(accuracy[i]))
+            for i in range(bins)]
+
+
+def sweep_thresholds(confidence: np.ndarray, correct: np.ndarray, tokens: np.ndarray,
+                     verified_correct: np.ndarray, verification_tokens: np.ndarray,
+                     thresholds: Sequence[float] = DEFAULT_THRESHOLDS) -> List[ThresholdPoint]:
+    """
+    Accuracy/token trade-off of each verification threshold
+
+    Args:
+        confidence: Stated confidence of the initial answers, 0-100 (NaN = DEFAULT_CONFIDENCE)
+        correct: Initial answers graded 1.0 / 0.0 / NaN
+        tokens: Tokens of the initial answers
+        verified_correct: Answers after verification, graded 1.0 / 0.0 / NaN
+        verification_tokens: Extra tokens spent when verification runs
+        thresholds: Candidate confidence_threshold values
+
+    Returns:
+        One ThresholdPoint per threshold, in the given order
+    """
+    confidence = np.nan_to_num(np.asarray(confidence, dtype=np.float64), nan=DEFAULT_CONFIDENCE)
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+
+    # thresholds x questions: whether the question goes to verification
+    verify = confidence[np.newaxis, :] < thresholds[:, np.newaxis]
+    outcome = np.where(verify, np.asarray(verified_correct, dtype=np.float64),
+                       np.asarray(correct, dtype=np.float64))
+    cost = np.asarray(tokens, dtype=np.float64) + np.where(verify, verification_tokens, 0.0)
+
+    graded = ~np.isnan(outcome)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        accuracy = np.where(graded, outcome, 0.0).sum(axis=1) / graded.sum(axis=1)
+    mean_tokens = cost.mean(axis=1) if cost.shape[1] else np.full(len(thresholds), np.nan)
+    verify_rate = verify.mean(axis=1) if verify.shape[1] else np.full(len(thresholds), np.nan)
+    return [ThresholdPoint(float(t), float(a), float(m), float(v))
+            for t, a, m, v in zip(thresholds, accuracy, mean_tokens, verify_rate)]
+
+
+def recommend_threshold(points: Sequence[ThresholdPoint], target_accuracy: float) -> Optional[ThresholdPoint]:
+    """
+    Cheapest point reaching target_accuracy (0-1), or None if no threshold reaches it
+
+    Among equally cheap points the highest threshold wins: it verifies the
+    same stored questions, and leaves more margin on new ones.
+    """
+    reaching = [p for p in points if p.accuracy >= target_accuracy]
+    if not reaching:
+        return None
+    return min(reaching, key=lambda p: (p.mean_tokens, -p.threshold))
+
+
+def print_reliability(bins: Sequence[ReliabilityBin], width: int = 40):
+    """Text reliability diagram: accuracy bar per confidence bin"""
+    print(f"{'Confidence':<12} {'Count':>6} {'Mean conf.':>11} {'Accuracy':>9}")
+    for b in bins:
+        if b.count == 0:
+            continue
+        bar = "#" * int(round(b.accuracy / 100 * width))
+        print(f"{f'{b.lower:.0f}-{b.upper:.0f}%':<12} {b.count:>6} {b.mean_confidence:>10.1f}% "
+              f"{b.accuracy:>8.1f}% {bar}")
+
+
+def main():
+    # Imported here: grading_engine itself uses the metrics above
+    from grading_engine import load_results
+
+    target_accuracy = float(sys.argv[1]) if len(sys.argv) > 1 else 0.9
+    paths = sys.argv[2:] or ["comprehensive_test_results.json"]
+    graded = load_results(paths)
+    confidence, correct, tokens, verified_correct, verification_tokens = graded.paired(
+        INITIAL_STRATEGY, FALLBACK_STRATEGY)
+
+    print("=" * 100)
+    print("Calibration Analytics")
+    print(f"Files: {', '.join(paths)} | Questions: {len(confidence)} | "
+          f"Initial: {INITIAL_STRATEGY} | Verification: {FALLBACK_STRATEGY}")
+    print("=" * 100)
+    print(f"ECE: {expected_calibration_error(confidence, correct):.3f} | "
+          f"Brier: {brier_score(confidence, correct):.3f}\n")
+    print_reliability(reliability_bins(confidence, correct))
+
+    points = sweep_thresholds(confidence, correct, tokens, verified_correct, verification_tokens)
+    print(f"\n{'Threshold':>9} {'Verified':>9} {'Accuracy':>9} {'Tokens/q':>9}")
+    print("-" * 100)
+    for p in points:
+        print(f"{p.threshold:>8.0f}% {p.verify_rate * 100:>8.1f}% {p.accuracy * 100:>8.1f}% {p.mean_tokens:>9.0f}")
+
+    print("-" * 100)
+    best = recommend_threshold(points, target_accuracy)
+    if best is None:
+        print(f"No threshold reaches {target_accuracy:.0%} accuracy")
+    else:
+        print(f"Recommended: ConfidenceProtocol(confidence_threshold={best.threshold:.0f}) -> "
+              f"{best.accuracy:.1%} accuracy, {best.mean_tokens:.0f} tokens/question, "
+              f"{best.verify_rate:.0%} verified")
+
+
+if __name__ == "__main__":
+    main()
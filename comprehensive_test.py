@@ -8,14 +8,32 @@ This script tests complex cases where:
 This proves the value of our confidence protocol.
 """
 
-import openai
-import os
 from datetime import datetime
-import json
+from typing import Optional
+
+from llm_client import client_from_env
+from rate_limiter import get_shared_limiter
+from response_cache import cache_from_env
+from result_log import ResultLog
+from run_checkpoint import CaseCheckpoint, RunCheckpoint
+from strategy_registry import StrategyEngine
+from transcript_archive import CaseTranscript, TranscriptWriter
 
-openai.api_key = os.environ.get("OPENAI_API_KEY", "your-api-key-here")
 MODEL = "gpt-4o-mini"
 
+# Chat client (set LLM_BACKEND=mock to run offline against recorded answers)
+CLIENT = client_from_env()
+
+# Shared RPM/TPM scheduler
+LIMITER = get_shared_limiter()
+
+# Response cache (set RESPONSE_CACHE_PATH to reuse responses across runs)
+CACHE = cache_from_env()
+
+# Runs the strategies declared in strategy_registry
+ENGINE = StrategyEngine(CLIENT, LIMITER, CACHE, model=MODEL)
+
+
 # Complex test cases that are prone to errors
 TEST_CASES = [
     {
@@ -98,98 +116,62 @@ How can he get everything across safely?""",
 ]
 
 
-def basic_strategy(question: str) -> dict:
+def basic_strategy(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                   transcript: Optional[CaseTranscript] = None) -> dict:
     """Strategy 1: Basic - No special prompting"""
-    messages = [
-        {"role": "system", "content": "You are a helpful AI assistant. Please answer the question directly and concisely."},
-        {"role": "user", "content": question}
-    ]
-    
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=0.7
-    )
-    
+    result = ENGINE.run("basic", question, checkpoint, transcript)
     return {
-        "answer": response.choices[0].message.content,
-        "tokens": response.usage.total_tokens
+        "strategy": result.strategy,
+        "answer": result.answer,
+        "tokens": result.tokens,
+        **result.usage_fields()
     }
 
 
-def self_reflection_strategy(question: str) -> dict:
+def self_reflection_strategy(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                             transcript: Optional[CaseTranscript] = None) -> dict:
     """Strategy 3: Self-Reflection with verification"""
-    system_prompt = """You are a rigorous AI assistant. For this question:
-
-1. First give your immediate answer
-2. Then STOP and question yourself: "Wait, is this correct? What are common mistakes people make on this type of problem?"
-3. Re-examine the problem carefully, checking your logic step by step
-4. Provide your final answer with confidence level
-
-Format:
-[Initial thought]: ...
-[Self-check]: (What could go wrong? Common traps?)
-[Step-by-step verification]: ...
-[Final Answer]: ...
-[Confidence]: (0-100%)
-"""
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": question}
-    ]
-    
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        temperature=0.7
-    )
-    
+    result = ENGINE.run("self_reflection", question, checkpoint, transcript)
     return {
-        "answer": response.choices[0].message.content,
-        "tokens": response.usage.total_tokens
+        "strategy": result.strategy,
+        "answer": result.answer,
+        "tokens": result.tokens,
+        **result.usage_fields()
     }
 
 
-def multi_turn_verification(question: str) -> dict:
+def multi_turn_verification(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                            transcript: Optional[CaseTranscript] = None) -> dict:
     """Strategy 4: Multi-turn with challenge"""
-    # Round 1
-    messages = [
-        {"role": "system", "content": "You are a helpful AI assistant."},
-        {"role": "user", "content": question}
-    ]
-    
-    response1 = openai.chat.completions.create(model=MODEL, messages=messages, temperature=0.7)
-    first_answer = response1.choices[0].message.content
-    
-    # Round 2: Challenge
-    messages.append({"role": "assistant", "content": first_answer})
-    messages.append({
-        "role": "user",
-        "content": "Wait, are you SURE that's correct? This type of question often has a trap. Please reconsider carefully and verify your answer step by step."
-    })
-    
-    response2 = openai.chat.completions.create(model=MODEL, messages=messages, temperature=0.7)
-    final_answer = response2.choices[0].message.content
-    
-    total_tokens = response1.usage.total_tokens + response2.usage.total_tokens
-    
+    result = ENGINE.run("multi_turn", question, checkpoint, transcript)
+    first, final = result.rounds
     return {
-        "first_answer": first_answer,
-        "final_answer": final_answer,
-        "answer": final_answer,
-        "tokens": total_tokens
+        "strategy": result.strategy,
+        "first_answer": first,
+        "final_answer": final,
+        "answer": final,
+        "tokens": result.tokens,
+        **result.usage_fields()
     }
 
 
 def run_comprehensive_test():
-    """Run all test cases with multiple strategies"""
-    results = []
+    """Run all test cases with multiple strategies; returns the path of the JSONL result log"""
+    # One JSON line per case
+    output_file = "/Users/zeyu/research/comprehensive_test_results.jsonl"
+    log = ResultLog(output_file, append=False)
+    # Finished (case, strategy, round) triples; a rerun after an interruption reuses them
+    checkpoint = RunCheckpoint("/Users/zeyu/research/comprehensive_test_checkpoint.jsonl")
+    # Every round's messages, indexed by (run, case id, strategy, round) for later inspection
+    transcripts = TranscriptWriter("/Users/zeyu/research/comprehensive_test_transcripts.bin",
+                                   run_id=datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
     
     print("="*100)
     print("COMPREHENSIVE STRATEGY TEST - Demonstrating Superiority")
     print(f"Model: {MODEL}")
     print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    if checkpoint.restored_rounds:
+        print(f"Resuming: {checkpoint.restored_rounds} finished rounds restored from {checkpoint.path}")
     print("="*100)
     
     for case in TEST_CASES:
@@ -211,7 +193,8 @@ def run_comprehensive_test():
         print("【Strategy 1: Basic】")
         print("-"*100)
         try:
-            basic_result = basic_strategy(case['question'])
+            basic_result = basic_strategy(case['question'], checkpoint.case(case['id']),
+                                          transcripts.case(case['id']))
             case_result["strategies"]["basic"] = basic_result
             print(f"Answer: {basic_result['answer'][:300]}...")
             print(f"Tokens: {basic_result['tokens']}")
@@ -223,7 +206,8 @@ def run_comprehensive_test():
         print("【Strategy 3: Self-Reflection】")
         print("-"*100)
         try:
-            reflection_result = self_reflection_strategy(case['question'])
+            reflection_result = self_reflection_strategy(case['question'], checkpoint.case(case['id']),
+                                                         transcripts.case(case['id']))
             case_result["strategies"]["self_reflection"] = reflection_result
             print(f"Answer: {reflection_result['answer'][:500]}...")
             print(f"Tokens: {reflection_result['tokens']}")
@@ -235,7 +219,8 @@ def run_comprehensive_test():
         print("【Strategy 4: Multi-turn Verification】")
         print("-"*100)
         try:
-            multiturn_result = multi_turn_verification(case['question'])
+            multiturn_result = multi_turn_verification(case['question'], checkpoint.case(case['id']),
+                                                       transcripts.case(case['id']))
             case_result["strategies"]["multi_turn"] = multiturn_result
             print(f"First Answer: {multiturn_result['first_answer'][:200]}...")
             print(f"\nAfter Challenge: {multiturn_result['final_answer'][:300]}...")
@@ -243,19 +228,21 @@ def run_comprehensive_test():
         except Exception as e:
             print(f"Error: {e}")
         
-        results.append(case_result)
+        # Written as soon as the case completes, so an interruption keeps finished cases
+        log.write(case_result)
         print(f"\n{'='*100}\n")
     
-    # Save results
-    output_file = "/Users/zeyu/research/comprehensive_test_results.json"
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    log.close()
+    transcripts.close()
+    # Run complete: the next run starts fresh
+    checkpoint.clear()
     
     print(f"\n{'='*100}")
-    print(f"Results saved to: {output_file}")
+    print(f"Results saved to: {output_file} ({log.records_written} cases)")
+    print(f"Transcripts: {transcripts.path} (run {transcripts.run_id}, {transcripts.rounds_written} rounds)")
     print("="*100)
     
-    return results
+    return output_file
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+"""
+Confidence Extractor
+Precompiled, single-pass extraction of self-reported confidence from LLM answers.
+
+Label occurrences are located with a plain substring scan, and one precompiled
+pattern parses the value after each occurrence.
+
+Recognized forms (label is case-insensitive, `:` or `：`):
+- [Confidence]: 95%      [置信度]：95      Confidence: 95      **Confidence**: 95%
+- Confidence level: High / Medium / Low
+- Confidence: 0.95       Confidence: 19/20
+- Confidence: 80-90%     (ranges on one line, both ends 0-100, give the midpoint)
+- "confidence": 90       (JSON key)
+
+Bracketed labels take precedence over plain "confidence:" mentions, matching
+the original ConfidenceProtocol._extract_confidence behaviour.
+"""
+
+import re
+from typing import Iterable, List, Optional, Tuple
+
+# Returned when no confidence is found
+DEFAULT_CONFIDENCE = 60.0
+
+_NUMBER = r"\d+(?:\.\d+)?"
+# A number from 0 to 100, not followed by more digits (range ends: "80-90%", not "2024-2025")
+_PERCENT_NUMBER = r"(?:100(?:\.0+)?|\d{1,2}(?:\.\d+)?)(?![\d.])"
+
+_LABELS = ("confidence", "置信度")
+
+# Everything after the label, matched at each label occurrence
+_TAIL_RE = re.compile(
+    rf"""
+    (?:\s+(?:level|score))?\s*(?P<close>\])?\**(?P<quote>")?
+    \s*[：:]\s*\**\s*
+    (?:
+        (?P<low>{_PERCENT_NUMBER})[ \t]*%?[ \t]*(?:-|–|to)[ \t]*(?P<high>{_PERCENT_NUMBER})[ \t]*%?
+      | (?P<numerator>{_NUMBER})[ \t]*/[ \t]*(?P<denominator>{_NUMBER})
+      | (?P<number>{_NUMBER})\s*(?P<percent>%)?
+      | (?P<word>very\s+high|very\s+low|high|medium|moderate|low)\b
+    )
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+_WORD_CONFIDENCE = {
+    "very high": 95.0,
+    "high": 85.0,
+    "medium": 65.0,
+    "moderate": 65.0,
+    "low": 35.0,
+    "very low": 15.0,
+}
+
+
+def _match_value(match: "re.Match") -> Optional[float]:
+    """Convert one regex match to a 0-100 confidence"""
+    if match.group("low") is not None:
+        value = (float(match.group("low")) + float(match.group("high"))) / 2
+    elif match.group("numerator") is not None:
+        denominator = float(match.group("denominator"))
+        value = float(match.group("numerator"))
+        # "5/0" is not a fraction: read the number alone, as the original extractor did
+        if denominator:
+            value = value / denominator * 100
+    elif match.group("number") is not None:
+        text = match.group("number")
+        value = float(text)
+        # "0.95" without a percent sign is a probability
+        if match.group("percent") is None and "." in text and value <= 1.0:
+            value *= 100
+    else:
+        value = _WORD_CONFIDENCE[" ".join(match.group("word").lower().split())]
+    return min(100.0, max(0.0, value))
+
+
+def _label_positions(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of every confidence label, in text order"""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # Lowercasing changed offsets (rare Unicode); search the original text
+        lowered = text
+    positions = []
+    for label in _LABELS:
+        start = lowered.find(label)
+        while start != -1:
+            positions.append((start, start + len(label)))
+            start = lowered.find(label, start + 1)
+    positions.sort()
+    return positions
+
+
+def _is_bracketed(text: str, start: int, match: "re.Match") -> bool:
+    """Whether the label is written as [Confidence]"""
+    return match.group("close") is not None and text[max(0, start - 8):start].rstrip().endswith("[")
+
+
+def extract_confidence_or_none(text: str) -> Optional[float]:
+    """Extract confidence (0-100), or None if the text states none"""
+    fallback = None
+    for start, end in _label_positions(text):
+        match = _TAIL_RE.match(text, end)
+        if match is None:
+            continue
+        value = _match_value(match)
+        if value is None:
+            continue
+        if _is_bracketed(text, start, match):
+            return value
+        if fallback is None:
+            fallback = value
+    return fallback
+
+
+def extract_confidence(text: str, default: float = DEFAULT_CONFIDENCE) -> float:
+    """Extract confidence (0-100), or default if the text states none"""
+    value = extract_confidence_or_none(text)
+    return default if value is None else value
+
+
+def extract_many(texts: Iterable[str], default: float = DEFAULT_CONFIDENCE) -> List[float]:
+    """Extract confidence from many texts, e.g. when re-scoring stored transcripts"""
+    extract = extract_confidence_or_none
+    return [default if value is None else value for value in map(extract, texts)]
+
+
+class ConfidenceDetector:
+    """
+    Incremental confidence detection over a streamed answer
+
+    Feed chunks as they arrive; feed() returns the confidence as soon as a
+    complete [Confidence] section (or JSON "confidence" key) has been seen.
+    Plain "confidence:" mentions are ignored here, since they may appear in the
+    reasoning before the actual assessment.
+    """
+
+    # Characters after a label within which the value may still be arriving
+    _PENDING_WINDOW = 32
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan_from = 0
+        self.confidence: Optional[float] = None
+
+    def feed(self, text: str) -> Optional[float]:
+        """Add a chunk; return the confidence once it is complete, else None"""
+        if self.confidence is not None:
+            return self.confidence
+        self._buffer += text
+        buffer = self._buffer
+
+        pending = None
+        for start, end in _label_positions(buffer):
+            if start < self._scan_from:
+                continue
+            match = _TAIL_RE.match(buffer, end)
+            if match is None or match.end() == len(buffer):
+                # The value may still be arriving
+                if len(buffer) - end < self._PENDING_WINDOW:
+                    pending = start
+                    break
+                continue
+            is_key = _is_bracketed(buffer, start, match) or (
+                match.group("quote") is not None and buffer[start - 1:start] == '"')
+            value = _match_value(match)
+            if is_key and value is not None:
+                self.confidence = value
+                return value
+
+        if pending is not None:
+            self._scan_from = pending
+        else:
+            # Keep enough context for a label split across chunks
+            self._scan_from = max(0, len(buffer) - len("confidence") - 2)
+        return None
@@ -7,12 +7,29 @@ Author: Based on observations and experiments of LLM behavior
 Date: 2025-11-12
 """
 
-import openai
+import asyncio
 import json
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field, replace
 from enum import Enum
 
+from llm_client import ChatClient, OpenAIChatClient, estimate_tokens
+from confidence_extractor import ConfidenceDetector
+from rate_limiter import RateLimiter, get_shared_limiter
+from response_cache import ResponseCache
+from conversation_tree import ConversationNode, ConversationTree
+from structured_output import (
+    RESPONSE_FORMAT, STRUCTURED_OUTPUT_INSTRUCTIONS, SOURCE_DEFAULT,
+    ParsedAnswer, ParseStats, parse_answer
+)
+from stopping_policy import AnswerEqualityPolicy, StoppingPolicy, VerificationRound
+from self_consistency import SOURCE_AGREEMENT, agreement_confidence, cluster_answers
+from token_budget import TokenBudget, estimate_prompt_tokens
+from metrics import MetricsRegistry, get_metrics
+from round_usage import RoundUsage, usage_from_response
+
 @dataclass
 class Answer:
     """Answer structure"""
@@ -21,6 +38,34 @@ class Answer:
     reasoning: Optional[str] = None
     strategy_used: Optional[str] = None
     token_usage: int = 0
+    confidence_source: Optional[str] = None  # "json", "text", "default" (nothing parsed, 60.0 used) or "agreement" (self-consistency)
+    rounds: List[RoundUsage] = field(default_factory=list)  # Per-round tokens and latency ("initial", "challenge", ...)
+    
+    @property
+    def prompt_tokens(self) -> int:
+        return sum(r.prompt_tokens for r in self.rounds)
+    
+    @property
+    def completion_tokens(self) -> int:
+        return sum(r.completion_tokens for r in self.rounds)
+    
+    @property
+    def cached_tokens(self) -> int:
+        return sum(r.cached_tokens for r in self.rounds)
+    
+    @property
+    def latency(self) -> float:
+        """Seconds spent waiting for API responses"""
+        return sum(r.latency for r in self.rounds)
+
+
+@dataclass
+class StreamEvent:
+    """One event from ask_stream()"""
+    type: str  # "chunk", "confidence", "verification" or "answer"
+    text: Optional[str] = None  # Content delta ("chunk")
+    confidence: Optional[float] = None  # Detected confidence ("confidence")
+    answer: Optional[Answer] = None  # Final answer ("answer")
 
 
 class ConfidenceLevel(Enum):
@@ -41,8 +86,29 @@ class ConfidenceProtocol:
     4. Provide multiple verification strategies
     """
     
+    VERIFY_CHALLENGE_PROMPT = "Are you sure? Please think carefully again and check for any omissions or errors. If you find issues, please correct them. If you're confident it's correct, please restate your answer and confidence."
+    FINAL_CONFIRMATION_PROMPT = "Final confirmation: Please provide your final answer and confidence level."
+    VERIFICATION_PROMPTS = (VERIFY_CHALLENGE_PROMPT, FINAL_CONFIRMATION_PROMPT)
+    # Answer.rounds names of the verification rounds
+    VERIFICATION_ROUND_NAMES = ("challenge", "final_confirmation")
+    # Smallest max_tokens sent when a budget is nearly spent
+    MIN_COMPLETION_TOKENS = 64
+    
     def __init__(self, api_key: str, model: str = "gpt-4o-mini", 
-                 confidence_threshold: float = 80.0):
+                 confidence_threshold: float = 80.0,
+                 max_concurrency: int = 8,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ResponseCache] = None,
+                 structured_output: bool = False,
+                 stopping_policy: Optional[StoppingPolicy] = None,
+                 client: Optional[ChatClient] = None,
+                 timeout: float = 60.0,
+                 max_connections: int = 100,
+                 http2: bool = True,
+                 max_tokens: Optional[int] = None,
+                 question_token_budget: Optional[int] = None,
+                 batch_token_budget: Optional[int] = None,
+                 metrics: Optional[MetricsRegistry] = None):
         """
         Initialize protocol
         
@@ -50,18 +116,67 @@ class ConfidenceProtocol:
             api_key: OpenAI API key
             model: Model to use
             confidence_threshold: Confidence threshold below which additional verification is triggered
+            max_concurrency: Maximum number of in-flight API calls for the async methods
+            rate_limiter: RPM/TPM scheduler; defaults to the process-wide shared limiter
+            cache: Response cache for chat completions (None = no caching)
+            structured_output: Request JSON answers (answer/confidence/reasoning) via response_format
+                instead of the bracketed free-text format
+            stopping_policy: Decides when verification can stop before the final round;
+                defaults to AnswerEqualityPolicy (use NeverStop() to always run every round)
+            client: Chat client; defaults to an OpenAIChatClient owned by this protocol
+                (use MockChatClient to run offline)
+            timeout: Seconds to wait for an API response (default client only)
+            max_connections: Connection pool size (default client only)
+            http2: Use HTTP/2 when the h2 package is installed (default client only)
+            max_tokens: Completion token cap of every API call (passed to the API)
+            question_token_budget: Tokens one ask() may spend; verification rounds that
+                would not fit are skipped (None = no cap)
+            batch_token_budget: Tokens one batch_ask()/abatch_ask() may spend across all
+                its questions (None = no cap)
+            metrics: Registry for call latency, token, cache and parse metrics;
+                defaults to the process-wide one (see metrics.get_metrics)
         """
-        openai.api_key = api_key
+        self.api_key = api_key
         self.model = model
         self.confidence_threshold = confidence_threshold
+        self.max_concurrency = max_concurrency
+        # Keep at least max_concurrency connections alive so concurrent batches reuse them
+        self.client = client or OpenAIChatClient(
+            api_key, timeout=timeout, max_connections=max_connections,
+            max_keepalive_connections=min(max_connections, max(20, max_concurrency)), http2=http2
+        )
+        self.rate_limiter = rate_limiter or get_shared_limiter()
+        self.cache = cache
+        self.structured_output = structured_output
+        self.stopping_policy = stopping_policy or AnswerEqualityPolicy()
+        self.verification_rounds_skipped = 0
+        self.max_tokens = max_tokens
+        self.question_token_budget = question_token_budget
+        self.batch_token_budget = batch_token_budget
+        # Verification rounds skipped because they would exceed a token budget
+        self.budget_rounds_skipped = 0
+        
+        # Parse outcomes of every confidence extraction, and verifications they caused
+        self.parse_stats = ParseStats()
+        self.metrics = metrics or get_metrics()
+        # Guards the counters above: one protocol can serve several threads (strategy_fanout)
+        self._stats_lock = threading.Lock()
+        
+        # The semaphore is bound to the event loop it was created in
+        self._semaphore = None
+        self._semaphore_loop = None
         
         # Core System Prompt
-        self.base_prompt = """You are a rigorous and honest AI assistant. When answering questions, please follow these guidelines:
+        guidelines = """You are a rigorous and honest AI assistant. When answering questions, please follow these guidelines:
 
 1. **Self-questioning**: Question your first reaction before giving an answer
 2. **Honest assessment**: Clearly state uncertainties rather than making things up
 3. **Confidence assessment**: Evaluate your certainty about the answer (0-100%)
-
+"""
+        if structured_output:
+            self.base_prompt = guidelines + STRUCTURED_OUTPUT_INSTRUCTIONS
+        else:
+            self.base_prompt = guidelines + """
 Please answer in the following format:
 [Thinking]: (Briefly explain your reasoning process, including any uncertainties)
 [Answer]: (Your answer)
@@ -69,101 +184,449 @@ Please answer in the following format:
 [Confidence Reason]: (Why this confidence level)
 """
     
-    def ask(self, question: str, auto_verify: bool = True) -> Answer:
+    def ask(self, question: str, auto_verify: bool = True,
+            on_chunk: Optional[Callable[[str], None]] = None,
+            budget: Optional[TokenBudget] = None) -> Answer:
         """
         Ask a question and get an answer
         
         Args:
             question: User question
             auto_verify: Whether to automatically trigger verification based on confidence
+            on_chunk: If given, stream the initial answer and call this with each text delta
+            budget: Budget this question draws on, e.g. a batch budget (question_token_budget
+                applies on top)
             
         Returns:
             Answer object
         """
+        budget = self._question_budget(budget)
+        if on_chunk is not None:
+            answer = None
+            for event in self.ask_stream(question, auto_verify, budget=budget):
+                if event.type == "chunk":
+                    on_chunk(event.text)
+                elif event.type == "verification":
+                    print(f"\n⚠️  Low confidence ({event.confidence}%), triggering automatic verification...")
+                elif event.type == "answer":
+                    answer = event.answer
+            return answer
+        
         # First answer
-        answer = self._get_initial_answer(question)
+        answer = self._get_initial_answer(question, budget)
         
         # If confidence is low and auto-verify is enabled, perform verification
-        if auto_verify and answer.confidence < self.confidence_threshold:
+        if auto_verify and self._needs_verification(answer):
             print(f"\n⚠️  Low confidence ({answer.confidence}%), triggering automatic verification...")
-            verified_answer = self._verify_answer(question, answer)
+            verified_answer = self._verify_answer(question, answer, budget)
             return verified_answer
         
         return answer
     
-    def _get_initial_answer(self, question: str) -> Answer:
-        """Get initial answer"""
-        messages = [
-            {"role": "system", "content": self.base_prompt},
-            {"role": "user", "content": question}
-        ]
+    async def aask(self, question: str, auto_verify: bool = True,
+                   budget: Optional[TokenBudget] = None) -> Answer:
+        """
+        Async version of ask()
+        
+        Every API call goes through the shared concurrency limit, so when many
+        questions are in flight the verification rounds of one question overlap
+        with the initial answers of the others.
+        """
+        budget = self._question_budget(budget)
+        answer = await self._aget_initial_answer(question, budget)
+        
+        if auto_verify and self._needs_verification(answer):
+            print(f"\n⚠️  Low confidence ({answer.confidence}%), triggering automatic verification...")
+            return await self._averify_answer(question, answer, budget)
+        
+        return answer
+    
+    def ask_stream(self, question: str, auto_verify: bool = True,
+                   budget: Optional[TokenBudget] = None) -> Iterator[StreamEvent]:
+        """
+        Stream the initial answer, detecting confidence as it arrives
+        
+        Yields "chunk" events with each text delta and a "confidence" event as
+        soon as the [Confidence] section is complete. With auto_verify, a
+        confidence below the threshold stops the stream right there (the rest of
+        the answer is not generated) and verification starts immediately
+        ("verification" event). The last event is "answer" with the final Answer.
         
-        response = openai.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7
+        Streamed calls bypass the response cache. budget is used as given (ask()
+        passes the per-question budget).
+        """
+        messages = self._initial_messages(question)
+        kwargs = self._request_kwargs(messages, budget)
+        start = time.perf_counter()
+        stream = self.rate_limiter.call(self.client.create, stream=True,
+                                        stream_options={"include_usage": True}, **kwargs)
+        
+        detector = ConfidenceDetector()
+        parts = []
+        usage_chunk = None
+        stopped_early = False
+        for chunk in stream:
+            if chunk.usage is not None:
+                usage_chunk = chunk
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            text = chunk.choices[0].delta.content
+            parts.append(text)
+            yield StreamEvent("chunk", text=text)
+            
+            if detector.confidence is None and detector.feed(text) is not None:
+                yield StreamEvent("confidence", confidence=detector.confidence)
+                if auto_verify and detector.confidence < self.confidence_threshold:
+                    stopped_early = True
+                    break
+        if stopped_early and hasattr(stream, "close"):
+            stream.close()
+        # Whole stream, including the wait for a free rate limiter slot
+        latency = time.perf_counter() - start
+        self.metrics.observe("llm_call_latency_seconds", latency,
+                             model=self.model, mode="stream", outcome="ok")
+        
+        content = "".join(parts)
+        if usage_chunk is not None:
+            self._record_usage(usage_chunk.usage)
+            round_usage = usage_from_response("initial", usage_chunk, latency)
+        else:
+            # No usage chunk when the stream was cut short
+            round_usage = RoundUsage("initial", estimate_prompt_tokens(messages),
+                                     estimate_tokens(content), latency=latency)
+        token_usage = round_usage.total_tokens
+        if budget is not None:
+            budget.charge(token_usage)
+        confidence, source = self._parse_confidence(content)
+        answer = Answer(
+            content=content,
+            confidence=confidence,
+            strategy_used="initial",
+            token_usage=token_usage,
+            confidence_source=source,
+            rounds=[round_usage]
         )
         
+        if auto_verify and self._needs_verification(answer):
+            yield StreamEvent("verification", confidence=answer.confidence)
+            answer = self._verify_answer(question, answer, budget)
+        
+        yield StreamEvent("answer", answer=answer)
+    
+    def _needs_verification(self, answer: Answer) -> bool:
+        """Whether confidence is below the threshold (counting verifications caused by parse failures)"""
+        if answer.confidence >= self.confidence_threshold:
+            return False
+        with self._stats_lock:
+            self.parse_stats.verifications += 1
+            if answer.confidence_source == SOURCE_DEFAULT:
+                self.parse_stats.verifications_from_parse_failure += 1
+        return True
+    
+    @property
+    def cache_hits(self) -> int:
+        """Number of chat completions served from the response cache"""
+        return self.cache.hits if self.cache is not None else 0
+    
+    @property
+    def cache_misses(self) -> int:
+        """Number of chat completions that went to the API"""
+        return self.cache.misses if self.cache is not None else 0
+    
+    def _create(self, messages: List[Dict], budget: Optional[TokenBudget] = None, **overrides):
+        """Make one chat completion call (served from the cache when possible); API calls are charged to budget"""
+        def create(**kwargs):
+            # Only responses that went to the API spend tokens: cache hits are free
+            response = self._call_api(**kwargs)
+            if budget is not None:
+                budget.charge(response.usage.total_tokens)
+            return response
+        
+        # Keyed on the request as sent, including a max_tokens lowered by the budget,
+        # so a reply truncated by that cap is never served to an uncapped call
+        kwargs = self._request_kwargs(messages, budget, **overrides)
+        if self.cache is None:
+            return create(**kwargs)
+        return self.cache.get_or_create(create, **kwargs)
+    
+    async def _acreate(self, messages: List[Dict], budget: Optional[TokenBudget] = None, **overrides):
+        """Async version of _create()"""
+        async def create(**kwargs):
+            response = await self._acall_api(**kwargs)
+            if budget is not None:
+                budget.charge(response.usage.total_tokens)
+            return response
+        
+        kwargs = self._request_kwargs(messages, budget, **overrides)
+        if self.cache is None:
+            return await create(**kwargs)
+        return await self.cache.aget_or_create(create, **kwargs)
+    
+    def _create_round(self, name: str, messages: List[Dict], budget: Optional[TokenBudget] = None,
+                      **overrides) -> Tuple[object, RoundUsage]:
+        """_create() plus the round's token breakdown and latency"""
+        start = time.perf_counter()
+        response = self._create(messages, budget, **overrides)
+        return response, usage_from_response(name, response, time.perf_counter() - start)
+    
+    async def _acreate_round(self, name: str, messages: List[Dict], budget: Optional[TokenBudget] = None,
+                             **overrides) -> Tuple[object, RoundUsage]:
+        """Async version of _create_round()"""
+        start = time.perf_counter()
+        response = await self._acreate(messages, budget, **overrides)
+        return response, usage_from_response(name, response, time.perf_counter() - start)
+    
+    def _request_kwargs(self, messages: List[Dict], budget: Optional[TokenBudget] = None,
+                        **overrides) -> Dict:
+        """Parameters for chat.completions.create (overrides e.g. n or temperature)"""
+        kwargs = dict(model=self.model, messages=messages, temperature=0.7)
+        if self.structured_output:
+            kwargs["response_format"] = RESPONSE_FORMAT
+        max_tokens = self._completion_cap(messages, budget)
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        kwargs.update(overrides)
+        return kwargs
+    
+    def _completion_cap(self, messages: List[Dict], budget: Optional[TokenBudget]) -> Optional[int]:
+        """max_tokens for a call: the per-call cap, lowered to what the budget has left after the prompt"""
+        remaining = budget.remaining if budget is not None else None
+        if remaining is None:
+            return self.max_tokens
+        # Never below MIN_COMPLETION_TOKENS: a call that is made must be able to answer
+        allowance = max(self.MIN_COMPLETION_TOKENS, remaining - estimate_prompt_tokens(messages))
+        return allowance if self.max_tokens is None else min(self.max_tokens, allowance)
+    
+    def _question_budget(self, parent: Optional[TokenBudget]) -> Optional[TokenBudget]:
+        """Budget of one question: question_token_budget, drawing on parent"""
+        if self.question_token_budget is None:
+            return parent
+        return TokenBudget(self.question_token_budget, parent=parent)
+    
+    def _can_afford_round(self, budget: Optional[TokenBudget], node: ConversationNode, prompt: str) -> bool:
+        """Whether a verification round after node fits the budget (prompt + a reply as long as the last)"""
+        if budget is None:
+            return True
+        messages = node.messages() + [{"role": "user", "content": prompt}]
+        completion = self.max_tokens or estimate_tokens(node.content)
+        return budget.can_afford(estimate_prompt_tokens(messages) + completion)
+    
+    def _call_api(self, **kwargs):
+        """Call the API under the rate limiter"""
+        return self.rate_limiter.call(self._timed_create, **kwargs)
+    
+    async def _acall_api(self, **kwargs):
+        """Call the API with the async client, bounded by max_concurrency"""
+        async with self._get_semaphore():
+            return await self.rate_limiter.acall(self._atimed_create, **kwargs)
+    
+    def _timed_create(self, **kwargs):
+        """One API attempt, recording its latency and token usage"""
+        start = time.perf_counter()
+        try:
+            response = self.client.create(**kwargs)
+        except Exception:
+            self._record_latency(start, "error")
+            raise
+        self._record_latency(start, "ok")
+        self._record_usage(response.usage)
+        return response
+    
+    async def _atimed_create(self, **kwargs):
+        """Async version of _timed_create()"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.acreate(**kwargs)
+        except Exception:
+            self._record_latency(start, "error")
+            raise
+        self._record_latency(start, "ok")
+        self._record_usage(response.usage)
+        return response
+    
+    def _record_latency(self, start: float, outcome: str):
+        self.metrics.observe("llm_call_latency_seconds", time.perf_counter() - start,
+                             model=self.model, mode="complete", outcome=outcome)
+    
+    def _record_usage(self, usage):
+        """Count prompt and completion tokens of an API response"""
+        if usage is None:
+            return
+        self.metrics.inc("llm_prompt_tokens_total", usage.prompt_tokens, model=self.model)
+        self.metrics.inc("llm_completion_tokens_total", usage.completion_tokens, model=self.model)
+    
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the concurrency semaphore, recreating it when the event loop changes"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    def _initial_messages(self, question: str) -> List[Dict]:
+        """Build messages for the initial answer"""
+        return [
+            {"role": "system", "content": self.base_prompt},
+            {"role": "user", "content": question}
+        ]
+    
+    def _initial_answer_from_response(self, response, round_usage: RoundUsage) -> Answer:
+        """Build the initial Answer from an API response"""
         content = response.choices[0].message.content
-        confidence = self._extract_confidence(content)
+        confidence, source = self._parse_confidence(content)
         
         return Answer(
             content=content,
             confidence=confidence,
             strategy_used="initial",
-            token_usage=response.usage.total_tokens
+            token_usage=response.usage.total_tokens,
+            confidence_source=source,
+            rounds=[round_usage]
         )
     
-    def _verify_answer(self, question: str, initial_answer: Answer) -> Answer:
-        """Verify answer - using multi-turn dialogue"""
-        messages = [
-            {"role": "system", "content": self.base_prompt},
-            {"role": "user", "content": question},
-            {"role": "assistant", "content": initial_answer.content}
+    def _get_initial_answer(self, question: str, budget: Optional[TokenBudget] = None) -> Answer:
+        """Get initial answer"""
+        response, round_usage = self._create_round("initial", self._initial_messages(question), budget)
+        return self._initial_answer_from_response(response, round_usage)
+    
+    async def _aget_initial_answer(self, question: str, budget: Optional[TokenBudget] = None) -> Answer:
+        """Async version of _get_initial_answer()"""
+        response, round_usage = await self._acreate_round("initial", self._initial_messages(question), budget)
+        return self._initial_answer_from_response(response, round_usage)
+    
+    def _verification_tree(self, question: str, initial_answer: Answer,
+                           budget: Optional[TokenBudget] = None) -> Tuple[ConversationTree, ConversationNode]:
+        """Build the conversation tree for verification, rooted at the initial answer"""
+        tree = ConversationTree(self.base_prompt, question,
+                                create_fn=lambda messages: self._create(messages, budget),
+                                acreate_fn=lambda messages: self._acreate(messages, budget))
+        first = tree.add_turn(tree.question_node, "assistant", initial_answer.content)
+        first.tokens_used = initial_answer.token_usage
+        return tree, first
+    
+    def _verification_round(self, node: ConversationNode) -> Tuple[ConversationNode, VerificationRound, str]:
+        """Parse a finished verification round"""
+        parsed = self._parse_answer(node.content)
+        return node, VerificationRound(parsed.answer, parsed.confidence), parsed.source
+    
+    def _initial_round(self, initial_answer: Answer) -> VerificationRound:
+        """The initial answer as the round verification rounds are compared against"""
+        # Same parse as the verification rounds (the JSON "answer" field in structured mode);
+        # parse_answer() rather than _parse_answer(): this content was already counted
+        return VerificationRound(parse_answer(initial_answer.content).answer, initial_answer.confidence)
+    
+    def _should_stop(self, rounds: List[Tuple], previous: VerificationRound) -> bool:
+        """Whether the remaining verification rounds can be skipped"""
+        if len(rounds) == len(self.VERIFICATION_PROMPTS):
+            return False
+        return self.stopping_policy.should_stop(previous, rounds[-1][1], self.confidence_threshold)
+    
+    def _verified_answer(self, initial_answer: Answer, rounds: List[Tuple], over_budget: bool = False) -> Answer:
+        """Build the verified Answer from the verification rounds that were run"""
+        skipped = len(self.VERIFICATION_PROMPTS) - len(rounds)
+        with self._stats_lock:
+            if over_budget:
+                self.budget_rounds_skipped += skipped
+            else:
+                self.verification_rounds_skipped += skipped
+        trace = f"Initial confidence: {initial_answer.confidence}%"
+        if not rounds:
+            # Not even the challenge round fit the budget: keep the initial answer
+            return replace(initial_answer, reasoning=f"Verification skipped (token budget exhausted). {trace}")
+        
+        final_node, final_round, final_source = rounds[-1]
+        total_tokens = initial_answer.token_usage + sum(node.tokens_used for node, _, _ in rounds)
+        round_usage = initial_answer.rounds + [
+            node.usage(name) for (node, _, _), name in zip(rounds, self.VERIFICATION_ROUND_NAMES)
         ]
         
-        # First verification round: challenge
-        messages.append({
-            "role": "user",
-            "content": "Are you sure? Please think carefully again and check for any omissions or errors. If you find issues, please correct them. If you're confident it's correct, please restate your answer and confidence."
-        })
+        for i, (_, round_info, _) in enumerate(rounds[:-1], 1):
+            trace += f" -> Round {i}: {round_info.confidence}%"
+        if skipped:
+            reason = "token budget" if over_budget else "early exit"
+            trace += f" -> Round {len(rounds)}: {final_round.confidence}%"
+            reasoning = f"After {len(rounds)} round(s) of verification ({skipped} round(s) skipped by {reason}). {trace}"
+        else:
+            trace += f" -> Final: {final_round.confidence}%"
+            reasoning = f"After {len(rounds)} rounds of verification. {trace}"
         
-        response1 = openai.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7
+        return Answer(
+            content=final_node.content,
+            confidence=final_round.confidence,
+            reasoning=reasoning,
+            strategy_used="multi_turn_verification",
+            token_usage=total_tokens,
+            confidence_source=final_source,
+            rounds=round_usage
         )
+    
+    def _verify_answer(self, question: str, initial_answer: Answer,
+                       budget: Optional[TokenBudget] = None) -> Answer:
+        """Verify answer - using multi-turn dialogue"""
+        tree, node = self._verification_tree(question, initial_answer, budget)
+        previous = self._initial_round(initial_answer)
         
-        content1 = response1.choices[0].message.content
-        confidence1 = self._extract_confidence(content1)
+        # Challenge round, then final confirmation; stop early once the answer is stable,
+        # or when the next round would not fit the token budget
+        rounds = []
+        over_budget = False
+        for prompt in self.VERIFICATION_PROMPTS:
+            if not self._can_afford_round(budget, node, prompt):
+                over_budget = True
+                break
+            node = tree.challenge(node, prompt)
+            rounds.append(self._verification_round(node))
+            if self._should_stop(rounds, previous):
+                break
+            previous = rounds[-1][1]
         
-        # Second verification round: final confirmation
-        messages.append({"role": "assistant", "content": content1})
-        messages.append({
-            "role": "user",
-            "content": "Final confirmation: Please provide your final answer and confidence level."
-        })
+        return self._verified_answer(initial_answer, rounds, over_budget)
+    
+    async def _averify_answer(self, question: str, initial_answer: Answer,
+                              budget: Optional[TokenBudget] = None) -> Answer:
+        """Async version of _verify_answer()"""
+        tree, node = self._verification_tree(question, initial_answer, budget)
+        previous = self._initial_round(initial_answer)
         
-        response2 = openai.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7
-        )
+        rounds = []
+        over_budget = False
+        for prompt in self.VERIFICATION_PROMPTS:
+            if not self._can_afford_round(budget, node, prompt):
+                over_budget = True
+                break
+            node = await tree.achallenge(node, prompt)
+            rounds.append(self._verification_round(node))
+            if self._should_stop(rounds, previous):
+                break
+            previous = rounds[-1][1]
         
-        final_content = response2.choices[0].message.content
-        final_confidence = self._extract_confidence(final_content)
+        return self._verified_answer(initial_answer, rounds, over_budget)
+    
+    def ask_with_challenges(self, question: str, challenges: List[str]) -> List[Answer]:
+        """
+        Challenge one initial answer with several phrasings
         
-        total_tokens = (initial_answer.token_usage + 
-                       response1.usage.total_tokens + 
-                       response2.usage.total_tokens)
+        All branches fork from the same system prompt, question and initial
+        answer, which are generated once and shared.
         
-        return Answer(
-            content=final_content,
-            confidence=final_confidence,
-            reasoning=f"After 2 rounds of verification. Initial confidence: {initial_answer.confidence}% -> Round 1: {confidence1}% -> Final: {final_confidence}%",
-            strategy_used="multi_turn_verification",
-            token_usage=total_tokens
-        )
+        Returns:
+            One Answer per challenge, in the same order
+        """
+        tree = ConversationTree(self.base_prompt, question, create_fn=self._create)
+        branches = tree.fork(tree.question_node, challenges)
+        
+        answers = []
+        for node in branches:
+            confidence = self._extract_confidence(node.content)
+            answers.append(Answer(
+                content=node.content,
+                confidence=confidence,
+                reasoning=f"Challenge branch: {node.parent.content[:60]}. Shared prefix reused across {len(challenges)} branches, tokens saved: {tree.total_tokens_saved}",
+                strategy_used="challenge_branches",
+                token_usage=tree.branch_tokens(node),
+                rounds=[node.parent.parent.usage("initial"), node.usage("challenge")]
+            ))
+        return answers
     
     def ask_with_chain_of_verification(self, question: str) -> Answer:
         """Use chain of verification strategy"""
@@ -174,7 +637,11 @@ Please answer in the following format:
 3. Answer these verification questions
 4. Cross-check for consistency
 5. Provide final answer and confidence
-
+"""
+        if self.structured_output:
+            system_prompt += STRUCTURED_OUTPUT_INSTRUCTIONS
+        else:
+            system_prompt += """
 Format:
 [Preliminary Answer]: ...
 [Verification Questions]:
@@ -193,44 +660,87 @@ Format:
             {"role": "user", "content": question}
         ]
         
-        response = openai.chat.completions.create(
-            model=self.model,
-            messages=messages,
-            temperature=0.7
-        )
+        response, round_usage = self._create_round("initial", messages)
         
         content = response.choices[0].message.content
-        confidence = self._extract_confidence(content)
+        confidence, source = self._parse_confidence(content)
         
         return Answer(
             content=content,
             confidence=confidence,
             strategy_used="chain_of_verification",
-            token_usage=response.usage.total_tokens
+            token_usage=response.usage.total_tokens,
+            confidence_source=source,
+            rounds=[round_usage]
         )
     
-    def _extract_confidence(self, content: str) -> float:
-        """Extract confidence from answer"""
-        import re
-        
-        # Search for confidence patterns
-        patterns = [
-            r'\[Confidence\][：:]\s*(\d+\.?\d*)%?',
-            r'\[置信度\][：:]\s*(\d+\.?\d*)%?',
-            r'confidence[：:]\s*(\d+\.?\d*)%?',
-            r'Confidence[：:]\s*(\d+\.?\d*)%?',
-        ]
+    def ask_with_self_consistency(self, question: str, n: int = 5,
+                                  temperature: float = 1.0) -> Answer:
+        """
+        Self-consistency: sample n answers in one API call and use their agreement as confidence
+        
+        One round trip instead of the initial answer plus verification rounds,
+        and the confidence does not rely on the model's self-reported number.
         
-        for pattern in patterns:
-            match = re.search(pattern, content, re.IGNORECASE)
-            if match:
-                try:
-                    return float(match.group(1))
-                except:
-                    pass
+        Args:
+            question: User question
+            n: Number of samples (the API's n parameter)
+            temperature: Sampling temperature; must be > 0 for the samples to differ
+            
+        Returns:
+            Answer from the largest cluster of agreeing samples, with
+            confidence = share of samples in that cluster
+        """
+        response, round_usage = self._create_round("samples", self._initial_messages(question),
+                                                   n=n, temperature=temperature)
+        return self._self_consistency_answer(response, round_usage)
+    
+    async def aask_with_self_consistency(self, question: str, n: int = 5,
+                                         temperature: float = 1.0) -> Answer:
+        """Async version of ask_with_self_consistency()"""
+        response, round_usage = await self._acreate_round("samples", self._initial_messages(question),
+                                                          n=n, temperature=temperature)
+        return self._self_consistency_answer(response, round_usage)
+    
+    def _self_consistency_answer(self, response, round_usage: RoundUsage) -> Answer:
+        """Cluster the sampled answers of one response"""
+        contents = [choice.message.content or "" for choice in response.choices]
+        parsed = [self._parse_answer(content) for content in contents]
+        clusters = cluster_answers(contents)
+        majority = clusters[0]
+        chosen = majority.indices[0]
         
-        # If not found, return medium confidence
-        return 60.0
+        sizes = ", ".join(str(c.size) for c in clusters)
+        return Answer(
+            content=contents[chosen],
+            confidence=agreement_confidence(clusters),
+            reasoning=f"Self-consistency: {majority.size}/{len(contents)} samples agree "
+                      f"(cluster sizes: {sizes}). Self-reported confidence: {parsed[chosen].confidence}%",
+            strategy_used="self_consistency",
+            token_usage=response.usage.total_tokens,
+            confidence_source=SOURCE_AGREEMENT,
+            rounds=[round_usage]
+        )
+    
+    def _parse_answer(self, content: str) -> ParsedAnswer:
+        """Parse an answer and record the parse outcome"""
+        parsed = parse_answer(content)
+        with self._stats_lock:
+            self.parse_stats.record(parsed.source)
+        self.metrics.inc("confidence_parse_total", source=parsed.source)
+        if parsed.confidence is None:
+            # If not found, return medium confidence
+            parsed.confidence = 60.0
+        return parsed
+    
+    def _parse_confidence(self, content: str) -> Tuple[float, str]:
+        """Extract confidence and how it was obtained ("json", "text" or "default")"""
+        parsed = self._parse_answer(content)
+        return parsed.confidence, parsed.source
+    
+    def _extract_confidence(self, content: str) -> float:
+        """Extract confidence from answer (60.0 if none is stated)"""
+        return self._parse_confidence(content)[0]
     
     def get_confidence_level(self, confidence: float) -> ConfidenceLevel:
         """Get confidence level"""
@@ -243,13 +753,39 @@ Format:
     
     def batch_ask(self, questions: List[str], 
                   use_verification: bool = True) -> List[Answer]:
-        """Batch ask questions"""
+        """Batch ask questions (all of them drawing on one batch_token_budget)"""
+        budget = TokenBudget(self.batch_token_budget)
         answers = []
         for i, question in enumerate(questions, 1):
             print(f"\nProcessing question {i}/{len(questions)}: {question[:50]}...")
-            answer = self.ask(question, auto_verify=use_verification)
+            answer = self.ask(question, auto_verify=use_verification, budget=budget)
             answers.append(answer)
         return answers
+    
+    async def abatch_ask(self, questions: List[str],
+                         use_verification: bool = True) -> List[Answer]:
+        """
+        Batch ask questions concurrently
+        
+        All questions are started at once; the number of in-flight API calls is
+        bounded by max_concurrency. Results are returned in input order. All
+        questions draw on one batch_token_budget; once it runs low, questions
+        still get their initial answer but skip verification rounds.
+        
+        Usage:
+            answers = asyncio.run(protocol.abatch_ask(questions))
+        """
+        budget = TokenBudget(self.batch_token_budget)
+        completed = 0
+        
+        async def run(question: str) -> Answer:
+            nonlocal completed
+            answer = await self.aask(question, auto_verify=use_verification, budget=budget)
+            completed += 1
+            print(f"\nCompleted question {completed}/{len(questions)}: {question[:50]}...")
+            return answer
+        
+        return list(await asyncio.gather(*(run(q) for q in questions)))
 
 
 # Usage example
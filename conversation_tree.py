@@ -0,0 +1,195 @@
+"""
+Conversation Tree
+Prefix-sharing data structure for multi-turn verification.
+
+Every multi-turn strategy starts from the same prefix (system prompt, question,
+first answer) and then appends challenge rounds. Instead of rebuilding the
+message list for each round or each challenge phrasing, turns are stored as
+nodes of a tree:
+
+    system -> user(question) -> assistant(first answer) -> user(challenge A) -> assistant
+                                                        -> user(challenge B) -> assistant
+
+- A reply that was already generated for a node is reused, never requested again
+- Branches only append to the end of the shared prefix, so the prefix sent to the
+  API stays byte-identical and provider-side prompt caching can apply
+- Each node records the tokens it cost (prompt / completion / provider-cached
+  prompt), the latency of its request, and the tokens saved by reusing it
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+from round_usage import RoundUsage
+
+
+class ConversationNode:
+    """One turn in a conversation tree"""
+
+    def __init__(self, role: str, content: str,
+                 parent: Optional["ConversationNode"] = None,
+                 response=None, latency: float = 0.0):
+        self.role = role
+        self.content = content
+        self.parent = parent
+        self.children: List["ConversationNode"] = []
+        self.response = response
+
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.tokens_used = getattr(usage, "total_tokens", 0) or 0
+        self.prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        self.cached_prompt_tokens = getattr(details, "cached_tokens", 0) or 0
+        # Seconds the request for this reply took
+        self.latency = latency
+
+        # How often this reply was reused instead of requested again
+        self.reuse_count = 0
+        self.tokens_saved = 0
+
+    def find_child(self, role: str, content: Optional[str] = None) -> Optional["ConversationNode"]:
+        """Find an existing child turn (any content if content is None)"""
+        for child in self.children:
+            if child.role == role and (content is None or child.content == content):
+                return child
+        return None
+
+    def path(self) -> List["ConversationNode"]:
+        """Nodes from the root to this node"""
+        nodes = []
+        node = self
+        while node is not None:
+            nodes.append(node)
+            node = node.parent
+        return nodes[::-1]
+
+    def messages(self) -> List[Dict]:
+        """Message list for the API, ending with this node"""
+        return [{"role": node.role, "content": node.content} for node in self.path()]
+
+    def usage(self, name: str) -> RoundUsage:
+        """Token and latency breakdown of the request that produced this reply"""
+        return RoundUsage(name, self.prompt_tokens, self.completion_tokens,
+                          self.cached_prompt_tokens, self.latency)
+
+
+class ConversationTree:
+    """
+    Tree of conversation turns sharing one system prompt and question
+
+    Usage:
+        tree = ConversationTree(system_prompt, question, create_fn=lambda messages: ...)
+        first = tree.reply(tree.question_node)
+        branches = tree.fork(tree.question_node, ["Are you sure?", "Check for a trap."])
+    """
+
+    def __init__(self, system_prompt: str, question: str,
+                 create_fn: Optional[Callable] = None,
+                 acreate_fn: Optional[Callable] = None):
+        """
+        Initialize tree
+
+        Args:
+            system_prompt: System prompt (root of the tree)
+            question: User question (the shared first user turn)
+            create_fn: create_fn(messages) -> chat completion response
+            acreate_fn: Async version of create_fn, used by areply()/afork()
+        """
+        self.create_fn = create_fn
+        self.acreate_fn = acreate_fn
+        self.root = ConversationNode("system", system_prompt)
+        self.question_node = self.add_turn(self.root, "user", question)
+
+    def add_turn(self, node: ConversationNode, role: str, content: str,
+                 response=None) -> ConversationNode:
+        """Append a turn below node, reusing an identical existing turn"""
+        existing = node.find_child(role, content)
+        if existing is not None:
+            return existing
+        child = ConversationNode(role, content, parent=node, response=response)
+        node.children.append(child)
+        return child
+
+    def _reuse(self, node: ConversationNode) -> Optional[ConversationNode]:
+        """Return the existing reply to node, crediting the tokens saved"""
+        existing = node.find_child("assistant")
+        if existing is not None:
+            existing.reuse_count += 1
+            existing.tokens_saved += existing.tokens_used
+        return existing
+
+    def _attach_reply(self, node: ConversationNode, response, start: float) -> ConversationNode:
+        content = response.choices[0].message.content
+        child = ConversationNode("assistant", content, parent=node, response=response,
+                                 latency=time.perf_counter() - start)
+        node.children.append(child)
+        return child
+
+    def reply(self, node: ConversationNode) -> ConversationNode:
+        """Get the assistant reply to a user turn (reused if already generated)"""
+        existing = self._reuse(node)
+        if existing is not None:
+            return existing
+        start = time.perf_counter()
+        return self._attach_reply(node, self.create_fn(node.messages()), start)
+
+    async def areply(self, node: ConversationNode) -> ConversationNode:
+        """Async version of reply()"""
+        existing = self._reuse(node)
+        if existing is not None:
+            return existing
+        start = time.perf_counter()
+        return self._attach_reply(node, await self.acreate_fn(node.messages()), start)
+
+    def challenge(self, node: ConversationNode, text: str) -> ConversationNode:
+        """Add a challenge after an assistant turn and get the reply"""
+        return self.reply(self.add_turn(node, "user", text))
+
+    async def achallenge(self, node: ConversationNode, text: str) -> ConversationNode:
+        """Async version of challenge()"""
+        return await self.areply(self.add_turn(node, "user", text))
+
+    def fork(self, node: ConversationNode, challenges: List[str]) -> List[ConversationNode]:
+        """Answer a user turn once, then branch each challenge off that shared answer"""
+        return [self.challenge(self.reply(node), text) for text in challenges]
+
+    async def afork(self, node: ConversationNode, challenges: List[str]) -> List[ConversationNode]:
+        """Async version of fork() with the same reuse accounting; the challenges run concurrently"""
+        answers = [await self.areply(node) for _ in challenges]
+        return list(await asyncio.gather(*(self.achallenge(answer, text)
+                                           for answer, text in zip(answers, challenges))))
+
+    def nodes(self) -> Iterator[ConversationNode]:
+        """All nodes, depth-first"""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def branch_tokens(self, node: ConversationNode) -> int:
+        """Tokens spent on the turns leading to node"""
+        return sum(n.tokens_used for n in node.path())
+
+    @property
+    def total_tokens_used(self) -> int:
+        return sum(node.tokens_used for node in self.nodes())
+
+    @property
+    def total_tokens_saved(self) -> int:
+        return sum(node.tokens_saved for node in self.nodes())
+
+    def stats(self) -> Dict:
+        """Token accounting for the whole tree"""
+        nodes = list(self.nodes())
+        return {
+            "nodes": len(nodes),
+            "api_calls": sum(1 for node in nodes if node.response is not None),
+            "tokens_used": sum(node.tokens_used for node in nodes),
+            "prompt_tokens": sum(node.prompt_tokens for node in nodes),
+            "completion_tokens": sum(node.completion_tokens for node in nodes),
+            "tokens_saved": sum(node.tokens_saved for node in nodes),
+            "cached_prompt_tokens": sum(node.cached_prompt_tokens for node in nodes),
+        }
@@ -3,13 +3,13 @@ LLM Confidence and Accuracy Improvement Experiment - Demo Version
 Directly runs a test question to demonstrate the effects of different strategies
 """
 
-import openai
 import json
-import os
 from datetime import datetime
 
-# Set API key
-openai.api_key = os.environ.get("OPENAI_API_KEY", "your-api-key-here")
+from llm_client import client_from_env
+
+# API client with its own connection pool (key from OPENAI_API_KEY)
+CLIENT = client_from_env()
 
 MODEL = "gpt-4o-mini"
 
@@ -35,7 +35,7 @@ messages = [
     {"role": "user", "content": test_question}
 ]
 
-response = openai.chat.completions.create(
+response = CLIENT.create(
     model=MODEL,
     messages=messages,
     temperature=0.7
@@ -67,7 +67,7 @@ messages = [
     {"role": "user", "content": test_question}
 ]
 
-response = openai.chat.completions.create(
+response = CLIENT.create(
     model=MODEL,
     messages=messages,
     temperature=0.7
@@ -105,7 +105,7 @@ messages = [
     {"role": "user", "content": test_question}
 ]
 
-response = openai.chat.completions.create(
+response = CLIENT.create(
     model=MODEL,
     messages=messages,
     temperature=0.7
@@ -127,7 +127,7 @@ messages = [
     {"role": "user", "content": test_question}
 ]
 
-response1 = openai.chat.completions.create(
+response1 = CLIENT.create(
     model=MODEL,
     messages=messages,
     temperature=0.7
@@ -144,7 +144,7 @@ messages.append({
     "content": "Are you sure? Please think carefully again and ensure it's correct. If you find issues, please correct them. If you're confident it's correct, please restate your answer and indicate your confidence level."
 })
 
-response2 = openai.chat.completions.create(
+response2 = CLIENT.create(
     model=MODEL,
     messages=messages,
     temperature=0.7
@@ -189,7 +189,7 @@ messages = [
     {"role": "user", "content": test_question}
 ]
 
-response = openai.chat.completions.create(
+response = CLIENT.create(
     model=MODEL,
     messages=messages,
     temperature=0.7
@@ -4,6 +4,7 @@ Allows users to directly test the confidence protocol
 """
 
 from confidence_protocol import ConfidenceProtocol, ConfidenceLevel
+from strategy_fanout import fan_out
 import sys
 import os
 
@@ -22,6 +23,7 @@ Available strategies:
 2. Auto Verification - Automatically trigger verification based on confidence (recommended)
 3. Chain of Verification - Systematic verification (suitable for complex questions)
 4. Comparison Test - Use multiple strategies simultaneously for comparison
+5. Streaming - Auto verification with the answer printed as it is generated
 
 Type 'quit' or 'exit' to exit the program
 Type 'help' to view help
@@ -56,24 +58,33 @@ def compare_strategies(protocol, question):
     print("🔬 Strategy Comparison Test")
     print("="*100)
     
+    # The three strategies are independent, so run them at the same time
+    print("\n⏳ Running all strategies in parallel...")
+    report = fan_out([
+        ("Basic Strategy", lambda: protocol.ask(question, auto_verify=False)),
+        ("Auto Verification", lambda: protocol.ask(question, auto_verify=True)),
+        ("Chain of Verification", lambda: protocol.ask_with_chain_of_verification(question)),
+    ])
+    for task in report.results:
+        if task.error is not None:
+            raise task.error
+    answer1, answer2, answer3 = (task.value for task in report.results)
+    
     # Strategy 1: Basic
     print("\n[Strategy 1: Basic Strategy]")
     print("Quick answer, no additional verification...")
-    answer1 = protocol.ask(question, auto_verify=False)
     print(f"Answer summary: {answer1.content[:200]}...")
     print(f"Confidence: {answer1.confidence}% | Tokens: {answer1.token_usage}")
     
     # Strategy 2: Auto verification
     print("\n[Strategy 2: Auto Verification Strategy]")
     print("Automatically trigger verification based on confidence...")
-    answer2 = protocol.ask(question, auto_verify=True)
     print(f"Answer summary: {answer2.content[:200]}...")
     print(f"Confidence: {answer2.confidence}% | Tokens: {answer2.token_usage}")
     
     # Strategy 3: Chain of verification
     print("\n[Strategy 3: Chain of Verification Strategy]")
     print("Systematically generate verification questions and cross-check...")
-    answer3 = protocol.ask_with_chain_of_verification(question)
     print(f"Answer summary: {answer3.content[:200]}...")
     print(f"Confidence: {answer3.confidence}% | Tokens: {answer3.token_usage}")
     
@@ -87,6 +98,9 @@ def compare_strategies(protocol, question):
     print(f"{'Basic Strategy':<20} {answer1.confidence:>6.1f}%        {answer1.token_usage:>8}        {1.0:>6.1f}x")
     print(f"{'Auto Verification':<20} {answer2.confidence:>6.1f}%        {answer2.token_usage:>8}        {answer2.token_usage/base_tokens:>6.1f}x")
     print(f"{'Chain of Verification':<20} {answer3.confidence:>6.1f}%        {answer3.token_usage:>8}        {answer3.token_usage/base_tokens:>6.1f}x")
+    
+    print("\n⏱️  Latency")
+    print(report.timing_table())
 
 def interactive_mode():
     """Interactive mode"""
@@ -122,8 +136,9 @@ def interactive_mode():
             print("2. Auto Verification (recommended)")
             print("3. Chain of Verification (deep)")
             print("4. Comparison Test (comprehensive)")
+            print("5. Streaming (auto verification, live output)")
             
-            choice = input("\nChoice (1-4, default 2): ").strip() or "2"
+            choice = input("\nChoice (1-5, default 2): ").strip() or "2"
             
             if choice == "1":
                 print("\n⏳ Answering using basic strategy...")
@@ -143,6 +158,12 @@ def interactive_mode():
             elif choice == "4":
                 compare_strategies(protocol, question)
                 
+            elif choice == "5":
+                print("\n⏳ Streaming answer (verification starts as soon as low confidence is detected)...\n")
+                answer = protocol.ask(question, auto_verify=True,
+                                      on_chunk=lambda text: print(text, end="", flush=True))
+                print_answer(answer)
+                
             else:
                 print("❌ Invalid choice, using default strategy (auto verification)")
                 answer = protocol.ask(question, auto_verify=True)
@@ -0,0 +1,369 @@
+"""
+LLM Clients
+Client abstraction used by ConfidenceProtocol and every strategy function.
+
+A client exposes create(**kwargs) and async acreate(**kwargs) with the same
+parameters and return type as openai.chat.completions.create.
+
+- OpenAIChatClient: the real API, through an owned connection pool (keep-alive,
+  optional HTTP/2, explicit timeouts) instead of the module-global openai client
+- MockChatClient: network-free stand-in that replays answers recorded in a
+  results file (e.g. comprehensive_test_results.json) or produces synthetic
+  answers, with configurable latency and token counts
+
+Select the backend for the experiment scripts with LLM_BACKEND=mock.
+
+openai and httpx are imported on first use (the first API client built or
+mock response returned), not with this module: importing them costs several
+hundred milliseconds, which offline users (parsing, grading, replaying
+stored results) and every worker process would otherwise pay at startup.
+"""
+
+import asyncio
+import importlib.util
+import os
+import random
+import time
+import zlib
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from metrics import MetricsRegistry, get_metrics
+from result_log import iter_result_entries
+
+if TYPE_CHECKING:
+    import openai
+
+# HTTP/2 support for httpx (pip install "httpx[http2]"); checked without importing h2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ChatClient:
+    """Base class: subclasses implement create() and acreate()"""
+
+    def create(self, **kwargs):
+        raise NotImplementedError
+
+    async def acreate(self, **kwargs):
+        raise NotImplementedError
+
+
+class OpenAIChatClient(ChatClient):
+    """
+    OpenAI API client with its own connection pool
+
+    Connections are kept alive and reused across calls (and multiplexed over
+    HTTP/2 when the h2 package is installed), so concurrent batches do not pay
+    a TCP/TLS handshake per request. Nothing is read from or written to the
+    module-global openai configuration.
+
+    Connection errors, timeouts and 5xx responses are retried here; 429
+    responses are raised straight away so the RateLimiter that wraps the
+    call sees them and backs off (the openai client's own retries, which
+    would also retry 429s, are disabled).
+    """
+
+    def __init__(self, api_key: Optional[str] = None,
+                 base_url: Optional[str] = None,
+                 timeout: float = 60.0,
+                 connect_timeout: float = 5.0,
+                 max_connections: int = 100,
+                 max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 30.0,
+                 http2: bool = True,
+                 max_retries: int = 2,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            api_key: OpenAI API key (None = OPENAI_API_KEY)
+            base_url: API base URL (None = OPENAI_BASE_URL or the public API)
+            timeout: Seconds to wait for a response
+            connect_timeout: Seconds to wait for a new connection
+            max_connections: Maximum open connections in the pool
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept open
+            http2: Use HTTP/2 when the h2 package is installed (HTTP/1.1 keep-alive otherwise)
+            max_retries: Retries after connection errors, timeouts and 5xx responses
+                (not 429s: those are retried by the RateLimiter)
+            metrics: Registry that retries are counted in; defaults to the process-wide one
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_retries = max_retries
+        self.metrics = metrics or get_metrics()
+        # Built on first use, so a missing API key only fails when a call is made
+        self._client = None
+        # The async client is bound to the event loop it was created in
+        self._async_client = None
+        self._async_loop = None
+
+    def _http_options(self) -> Dict:
+        """Pool settings for httpx.Client / httpx.AsyncClient (imports httpx)"""
+        import httpx
+
+        return dict(
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_keepalive_connections,
+                                keepalive_expiry=self.keepalive_expiry),
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            http2=self.http2,
+            follow_redirects=True,
+        )
+
+    def _client_options(self, http_options: Dict) -> Dict:
+        return dict(api_key=self.api_key, base_url=self.base_url,
+                    timeout=http_options["timeout"], max_retries=0)
+
+    @property
+    def client(self) -> "openai.OpenAI":
+        if self._client is None:
+            import httpx
+            import openai
+
+            http_options = self._http_options()
+            self._client = openai.OpenAI(http_client=httpx.Client(**http_options),
+                                         **self._client_options(http_options))
+        return self._client
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after error, or None to raise it"""
+        if attempt >= self.max_retries or not is_transient_error(error):
+            return None
+        self.metrics.inc("llm_retries_total", reason="server_error")
+        return min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.75, 1.25)
+
+    def create(self, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def acreate(self, **kwargs):
+        attempt = 0
+        while True:
+            try:
+                return await self._get_async_client().chat.completions.create(**kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _get_async_client(self) -> "openai.AsyncOpenAI":
+        """Async client of the running event loop (it is bound to the loop it was created in)"""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            import httpx
+            import openai
+
+            http_options = self._http_options()
+            self._async_client = openai.AsyncOpenAI(http_client=httpx.AsyncClient(**http_options),
+                                                    **self._client_options(http_options))
+            self._async_loop = loop
+        return self._async_client
+
+    def close(self):
+        """Close the pooled connections"""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def __enter__(self) -> "OpenAIChatClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Connection error, timeout or 5xx response (429s are not: see RateLimiter)"""
+    import openai
+
+    if isinstance(error, openai.APIConnectionError):  # Includes APITimeoutError
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and status_code >= 500
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+class MockChatClient(ChatClient):
+    """
+    Offline stand-in for the OpenAI API
+
+    Answers are looked up by question (the first user message). Within a
+    conversation, each round replays the next recorded answer. Questions
+    without recordings get a synthetic answer in the protocol's format.
+    """
+
+    def __init__(self, recordings: Optional[Dict[str, List[str]]] = None,
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 prompt_tokens: Optional[int] = None,
+                 completion_tokens: Optional[int] = None,
+                 synthetic_confidence: float = 85.0,
+                 seed: int = 0):
+        """
+        Initialize mock client
+
+        Args:
+            recordings: question -> recorded answer texts, replayed round by round
+            latency: Simulated seconds per call
+            latency_jitter: Extra uniformly random seconds per call (0 to this value)
+            prompt_tokens: Fixed prompt tokens per call (None = estimate from the messages)
+            completion_tokens: Fixed completion tokens per call (None = estimate from the answer)
+            synthetic_confidence: Confidence stated in synthetic answers
+            seed: Seed for the latency jitter
+        """
+        self.recordings = recordings or {}
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.synthetic_confidence = synthetic_confidence
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.total_tokens = 0
+
+    @classmethod
+    def from_results_file(cls, path: str = "comprehensive_test_results.json", **kwargs) -> "MockChatClient":
+        """Build a replay client from a results file (.jsonl log or .json array) written by the experiment scripts"""
+        recordings: Dict[str, List[str]] = {}
+        for case_result in iter_result_entries(path):
+            question = case_result.get("case", {}).get("question") or case_result.get("question")
+            strategies = case_result.get("strategies", {}).values() if "strategies" in case_result \
+                else case_result.get("results", [])
+            texts = recordings.setdefault(question, [])
+            for strategy_result in strategies:
+                for field in ("first_answer", "second_answer", "final_answer"):
+                    if strategy_result.get(field):
+                        texts.append(strategy_result[field])
+                if "first_answer" not in strategy_result and strategy_result.get("answer"):
+                    texts.append(strategy_result["answer"])
+        return cls(recordings=recordings, **kwargs)
+
+    def _answer(self, messages: List[Dict], sample: int = 0) -> str:
+        """Pick the answer for this conversation state (sample = index among n choices)"""
+        question = next((m["content"] for m in messages if m["role"] == "user"), "")
+        round_index = sum(1 for m in messages if m["role"] == "assistant")
+        texts = self.recordings.get(question)
+        if texts:
+            # Different system prompts start at different recordings, deterministically;
+            # further samples of the same request replay the following recordings
+            start = zlib.crc32(messages[0]["content"].encode("utf-8")) if messages else 0
+            return texts[(start + round_index + sample) % len(texts)]
+        return (f"[Thinking]: Synthetic answer for offline benchmarking.\n"
+                f"[Answer]: Synthetic answer {zlib.crc32(question.encode('utf-8')) % 1000}\n"
+                f"[Confidence]: {self.synthetic_confidence:g}%\n"
+                f"[Confidence Reason]: Mock backend")
+
+    def _delay(self) -> float:
+        return self.latency + (self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0)
+
+    def _usage(self, messages: List[Dict], contents: List[str]) -> Dict:
+        prompt_tokens = self.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = sum(estimate_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = self.completion_tokens
+        if completion_tokens is None:
+            completion_tokens = sum(estimate_tokens(content) for content in contents)
+        else:
+            completion_tokens *= len(contents)
+
+        self.calls += 1
+        self.total_tokens += prompt_tokens + completion_tokens
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    def _completion(self, messages: List[Dict], n: int = 1, **kwargs):
+        from openai.types.chat import ChatCompletion
+
+        contents = [self._answer(messages, sample) for sample in range(n)]
+        usage = self._usage(messages, contents)
+        return ChatCompletion.model_validate({
+            "id": f"mock-{self.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": kwargs.get("model", "mock"),
+            "choices": [
+                {"index": i, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": content}}
+                for i, content in enumerate(contents)
+            ],
+            "usage": usage,
+        })
+
+    def _stream(self, messages: List[Dict], stream_options: Optional[Dict] = None,
+                chunk_size: int = 16, **kwargs) -> Iterator:
+        """Yield the answer as ChatCompletionChunks, chunk_size characters at a time"""
+        from openai.types.chat import ChatCompletionChunk
+
+        content = self._answer(messages)
+        delay = self._delay()
+        pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+
+        def chunk(delta: Dict, finish_reason=None, usage=None):
+            return ChatCompletionChunk.model_validate({
+                "id": f"mock-{self.calls}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": kwargs.get("model", "mock"),
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                "usage": usage,
+            })
+
+        for piece in pieces:
+            if delay:
+                time.sleep(delay / len(pieces))
+            yield chunk({"content": piece})
+        yield chunk({}, finish_reason="stop")
+        if stream_options and stream_options.get("include_usage"):
+            yield chunk(None, usage=self._usage(messages, [content]))
+
+    def create(self, stream: bool = False, **kwargs):
+        if stream:
+            return self._stream(**kwargs)
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self._completion(**kwargs)
+
+    async def acreate(self, stream: bool = False, **kwargs):
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self._completion(**kwargs)
+
+
+def client_from_env() -> ChatClient:
+    """
+    Client selected by environment variables
+
+    LLM_BACKEND=mock uses MockChatClient replaying MOCK_RESULTS_PATH
+    (default comprehensive_test_results.json) with MOCK_LATENCY seconds per call;
+    anything else uses the OpenAI API.
+    """
+    if os.environ.get("LLM_BACKEND", "openai").lower() == "mock":
+        return MockChatClient.from_results_file(
+            os.environ.get("MOCK_RESULTS_PATH", "comprehensive_test_results.json"),
+            latency=float(os.environ.get("MOCK_LATENCY", "0")),
+        )
+    return OpenAIChatClient()
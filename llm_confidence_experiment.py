@@ -3,212 +3,103 @@ LLM Confidence and Accuracy Improvement Experiment
 Test different prompt strategies to reduce hallucinations and improve answer quality
 """
 
-import openai
 import json
-import os
-from typing import Dict, List, Tuple
+from typing import Dict, Optional
 from datetime import datetime
 
-# Set API key
-openai.api_key = os.environ.get("OPENAI_API_KEY", "your-api-key-here")
+from llm_client import client_from_env
+from rate_limiter import get_shared_limiter
+from response_cache import cache_from_env
+from result_log import ResultLog
+from run_checkpoint import CaseCheckpoint, RunCheckpoint
+from strategy_registry import StrategyEngine
+from strategy_fanout import fan_out
+from transcript_archive import CaseTranscript, TranscriptWriter
 
 # Model to use
 MODEL = "gpt-4o-mini"
 
+# Chat client (set LLM_BACKEND=mock to run offline against recorded answers)
+CLIENT = client_from_env()
+
+# Shared RPM/TPM scheduler
+LIMITER = get_shared_limiter()
+
+# Response cache (set RESPONSE_CACHE_PATH to reuse responses across runs)
+CACHE = cache_from_env()
+
+# Runs the strategies declared in strategy_registry
+ENGINE = StrategyEngine(CLIENT, LIMITER, CACHE, model=MODEL)
+
+
 class ConfidenceProtocol:
     """Implement different confidence and accuracy improvement protocols"""
     
     @staticmethod
-    def strategy_baseline(question: str) -> Dict:
-        """Strategy 1: Basic Strategy - Direct answer"""
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant. Please answer the user's question."},
-            {"role": "user", "content": question}
-        ]
-        
-        response = openai.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7
-        )
-        
+    def _run(strategy: str, question: str, checkpoint: Optional[CaseCheckpoint] = None,
+             transcript: Optional[CaseTranscript] = None) -> Dict:
+        """Run a registered strategy and return the result dict used by run_experiment"""
+        result = ENGINE.run(strategy, question, checkpoint, transcript)
         return {
-            "strategy": "Basic Strategy",
-            "answer": response.choices[0].message.content,
-            "total_tokens": response.usage.total_tokens
+            "strategy": result.label,
+            "answer": result.answer,
+            "total_tokens": result.tokens,
+            **result.usage_fields()
         }
     
     @staticmethod
-    def strategy_with_confidence(question: str) -> Dict:
+    def strategy_baseline(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                          transcript: Optional[CaseTranscript] = None) -> Dict:
+        """Strategy 1: Basic Strategy - Direct answer"""
+        return ConfidenceProtocol._run("baseline", question, checkpoint, transcript)
+    
+    @staticmethod
+    def strategy_with_confidence(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                                 transcript: Optional[CaseTranscript] = None) -> Dict:
         """Strategy 2: Answer with confidence"""
-        system_prompt = """You are a helpful AI assistant. When answering questions, you need to:
-1. Give your answer
-2. Assess your confidence in this answer (0-100%)
-3. Briefly explain your confidence source (based on certain knowledge, reasoning, or uncertain information)
-
-Please answer in the following format:
-[Answer]: (Your answer)
-[Confidence]: (0-100%)
-[Confidence Explanation]: (Why this confidence level)
-"""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question}
-        ]
-        
-        response = openai.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7
-        )
-        
-        return {
-            "strategy": "Confidence Strategy",
-            "answer": response.choices[0].message.content,
-            "total_tokens": response.usage.total_tokens
-        }
+        return ConfidenceProtocol._run("with_confidence", question, checkpoint, transcript)
     
     @staticmethod
-    def strategy_self_reflection(question: str) -> Dict:
+    def strategy_self_reflection(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                                 transcript: Optional[CaseTranscript] = None) -> Dict:
         """Strategy 3: Self-reflection strategy - Internal questioning before answering"""
-        system_prompt = """You are a rigorous AI assistant. When answering questions, follow this thinking process:
-
-1. **Preliminary Answer**: First give your initial reaction answer
-2. **Self-Questioning**: Question your answer, ask yourself "Am I sure?" "Did I miss anything?" "Are there other possibilities?"
-3. **Re-verification**: Based on questioning, rethink and verify your answer
-4. **Final Answer**: Give a well-considered final answer and confidence
-
-Please answer in the following format:
-[Thinking Process]:
-- Preliminary answer: ...
-- Self-questioning: ...
-- Re-verification: ...
-
-[Final Answer]: (Your answer)
-[Confidence]: (0-100%)
-"""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question}
-        ]
-        
-        response = openai.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7
-        )
-        
-        return {
-            "strategy": "Self-Reflection Strategy",
-            "answer": response.choices[0].message.content,
-            "total_tokens": response.usage.total_tokens
-        }
+        return ConfidenceProtocol._run("self_reflection_guided", question, checkpoint, transcript)
     
     @staticmethod
-    def strategy_multi_turn_verification(question: str) -> Dict:
+    def strategy_multi_turn_verification(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                                         transcript: Optional[CaseTranscript] = None) -> Dict:
         """Strategy 4: Multi-turn verification strategy - Automatic challenge verification"""
-        # Round 1: Initial answer
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant. Please answer the user's question and assess your confidence (0-100%) at the end."},
-            {"role": "user", "content": question}
-        ]
-        
-        response1 = openai.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7
-        )
-        
-        first_answer = response1.choices[0].message.content
-        messages.append({"role": "assistant", "content": first_answer})
-        
-        # Round 2: Challenge confirmation
-        messages.append({
-            "role": "user", 
-            "content": "Are you sure? Please think carefully again and ensure it's correct. If you find issues, please correct them. If you're confident it's correct, please restate your answer."
-        })
-        
-        response2 = openai.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7
-        )
-        
-        second_answer = response2.choices[0].message.content
-        messages.append({"role": "assistant", "content": second_answer})
-        
-        # Round 3: Final confirmation
-        messages.append({
-            "role": "user",
-            "content": "Final confirmation, please give your final answer and confidence (0-100%)."
-        })
-        
-        response3 = openai.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7
-        )
-        
-        final_answer = response3.choices[0].message.content
-        
-        total_tokens = response1.usage.total_tokens + response2.usage.total_tokens + response3.usage.total_tokens
-        
+        result = ENGINE.run("multi_turn_verification", question, checkpoint, transcript)
+        first, second, final = result.rounds
         return {
-            "strategy": "Multi-turn Verification Strategy",
-            "first_answer": first_answer,
-            "second_answer": second_answer,
-            "final_answer": final_answer,
-            "answer": final_answer,
-            "total_tokens": total_tokens,
-            "conversation": messages
+            "strategy": result.label,
+            "first_answer": first,
+            "second_answer": second,
+            "final_answer": final,
+            "answer": final,
+            "total_tokens": result.tokens,
+            **result.usage_fields(),
+            "conversation": result.conversation
         }
     
     @staticmethod
-    def strategy_chain_of_verification(question: str) -> Dict:
+    def strategy_chain_of_verification(question: str, checkpoint: Optional[CaseCheckpoint] = None,
+                                       transcript: Optional[CaseTranscript] = None) -> Dict:
         """Strategy 5: Chain of verification strategy - Systematically generate verification questions"""
-        system_prompt = """You are a rigorous AI assistant. When answering questions, please follow the "Chain of Verification" method:
+        return ConfidenceProtocol._run("chain_of_verification", question, checkpoint, transcript)
 
-1. **Baseline Answer**: Give preliminary answer
-2. **Generate Verification Questions**: List 2-3 questions that can verify your answer
-3. **Answer Verification Questions**: Answer these verification questions independently
-4. **Cross-Check**: Check if verification answers are consistent with baseline answer
-5. **Final Answer**: Based on verification results, give corrected final answer
 
-Please answer in the following format:
-[Baseline Answer]: ...
-[Verification Questions]:
-1. ...
-2. ...
-[Verification Answers]:
-1. ...
-2. ...
-[Cross-Check]: ...
-[Final Answer]: ...
-[Confidence]: (0-100%)
-"""
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": question}
-        ]
-        
-        response = openai.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7
-        )
-        
-        return {
-            "strategy": "Chain of Verification Strategy",
-            "answer": response.choices[0].message.content,
-            "total_tokens": response.usage.total_tokens
-        }
-
-
-def run_experiment(question: str):
-    """Run experiment with all strategies"""
+def run_experiment(question: str, parallel: bool = True, checkpoint: Optional[CaseCheckpoint] = None,
+                   transcript: Optional[CaseTranscript] = None):
+    """
+    Run experiment with all strategies
+    
+    Args:
+        question: Question to ask
+        parallel: Run the strategies concurrently (results keep strategy order)
+        checkpoint: Finished rounds of this question from an interrupted run (None: start fresh)
+        transcript: Archive every round of this question under its case id (None: not archived)
+    """
     print(f"\n{'='*80}")
     print(f"Question: {question}")
     print(f"{'='*80}\n")
@@ -221,16 +112,26 @@ def run_experiment(question: str):
         ConfidenceProtocol.strategy_chain_of_verification
     ]
     
+    # The strategies are independent: run them all at once, then report in order
+    report = fan_out(
+        [(strategy.__name__.replace('strategy_', '').replace('_', ' ').title(),
+          lambda strategy=strategy: strategy(question, checkpoint, transcript))
+         for strategy in strategies],
+        max_workers=None if parallel else 1
+    )
+    
     results = []
     
-    for strategy in strategies:
+    for strategy, task in zip(strategies, report.results):
         print(f"\n{'-'*80}")
-        strategy_name = strategy.__name__.replace('strategy_', '').replace('_', ' ').title()
-        print(f"Testing: {strategy_name}")
+        print(f"Testing: {task.name}")
         print(f"{'-'*80}")
         
         try:
-            result = strategy(question)
+            if task.error is not None:
+                raise task.error
+            result = task.value
+            result["wall_seconds"] = round(task.seconds, 3)
             results.append(result)
             
             print(f"\nStrategy: {result['strategy']}")
@@ -247,7 +148,11 @@ def run_experiment(question: str):
             
         except Exception as e:
             print(f"Error: {str(e)}")
-            results.append({"strategy": strategy.__doc__, "error": str(e)})
+            results.append({"strategy": strategy.__doc__, "error": str(e),
+                            "wall_seconds": round(task.seconds, 3)})
+    
+    print(f"\n{'-'*80}")
+    print(report.timing_table())
     
     return results
 
@@ -287,19 +192,29 @@ def main():
     choice = input("\nPlease choose (1 or 2): ").strip()
     
     if choice == "1":
-        all_results = []
-        for question in TEST_QUESTIONS:
-            results = run_experiment(question)
-            all_results.append({
-                "question": question,
-                "results": results
-            })
-            print("\n" + "="*80 + "\n")
-        
-        # Save results
-        with open("/Users/zeyu/research/experiment_results.json", "w", encoding="utf-8") as f:
-            json.dump(all_results, f, ensure_ascii=False, indent=2)
-        print(f"\nExperiment results saved to: /Users/zeyu/research/experiment_results.json")
+        # One JSON line per question, written as soon as it completes
+        output_file = "/Users/zeyu/research/experiment_results.jsonl"
+        # Finished (question, strategy, round) triples; a rerun after an interruption reuses them
+        checkpoint = RunCheckpoint("/Users/zeyu/research/experiment_checkpoint.jsonl")
+        # Every round's messages, indexed by (run, question number, strategy, round) for later inspection
+        transcripts = TranscriptWriter("/Users/zeyu/research/experiment_transcripts.bin",
+                                       run_id=datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
+        if checkpoint.restored_rounds:
+            print(f"Resuming: {checkpoint.restored_rounds} finished rounds restored from {checkpoint.path}")
+        with ResultLog(output_file, append=False) as log:
+            for index, question in enumerate(TEST_QUESTIONS, 1):
+                results = run_experiment(question, checkpoint=checkpoint.case(index),
+                                         transcript=transcripts.case(index))
+                log.write({
+                    "question": question,
+                    "results": results
+                })
+                print("\n" + "="*80 + "\n")
+        transcripts.close()
+        # Run complete: the next run starts fresh
+        checkpoint.clear()
+        print(f"\nExperiment results saved to: {output_file}")
+        print(f"Transcripts: {transcripts.path} (run {transcripts.run_id}, {transcripts.rounds_written} rounds)")
         
     else:
         question = input("\nPlease enter your question: ").strip()
@@ -0,0 +1,271 @@
+"""
+Metrics
+In-process instrumentation of the API hot path, with Prometheus and
+OpenTelemetry exports.
+
+ConfidenceProtocol, RateLimiter and ResponseCache record into a MetricsRegistry (by default
+the process-wide one from get_metrics()):
+
+- llm_call_latency_seconds: histogram of each API attempt (limiter waits
+  excluded), labelled mode="complete"; streamed answers are timed as a whole
+  (mode="stream")
+- llm_prompt_tokens_total / llm_completion_tokens_total: tokens of API responses
+- llm_retries_total: attempts retried, by reason (rate_limit: after a 429, by the
+  RateLimiter; server_error: after a connection error, timeout or 5xx, by OpenAIChatClient)
+- llm_cache_requests_total: response cache lookups by result ("hit" / "miss")
+- confidence_parse_total: confidence extractions by source ("json", "text",
+  or "default" when nothing matched and 60.0 was used)
+
+Recording is a dict update under a lock, cheap next to an API call.
+summary() aggregates everything locally (e.g. for a benchmark);
+to_prometheus() renders the text exposition format and to_otlp() an
+OTLP/JSON metrics payload, without requiring either client library.
+
+Usage:
+    metrics = get_metrics()
+    protocol.ask(question)
+    print(metrics.summary()["llm_call_latency_seconds"])
+    open("metrics.prom", "w").write(metrics.to_prometheus())
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+
+# name -> (type, help text)
+METRICS = {
+    "llm_call_latency_seconds": (HISTOGRAM, "Latency of each chat completion attempt"),
+    "llm_prompt_tokens_total": (COUNTER, "Prompt tokens of API responses"),
+    "llm_completion_tokens_total": (COUNTER, "Completion tokens of API responses"),
+    "llm_retries_total": (COUNTER, "API attempts retried after a rate limit or server error"),
+    "llm_cache_requests_total": (COUNTER, "Response cache lookups by result"),
+    "confidence_parse_total": (COUNTER, "Confidence extractions by source (default = fell back to 60.0)"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Histogram:
+    """Bucketed observations of one label set"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket (NaN when empty)"""
+        if self.count == 0:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    # Open-ended +Inf bucket: report its lower bound
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """Labelled counters and histograms; thread-safe"""
+
+    def __init__(self, latency_buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        Initialize registry
+
+        Args:
+            latency_buckets: Ascending upper bounds of histogram buckets (seconds)
+        """
+        self.latency_buckets = tuple(latency_buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._start_time_ns = time.time_ns()
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        """Add to a counter"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str):
+        """Add an observation to a histogram"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.latency_buckets)
+            histogram.observe(value)
+
+    def value(self, name: str, **labels: str) -> float:
+        """Counter total over the series matching labels (all series if none given)"""
+        with self._lock:
+            return sum(v for key, v in self._counters.get(name, {}).items()
+                       if _matches(key, labels))
+
+    def reset(self):
+        """Drop everything recorded so far, e.g. between benchmark runs"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._start_time_ns = time.time_ns()
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Aggregate of everything recorded, for benchmarks and logs
+
+        Returns:
+            {counter name: {label string: total}} and
+            {histogram name: {label string: {count, mean, p50, p95, p99}}};
+            label string is e.g. 'source="default"' ("" without labels)
+        """
+        with self._lock:
+            result: Dict[str, Dict] = {}
+            for name, series in self._counters.items():
+                result[name] = {_label_text(key): total for key, total in series.items()}
+            for name, series in self._histograms.items():
+                result[name] = {
+                    _label_text(key): {
+                        "count": h.count,
+                        "mean": h.sum / h.count if h.count else float("nan"),
+                        "p50": h.quantile(0.50),
+                        "p95": h.quantile(0.95),
+                        "p99": h.quantile(0.99),
+                    }
+                    for key, h in series.items()
+                }
+            return result
+
+    def print_summary(self):
+        """Print summary() as a table"""
+        for name, series in sorted(self.summary().items()):
+            for labels, value in sorted(series.items()):
+                metric = f"{name}{{{labels}}}" if labels else name
+                if isinstance(value, dict):
+                    print(f"{metric:<60} n={value['count']:<7} mean={value['mean'] * 1000:.1f}ms "
+                          f"p50={value['p50'] * 1000:.1f}ms p95={value['p95'] * 1000:.1f}ms")
+                else:
+                    print(f"{metric:<60} {value:g}")
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(set(self._counters) | set(self._histograms)):
+                kind, help_text = METRICS.get(
+                    name, (HISTOGRAM if name in self._histograms else COUNTER, name))
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, total in sorted(self._counters.get(name, {}).items()):
+                    lines.append(f"{name}{_prom_labels(key)} {total:g}")
+                for key, h in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(self.latency_buckets + (math.inf,), h.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_prom_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_prom_labels(key)} {h.sum:g}")
+                    lines.append(f"{name}_count{_prom_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_otlp(self, service_name: str = "llm-confidence-protocol") -> Dict:
+        """
+        OTLP/JSON metrics payload (ExportMetricsServiceRequest)
+
+        Cumulative sums and explicit-bucket histograms, ready to POST to an
+        OpenTelemetry collector's /v1/metrics endpoint.
+        """
+        now = str(time.time_ns())
+        with self._lock:
+            start = str(self._start_time_ns)
+            metrics = []
+            for name, series in sorted(self._counters.items()):
+                metrics.append({
+                    "name": name,
+                    "description": METRICS.get(name, (COUNTER, ""))[1],
+                    "sum": {
+                        "aggregationTemporality": 2,  # CUMULATIVE
+                        "isMonotonic": True,
+                        "dataPoints": [{"attributes": _otlp_attributes(key),
+                                        "startTimeUnixNano": start, "timeUnixNano": now,
+                                        "asDouble": float(total)}
+                                       for key, total in sorted(series.items())],
+                    },
+                })
+            for name, series in sorted(self._histograms.items()):
+                metrics.append({
+                    "name": name,
+                    "description": METRICS.get(name, (HISTOGRAM, ""))[1],
+                    "unit": "s",
+                    "histogram": {
+                        "aggregationTemporality": 2,
+                        "dataPoints": [{"attributes": _otlp_attributes(key),
+                                        "startTimeUnixNano": start, "timeUnixNano": now,
+                                        "count": str(h.count), "sum": h.sum,
+                                        "bucketCounts": [str(c) for c in h.counts],
+                                        "explicitBounds": list(self.latency_buckets)}
+                                       for key, h in sorted(series.items())],
+                    },
+                })
+        return {"resourceMetrics": [{
+            "resource": {"attributes": _otlp_attributes((("service.name", service_name),))},
+            "scopeMetrics": [{"scope": {"name": "confidence_protocol"}, "metrics": metrics}],
+        }]}
+
+
+def _matches(key: LabelKey, labels: Dict[str, str]) -> bool:
+    items = dict(key)
+    return all(items.get(k) == v for k, v in labels.items())
+
+
+def _label_text(key: LabelKey) -> str:
+    return ",".join(f'{k}="{v}"' for k, v in key)
+
+
+def _prom_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+def _escape(value: str) -> str:
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _otlp_attributes(key: LabelKey) -> List[Dict]:
+    return [{"key": k, "value": {"stringValue": str(v)}} for k, v in key]
+
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get the process-wide registry that protocols and limiters record into"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = MetricsRegistry()
+    return _metrics
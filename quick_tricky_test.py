@@ -1,8 +1,8 @@
 """Quick test of most tricky cases"""
-import openai
-import os
 
-openai.api_key = os.environ.get("OPENAI_API_KEY", "your-key")
+from llm_client import client_from_env
+
+CLIENT = client_from_env()
 MODEL = "gpt-4o-mini"
 
 # Test the hardest 3 cases
@@ -35,7 +35,7 @@ for case in test_cases:
     
     # Basic strategy
     print("\n[BASIC STRATEGY]")
-    response = openai.chat.completions.create(
+    response = CLIENT.create(
         model=MODEL,
         messages=[
             {"role": "system", "content": "You are a helpful AI assistant."},
@@ -47,7 +47,7 @@ for case in test_cases:
     
     # Self-reflection
     print("\n[SELF-REFLECTION STRATEGY]")
-    response = openai.chat.completions.create(
+    response = CLIENT.create(
         model=MODEL,
         messages=[
             {"role": "system", "content": """You are careful. This question is tricky. 
@@ -0,0 +1,232 @@
+"""
+Adaptive Rate Limiter
+Token-bucket scheduler for requests-per-minute (RPM) and tokens-per-minute (TPM)
+budgets, shared by ConfidenceProtocol and every experiment script.
+
+How it works:
+1. Two buckets refill continuously at RPM/60 and TPM/60 per second
+2. Before each call, one request and the *estimated* token cost are reserved
+3. After each call, the estimate is corrected with the real usage.total_tokens
+4. On a 429 response, the refill rate is cut in half and calls pause for the
+   retry-after interval; the rate then recovers gradually on success
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from metrics import MetricsRegistry, get_metrics
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check whether an exception is a 429 response"""
+    return getattr(error, "status_code", None) == 429
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the retry-after header from a 429 response, if present"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Token-bucket scheduler with adaptive backoff
+
+    Thread-safe and usable from both sync and async code. Use call()/acall()
+    to run a chat completion under the limiter, or wrap() to get a drop-in
+    replacement for openai.chat.completions.create.
+    """
+
+    def __init__(self, requests_per_minute: float = 500,
+                 tokens_per_minute: float = 200000,
+                 max_retries: int = 5,
+                 initial_token_estimate: int = 500,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Initialize rate limiter
+
+        Args:
+            requests_per_minute: Request quota (RPM)
+            tokens_per_minute: Token quota (TPM)
+            max_retries: How many times a call is retried after a 429 response
+            initial_token_estimate: Assumed cost of a call before any usage is observed
+            metrics: Registry that retries are counted in; defaults to the process-wide one
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.metrics = metrics or get_metrics()
+
+        self._lock = threading.Lock()
+        self._request_bucket = float(requests_per_minute)
+        self._token_bucket = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+
+        # Running average of usage.total_tokens per call
+        self._avg_tokens = float(initial_token_estimate)
+        # Fraction of the quota currently used as refill rate (lowered on 429)
+        self._rate_scale = 1.0
+
+        self.rate_limit_hits = 0
+        self.total_wait_seconds = 0.0
+
+    def estimate_tokens(self, messages: Optional[List[Dict]] = None) -> int:
+        """
+        Estimate what the next call will cost
+
+        Uses the running average of observed total_tokens, but never less than
+        a rough prompt size (4 characters per token) for long conversations.
+        """
+        estimate = self._avg_tokens
+        if messages:
+            prompt_chars = sum(len(m.get("content") or "") for m in messages)
+            estimate = max(estimate, prompt_chars / 4)
+        return int(estimate)
+
+    def _refill(self, now: float):
+        """Refill both buckets for the time elapsed since the last refill"""
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        scale = self._rate_scale
+        self._request_bucket = min(float(self.requests_per_minute),
+                                   self._request_bucket + elapsed * self.requests_per_minute * scale / 60)
+        self._token_bucket = min(float(self.tokens_per_minute),
+                                 self._token_bucket + elapsed * self.tokens_per_minute * scale / 60)
+
+    def _reserve(self, tokens: int) -> float:
+        """Try to reserve one request and the given tokens; return seconds to wait (0 if reserved)"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            # A single call larger than the whole bucket is allowed once the bucket is full
+            tokens = min(tokens, self.tokens_per_minute)
+            if self._request_bucket >= 1 and self._token_bucket >= tokens:
+                self._request_bucket -= 1
+                self._token_bucket -= tokens
+                return 0.0
+
+            request_wait = max(0.0, 1 - self._request_bucket) * 60 / (self.requests_per_minute * self._rate_scale)
+            token_wait = max(0.0, tokens - self._token_bucket) * 60 / (self.tokens_per_minute * self._rate_scale)
+            return max(request_wait, token_wait, 0.001)
+
+    def acquire(self, estimated_tokens: int):
+        """Block until the call fits in both budgets"""
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return
+            with self._lock:
+                self.total_wait_seconds += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, estimated_tokens: int):
+        """Async version of acquire()"""
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return
+            with self._lock:
+                self.total_wait_seconds += wait
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket with the real cost and let the rate recover"""
+        with self._lock:
+            self._token_bucket += estimated_tokens - actual_tokens
+            self._avg_tokens = 0.8 * self._avg_tokens + 0.2 * actual_tokens
+            self._rate_scale = min(1.0, self._rate_scale + 0.05)
+
+    def refund(self, estimated_tokens: int):
+        """Return the reserved tokens of a call that failed"""
+        with self._lock:
+            self._token_bucket += estimated_tokens
+
+    def record_rate_limit(self, retry_after: Optional[float] = None, attempt: int = 0):
+        """Back off after a 429: halve the refill rate and pause all calls"""
+        with self._lock:
+            self.rate_limit_hits += 1
+            self._rate_scale = max(0.1, self._rate_scale / 2)
+            pause = retry_after if retry_after is not None else min(60.0, 2 ** attempt)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+
+    def call(self, create_fn: Callable, **kwargs):
+        """Run create_fn(**kwargs) under the limiter, retrying on 429"""
+        estimated = self.estimate_tokens(kwargs.get("messages"))
+        for attempt in range(self.max_retries + 1):
+            self.acquire(estimated)
+            try:
+                response = create_fn(**kwargs)
+            except Exception as e:
+                self.refund(estimated)
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.record_rate_limit(_retry_after_seconds(e), attempt)
+                self.metrics.inc("llm_retries_total", reason="rate_limit")
+                continue
+            self.record_usage(estimated, _total_tokens(response, estimated))
+            return response
+
+    async def acall(self, create_fn: Callable, **kwargs):
+        """Async version of call()"""
+        estimated = self.estimate_tokens(kwargs.get("messages"))
+        for attempt in range(self.max_retries + 1):
+            await self.acquire_async(estimated)
+            try:
+                response = await create_fn(**kwargs)
+            except Exception as e:
+                self.refund(estimated)
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                self.record_rate_limit(_retry_after_seconds(e), attempt)
+                self.metrics.inc("llm_retries_total", reason="rate_limit")
+                continue
+            self.record_usage(estimated, _total_tokens(response, estimated))
+            return response
+
+    def wrap(self, create_fn: Callable) -> Callable:
+        """Return a create function that runs under this limiter"""
+        def create(**kwargs):
+            return self.call(create_fn, **kwargs)
+        return create
+
+
+def _total_tokens(response, default: int) -> int:
+    """Read usage.total_tokens from a response"""
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) or default
+
+
+_shared_limiter: Optional[RateLimiter] = None
+_shared_limiter_lock = threading.Lock()
+
+
+def get_shared_limiter() -> RateLimiter:
+    """Get the process-wide limiter shared by all strategies"""
+    global _shared_limiter
+    if _shared_limiter is None:
+        with _shared_limiter_lock:
+            if _shared_limiter is None:
+                _shared_limiter = RateLimiter()
+    return _shared_limiter
+
+
+def configure_shared_limiter(requests_per_minute: float, tokens_per_minute: float,
+                             **kwargs) -> RateLimiter:
+    """Replace the shared limiter, e.g. to match your account's quota tier"""
+    global _shared_limiter
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute, **kwargs)
+    with _shared_limiter_lock:
+        _shared_limiter = limiter
+    return limiter
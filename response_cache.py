@@ -0,0 +1,241 @@
+"""
+Response Cache
+Caches chat completion responses so reruns of the same test cases cost no
+latency and no tokens.
+
+The cache key is a canonical hash of (model, messages, sampling parameters).
+Two backends are provided:
+- MemoryLRUBackend: in-process LRU dictionary
+- SQLiteBackend: on-disk cache that survives between runs (e.g. in CI)
+
+Both support TTL and size-based eviction.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from metrics import MetricsRegistry, get_metrics
+
+
+def make_cache_key(**kwargs) -> str:
+    """Canonical hash of the request parameters (model, messages, temperature, ...)"""
+    canonical = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MemoryLRUBackend:
+    """In-memory LRU backend"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        """Return (stored_at, value) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, value: str) -> int:
+        """Store a value; return the number of evicted entries"""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """On-disk SQLite backend with least-recently-used eviction"""
+
+    def __init__(self, path: str = "response_cache.sqlite", max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "stored_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        """Return (stored_at, value) or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    "UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key)
+                )
+                self._conn.commit()
+            return row
+
+    def set(self, key: str, value: str) -> int:
+        """Store a value; return the number of evicted entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, last_access) "
+                "VALUES (?, ?, ?, ?)", (key, value, now, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            evicted = max(0, count - self.max_entries)
+            if evicted:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY last_access LIMIT ?)", (evicted,)
+                )
+            self._conn.commit()
+            return evicted
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def _serialize_response(response) -> str:
+    """Serialize a ChatCompletion to JSON"""
+    return json.dumps(response.model_dump(mode="json"), ensure_ascii=False)
+
+
+def _deserialize_response(value: str):
+    """Rebuild a ChatCompletion from JSON"""
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate(json.loads(value))
+
+
+class ResponseCache:
+    """
+    Response cache in front of chat completion calls
+
+    Usage:
+        cache = ResponseCache(SQLiteBackend("cache.sqlite"), ttl_seconds=86400)
+        response = cache.get_or_create(openai.chat.completions.create,
+                                       model=MODEL, messages=messages, temperature=0.7)
+    """
+
+    def __init__(self, backend=None, ttl_seconds: Optional[float] = None,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Initialize cache
+
+        Args:
+            backend: MemoryLRUBackend (default) or SQLiteBackend
+            ttl_seconds: Entries older than this are treated as misses (None = never expire)
+            metrics: Registry that lookups are counted in; defaults to the process-wide one
+        """
+        self.backend = backend if backend is not None else MemoryLRUBackend()
+        self.ttl_seconds = ttl_seconds
+        self.metrics = metrics or get_metrics()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Guards the counters: the cache is shared by concurrent threads and tasks
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return the cached response for a key, or None"""
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+            self.backend.delete(key)
+            self._count("evictions")
+            return None
+        return _deserialize_response(value)
+
+    def set(self, key: str, response):
+        """Store a response"""
+        self._count("evictions", self.backend.set(key, _serialize_response(response)))
+
+    def _count(self, counter: str, amount: int = 1):
+        """Add to the hits, misses or evictions counter"""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get_or_create(self, create_fn: Callable, **kwargs):
+        """Return the cached response for these parameters, or call create_fn(**kwargs) and cache it"""
+        key = make_cache_key(**kwargs)
+        response = self.get(key)
+        if response is not None:
+            self._count("hits")
+            self.metrics.inc("llm_cache_requests_total", result="hit")
+            return response
+        self._count("misses")
+        self.metrics.inc("llm_cache_requests_total", result="miss")
+        response = create_fn(**kwargs)
+        self.set(key, response)
+        return response
+
+    async def aget_or_create(self, create_fn: Callable, **kwargs):
+        """Async version of get_or_create()"""
+        key = make_cache_key(**kwargs)
+        response = self.get(key)
+        if response is not None:
+            self._count("hits")
+            self.metrics.inc("llm_cache_requests_total", result="hit")
+            return response
+        self._count("misses")
+        self.metrics.inc("llm_cache_requests_total", result="miss")
+        response = await create_fn(**kwargs)
+        self.set(key, response)
+        return response
+
+    def stats(self) -> Dict:
+        """Hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self.backend),
+        }
+
+
+def cache_from_env(env_var: str = "RESPONSE_CACHE_PATH") -> ResponseCache:
+    """On-disk cache if the environment variable names a path, otherwise in-memory"""
+    path = os.environ.get(env_var)
+    if path:
+        return ResponseCache(SQLiteBackend(path))
+    return ResponseCache(MemoryLRUBackend())
@@ -0,0 +1,127 @@
+"""
+Result Log
+Append-only JSON Lines sink for test results, written case by case.
+
+The test scripts used to collect every case in memory and json.dump the
+list at the end, so a crash near the end lost the whole run. ResultLog
+writes one JSON object per line as soon as a case completes and flushes it,
+so memory stays constant and everything finished before an interruption is
+on disk.
+
+Readers stream the file line by line. A last line without its newline is
+what an interrupted write leaves behind; it is skipped. iter_result_entries()
+reads these .jsonl logs, the older .json result arrays and result_store
+directories, so grading, routing and replay work on any of them.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterator
+
+
+class ResultLog:
+    """Append-only JSONL writer; one record per line, flushed on every write"""
+
+    def __init__(self, path: str, append: bool = True, fsync: bool = False):
+        """
+        Open a result log
+
+        Args:
+            path: .jsonl file to write
+            append: Keep existing records (False starts an empty file)
+            fsync: Also fsync after every record (survives power loss, slower)
+        """
+        self.path = path
+        self.fsync = fsync
+        self.records_written = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab" if append else "wb")
+        if append:
+            self._drop_partial_line()
+
+    def _drop_partial_line(self):
+        """Cut an unterminated last line (interrupted write) so new records start on a fresh line"""
+        size = self._file.seek(0, os.SEEK_END)
+        if size == 0:
+            return
+        with open(self.path, "rb") as f:
+            # Scan back from the end in blocks for the last newline
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                block = f.read(end - start)
+                if end == size and block.endswith(b"\n"):
+                    return
+                newline = block.rfind(b"\n")
+                if newline != -1:
+                    self._file.truncate(start + newline + 1)
+                    return
+                end = start
+        self._file.truncate(0)
+
+    def write(self, record: Dict):
+        """Append one record (e.g. a case with its strategy results)"""
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        with self._lock:
+            # One write per record, so an interruption can only truncate the last line
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.records_written += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self) -> "ResultLog":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """
+    Stream the records of a JSONL file
+
+    Args:
+        path: .jsonl file
+
+    Yields:
+        One dict per complete line (blank lines and an unterminated last line are skipped)
+
+    Raises:
+        ValueError: A complete line is not valid JSON
+    """
+    with open(path, "rb") as f:
+        for number, line in enumerate(f, 1):
+            if not line.endswith(b"\n"):
+                # Interrupted write; everything before it is intact
+                return
+            if line.isspace():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{number}: invalid JSON record ({e})") from e
+
+
+def iter_result_entries(path: str) -> Iterator[Dict]:
+    """Result entries of a .jsonl log, a legacy .json result array or a result_store directory"""
+    if os.path.isdir(path):
+        # Imported here: result_store builds on this module
+        from result_store import ResultStore
+        with ResultStore(path) as store:
+            yield from store.iter_entries()
+    elif path.endswith(".jsonl"):
+        yield from iter_jsonl(path)
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f)
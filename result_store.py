@@ -0,0 +1,463 @@
+"""
+Result Store
+Columnar, memory-mapped storage for large result archives.
+
+A result file repeats the full case dict (question, reference answers, ...)
+and strategy names in every entry, and json.load materialises all of it as
+Python objects. A ResultStore is a directory instead:
+
+    meta.json             interned tables: strategies, cases (each stored once)
+    entry_*.npy           per entry: case id, format, first row
+    strategy.npy ...      per strategy run: strategy id, tokens, prompt/completion/
+                          cached tokens, confidence, latency, present-field bits
+    answers.bin/.idx.npy  answer text, UTF-8 string heap + int64 offsets
+    extras.bin/.idx.npy   remaining fields of each run (first_answer, rounds, ...)
+                          as compact JSON, decoded only when asked for
+
+Columns are opened with np.load(mmap_mode="r") and heaps with mmap, so
+opening a store reads only meta.json; rows are decoded on access. Records
+are __slots__ views (store, row), not copies.
+
+ResultStoreWriter converts entries of either result format (comprehensive /
+advanced test: "case" + "strategies"; llm_confidence_experiment: "question"
++ "results") and Answer objects; iter_entries() rebuilds the original
+entries, so result_log.iter_result_entries() (and with it grading, routing
+and MockChatClient) reads a store like any result file.
+
+Usage:
+    python3 result_store.py convert results.jsonl [more.json ...] results_store
+    python3 result_store.py export results_store results.jsonl
+    python3 result_store.py info results_store
+"""
+
+import json
+import mmap
+import os
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from confidence_extractor import extract_confidence_or_none
+from result_log import ResultLog, iter_result_entries
+from round_usage import usage_fields
+
+STORE_VERSION = 1
+META_FILE = "meta.json"
+
+# Entry formats
+FORMAT_CASES = 0  # {"case": {...}, "strategies": {key: result}}
+FORMAT_RESULTS = 1  # {"question": ..., "results": [result with "strategy"]}
+
+# Result fields stored as columns besides answer and tokens (whose key depends
+# on the entry format); every other field goes to the extras heap as JSON
+_INT_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+_FLOAT_FIELDS = ("confidence", "latency")
+_TOKEN_KEYS = {FORMAT_CASES: "tokens", FORMAT_RESULTS: "total_tokens"}
+
+# Bits of the "present" column: which columnar fields the original result had
+_PRESENT_BITS = {name: 1 << i for i, name in
+                 enumerate(("answer", "tokens") + _INT_FIELDS + _FLOAT_FIELDS)}
+
+
+class _StringHeap:
+    """Append-only UTF-8 heap: strings back to back, offsets in a separate array"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path + ".bin", "wb")
+        self._offsets = array("q", [0])
+
+    def append(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        return len(self._offsets) - 2
+
+    def close(self):
+        self._file.close()
+        np.save(self.path + ".idx.npy", np.frombuffer(self._offsets, dtype=np.int64))
+
+
+class _MappedHeap:
+    """Read side of _StringHeap; slices the mmap, decoding only the requested string"""
+
+    def __init__(self, path: str):
+        self.offsets = _load_column(path + ".idx.npy")
+        self._file = open(path + ".bin", "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, index: int) -> str:
+        start, end = self.offsets[index:index + 2].tolist()
+        return self._data[start:end].decode("utf-8")
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+def _load_column(path: str) -> np.ndarray:
+    """Memory-mapped .npy column, as a plain ndarray view (np.memmap slicing is much slower)"""
+    column = np.load(path, mmap_mode="r")
+    # An empty array cannot be mapped
+    return column.view(np.ndarray) if column.size else np.load(path)
+
+
+class ResultStoreWriter:
+    """Builds a ResultStore directory; heaps stream to disk, columns are compact arrays until close()"""
+
+    def __init__(self, path: str):
+        """
+        Start a new store (an existing store at path is overwritten)
+
+        Args:
+            path: Store directory
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._strategies: Dict[str, int] = {}
+        self._cases: Dict[str, int] = {}  # Canonical JSON -> case id
+        self._case_list: List[Dict] = []
+
+        self._entry_case = array("i")
+        self._entry_format = array("B")
+        self._entry_start = array("q")
+        self._entry_extras = _StringHeap(os.path.join(path, "entry_extras"))
+
+        self._strategy = array("i")
+        self._tokens = array("q")
+        self._ints = {name: array("q") for name in _INT_FIELDS}
+        self._floats = {name: array("d") for name in _FLOAT_FIELDS}
+        self._present = array("B")
+        self._answers = _StringHeap(os.path.join(path, "answers"))
+        self._extras = _StringHeap(os.path.join(path, "extras"))
+
+    def __len__(self) -> int:
+        return len(self._strategy)
+
+    def _intern_case(self, case: Dict) -> int:
+        key = json.dumps(case, sort_keys=True, ensure_ascii=False)
+        code = self._cases.get(key)
+        if code is None:
+            code = self._cases[key] = len(self._case_list)
+            self._case_list.append(case)
+        return code
+
+    def _add_run(self, strategy: str, result: Dict, token_key: str):
+        present = 0
+        extras = {}
+        for key, value in result.items():
+            if key == "answer" and isinstance(value, str):
+                present |= _PRESENT_BITS["answer"]
+            elif key == token_key and isinstance(value, int):
+                present |= _PRESENT_BITS["tokens"]
+            elif key in _INT_FIELDS and isinstance(value, int):
+                present |= _PRESENT_BITS[key]
+            elif key in _FLOAT_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+                present |= _PRESENT_BITS[key]
+            else:
+                extras[key] = value
+
+        answer = result.get("answer") if present & _PRESENT_BITS["answer"] else ""
+        self._strategy.append(self._strategies.setdefault(strategy, len(self._strategies)))
+        self._tokens.append(result[token_key] if present & _PRESENT_BITS["tokens"] else 0)
+        for name in _INT_FIELDS:
+            self._ints[name].append(result[name] if present & _PRESENT_BITS[name] else 0)
+        for name in _FLOAT_FIELDS:
+            self._floats[name].append(float(result[name]) if present & _PRESENT_BITS[name] else np.nan)
+        if not present & _PRESENT_BITS["confidence"]:
+            # Not stored with the run: the confidence stated in the answer text
+            stated = extract_confidence_or_none(answer)
+            self._floats["confidence"][-1] = np.nan if stated is None else stated
+        self._present.append(present)
+        self._answers.append(answer)
+        self._extras.append(json.dumps(extras, ensure_ascii=False, separators=(",", ":")) if extras else "")
+
+    def add_entry(self, entry: Dict):
+        """Add one entry of a result file (either format)"""
+        if "strategies" in entry:
+            entry_format, case = FORMAT_CASES, entry.get("case", {})
+            runs = list(entry["strategies"].items())
+            rest = {k: v for k, v in entry.items() if k not in ("case", "strategies")}
+        else:
+            entry_format, case = FORMAT_RESULTS, {"question": entry.get("question", "")}
+            runs = [(r.get("strategy", ""), {k: v for k, v in r.items() if k != "strategy"})
+                    for r in entry.get("results", [])]
+            rest = {k: v for k, v in entry.items() if k not in ("question", "results")}
+
+        self._entry_case.append(self._intern_case(case))
+        self._entry_format.append(entry_format)
+        self._entry_start.append(len(self._strategy))
+        self._entry_extras.append(json.dumps(rest, ensure_ascii=False, separators=(",", ":")) if rest else "")
+        for strategy, result in runs:
+            self._add_run(strategy, result, _TOKEN_KEYS[entry_format])
+
+    def add_answers(self, question: str, answers: Sequence, case: Optional[Dict] = None):
+        """
+        Add ConfidenceProtocol Answers to one question, keyed by strategy_used
+
+        Args:
+            question: The question asked
+            answers: Answer objects
+            case: Full case dict (default {"question": question})
+        """
+        strategies = {}
+        for answer in answers:
+            strategies[answer.strategy_used or "answer"] = {
+                "answer": answer.content,
+                "confidence": answer.confidence,
+                "tokens": answer.token_usage,
+                **usage_fields(answer.rounds),
+                "reasoning": answer.reasoning,
+                "confidence_source": answer.confidence_source,
+            }
+        self.add_entry({"case": case or {"question": question}, "strategies": strategies})
+
+    def close(self):
+        """Write the columns and meta.json; the store is readable afterwards"""
+        def save(name: str, values: array, dtype):
+            np.save(os.path.join(self.path, name + ".npy"), np.frombuffer(values, dtype=dtype))
+
+        self._entry_start.append(len(self._strategy))
+        save("entry_case", self._entry_case, np.int32)
+        save("entry_format", self._entry_format, np.uint8)
+        save("entry_start", self._entry_start, np.int64)
+        save("strategy", self._strategy, np.int32)
+        save("tokens", self._tokens, np.int64)
+        for name, values in self._ints.items():
+            save(name, values, np.int64)
+        for name, values in self._floats.items():
+            save(name, values, np.float64)
+        save("present", self._present, np.uint8)
+        for heap in (self._answers, self._extras, self._entry_extras):
+            heap.close()
+
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": STORE_VERSION, "rows": len(self._strategy),
+                       "entries": len(self._entry_case),
+                       "strategies": list(self._strategies), "cases": self._case_list},
+                      f, ensure_ascii=False)
+
+    def __enter__(self) -> "ResultStoreWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ResultRecord:
+    """One strategy run of a ResultStore, read on access"""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: "ResultStore", row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def strategy(self) -> str:
+        return self.store.strategies[self.store.strategy[self.row]]
+
+    @property
+    def entry(self) -> int:
+        return int(np.searchsorted(self.store.entry_start, self.row, side="right")) - 1
+
+    @property
+    def case(self) -> Dict:
+        return self.store.cases[self.store.entry_case[self.entry]]
+
+    @property
+    def question(self) -> str:
+        return self.case.get("question", "")
+
+    @property
+    def answer(self) -> str:
+        return self.store.answers.get(self.row)
+
+    @property
+    def tokens(self) -> int:
+        return int(self.store.tokens[self.row])
+
+    @property
+    def confidence(self) -> Optional[float]:
+        value = float(self.store.confidence[self.row])
+        return None if np.isnan(value) else value
+
+    @property
+    def latency(self) -> Optional[float]:
+        value = float(self.store.latency[self.row])
+        return None if np.isnan(value) else value
+
+    def to_dict(self, token_key: str = "tokens") -> Dict:
+        """The run as it was stored in the result file"""
+        store, row = self.store, self.row
+        present = int(store.present[row])
+        result = {}
+        if present & _PRESENT_BITS["answer"]:
+            result["answer"] = self.answer
+        if present & _PRESENT_BITS["tokens"]:
+            result[token_key] = self.tokens
+        for name in _INT_FIELDS:
+            if present & _PRESENT_BITS[name]:
+                result[name] = int(store.columns[name][row])
+        for name in _FLOAT_FIELDS:
+            if present & _PRESENT_BITS[name]:
+                result[name] = float(store.columns[name][row])
+        extras = store.extras.get(row)
+        if extras:
+            result.update(json.loads(extras))
+        return result
+
+    def __repr__(self) -> str:
+        return f"ResultRecord(row={self.row}, strategy={self.strategy!r}, tokens={self.tokens})"
+
+
+class ResultStore:
+    """
+    Read-only view of a ResultStore directory
+
+    Usage:
+        store = ResultStore("results_store")
+        tokens = store.tokens[store.rows("multi_turn")].mean()
+        print(store[0].answer)
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a store (columns and heaps are memory-mapped, nothing else is read)
+
+        Args:
+            path: Store directory written by ResultStoreWriter
+        """
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"{path}: unsupported result store version {meta.get('version')}")
+        self.strategies: List[str] = meta["strategies"]
+        self.cases: List[Dict] = meta["cases"]
+
+        def column(name: str) -> np.ndarray:
+            return _load_column(os.path.join(path, name + ".npy"))
+
+        self.entry_case = column("entry_case")
+        self.entry_format = column("entry_format")
+        self.entry_start = column("entry_start")  # Entry i owns rows entry_start[i]:entry_start[i + 1]
+        self.strategy = column("strategy")
+        self.tokens = column("tokens")
+        self.columns = {name: column(name) for name in _INT_FIELDS + _FLOAT_FIELDS}
+        self.confidence = self.columns["confidence"]  # NaN = not stated
+        self.latency = self.columns["latency"]  # NaN = not recorded
+        self.present = column("present")
+        self.answers = _MappedHeap(os.path.join(path, "answers"))
+        self.extras = _MappedHeap(os.path.join(path, "extras"))
+        self.entry_extras = _MappedHeap(os.path.join(path, "entry_extras"))
+
+    def __len__(self) -> int:
+        return len(self.strategy)
+
+    def __getitem__(self, row: int) -> ResultRecord:
+        if not -len(self) <= row < len(self):
+            raise IndexError(row)
+        return ResultRecord(self, row % len(self))
+
+    def __iter__(self) -> Iterator[ResultRecord]:
+        return (ResultRecord(self, row) for row in range(len(self)))
+
+    def rows(self, strategy: Optional[str] = None) -> np.ndarray:
+        """Row indices, optionally only those of one strategy"""
+        if strategy is None:
+            return np.arange(len(self))
+        if strategy not in self.strategies:
+            return np.empty(0, dtype=np.int64)
+        return np.flatnonzero(self.strategy == self.strategies.index(strategy))
+
+    def iter_entries(self) -> Iterator[Dict]:
+        """Rebuild the result file entries, in order"""
+        for i in range(len(self.entry_case)):
+            case = self.cases[self.entry_case[i]]
+            records = (ResultRecord(self, row) for row in range(self.entry_start[i], self.entry_start[i + 1]))
+            if self.entry_format[i] == FORMAT_CASES:
+                entry = {"case": case, "strategies": {r.strategy: r.to_dict() for r in records}}
+            else:
+                entry = {"question": case.get("question", ""),
+                         "results": [{"strategy": r.strategy, **r.to_dict("total_tokens")} for r in records]}
+            extras = self.entry_extras.get(i)
+            if extras:
+                entry.update(json.loads(extras))
+            yield entry
+
+    def close(self):
+        for heap in (self.answers, self.extras, self.entry_extras):
+            heap.close()
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_result_store(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def convert(paths: Sequence[str], store_path: str) -> int:
+    """Convert result files (.jsonl logs or .json arrays) into one store; returns the row count"""
+    with ResultStoreWriter(store_path) as writer:
+        for path in paths:
+            for entry in iter_result_entries(path):
+                writer.add_entry(entry)
+        return len(writer)
+
+
+def export(store_path: str, output_path: str) -> int:
+    """Write a store back out as a .jsonl result log; returns the entry count"""
+    count = 0
+    with ResultStore(store_path) as store, ResultLog(output_path, append=False) as log:
+        for entry in store.iter_entries():
+            log.write(entry)
+            count += 1
+    return count
+
+
+def main():
+    usage = "Usage: python3 result_store.py convert RESULTS... STORE | export STORE OUT.jsonl | info STORE"
+    if len(sys.argv) < 3:
+        print(usage)
+        return
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == "convert" and len(args) >= 2:
+        rows = convert(args[:-1], args[-1])
+        print(f"Converted {', '.join(args[:-1])} -> {args[-1]} ({rows} strategy runs)")
+    elif command == "export" and len(args) == 2:
+        entries = export(args[0], args[1])
+        print(f"Exported {args[0]} -> {args[1]} ({entries} entries)")
+    elif command == "info" and len(args) == 1:
+        with ResultStore(args[0]) as store:
+            print("=" * 100)
+            print(f"Result Store: {args[0]}")
+            print(f"Entries: {len(store.entry_case)} | Strategy runs: {len(store)} | "
+                  f"Cases: {len(store.cases)} | Strategies: {len(store.strategies)}")
+            print("=" * 100)
+            print(f"{'Strategy':<28} {'Runs':>7} {'Mean tokens':>12} {'Mean conf.':>11}")
+            print("-" * 100)
+            for name in store.strategies:
+                rows = store.rows(name)
+                confidence = store.confidence[rows]
+                stated = confidence[~np.isnan(confidence)]
+                print(f"{name:<28} {len(rows):>7} {store.tokens[rows].mean():>12.0f} "
+                      f"{stated.mean() if len(stated) else float('nan'):>10.1f}%")
+    else:
+        print(usage)
+
+
+if __name__ == "__main__":
+    main()
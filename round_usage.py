@@ -0,0 +1,164 @@
+"""
+Round Usage
+Per-round token and latency accounting: prompt, completion and
+provider-cached prompt tokens, and the wall time of every API round.
+
+A multi-turn strategy resends its whole history each round, so its prompt
+tokens grow with every challenge while completions stay flat, and the two
+are priced differently. Answer.rounds, StrategyResult.usage and the "rounds"
+list of every stored strategy result keep the breakdown per round;
+round_costs() aggregates it to show which rounds dominate cost.
+
+Usage:
+    python3 round_usage.py [results.jsonl ...]
+"""
+
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from result_log import iter_result_entries
+
+
+@dataclass
+class RoundUsage:
+    """Cost of one API round"""
+    name: str  # "initial", "challenge", "final_confirmation", "challenge_1", ...
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0  # Prompt tokens served from the provider's prompt cache
+    latency: float = 0.0  # Seconds (0.0 when the reply was reused rather than requested)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RoundUsage":
+        return cls(**{k: data[k] for k in cls.__dataclass_fields__ if k in data})
+
+
+def usage_from_response(name: str, response, latency: float = 0.0) -> RoundUsage:
+    """RoundUsage from a chat completion's usage (zeros where the response has none)"""
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return RoundUsage(
+        name=name,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+        latency=latency,
+    )
+
+
+def usage_fields(rounds: Sequence[RoundUsage]) -> Dict:
+    """Per-round list and its totals, as stored in result dicts"""
+    return {
+        "prompt_tokens": sum(r.prompt_tokens for r in rounds),
+        "completion_tokens": sum(r.completion_tokens for r in rounds),
+        "cached_tokens": sum(r.cached_tokens for r in rounds),
+        "latency": sum(r.latency for r in rounds),
+        "rounds": [r.to_dict() for r in rounds],
+    }
+
+
+@dataclass
+class RoundCost:
+    """Aggregated cost of one round of one strategy"""
+    strategy: str
+    round: str
+    count: int = 0  # Runs that reached this round
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency: float = 0.0  # Seconds, summed
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, usage: RoundUsage):
+        self.count += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.latency += usage.latency
+
+
+def round_costs(runs: Iterable[Tuple[str, Sequence[RoundUsage]]]) -> List[RoundCost]:
+    """
+    Aggregate per-round usage by (strategy, round name)
+
+    Args:
+        runs: (strategy, rounds) pairs, e.g. from entry_rounds() or
+            [(a.strategy_used, a.rounds) for a in answers]
+
+    Returns:
+        One RoundCost per (strategy, round), strategies and rounds in first-seen order
+    """
+    costs: Dict[Tuple[str, str], RoundCost] = {}
+    for strategy, rounds in runs:
+        for usage in rounds:
+            key = (strategy, usage.name)
+            if key not in costs:
+                costs[key] = RoundCost(strategy, usage.name)
+            costs[key].add(usage)
+    return list(costs.values())
+
+
+def entry_rounds(entries: Iterable[Dict]) -> Iterator[Tuple[str, List[RoundUsage]]]:
+    """
+    (strategy, rounds) of every stored strategy result that has a breakdown
+
+    Reads both entry shapes the experiment scripts write: {"strategies": {name: result}}
+    (comprehensive_test, advanced_tricky_test) and {"results": [result, ...]}
+    (llm_confidence_experiment), where each result names its strategy under "strategy".
+    Raises ValueError for an entry with neither.
+    """
+    for entry in entries:
+        if "strategies" in entry:
+            results = entry["strategies"].items()
+        elif "results" in entry:
+            results = [(result.get("strategy"), result) for result in entry["results"]]
+        else:
+            raise ValueError(f"Unknown result entry shape (keys: {', '.join(sorted(entry))})")
+        for strategy, result in results:
+            if isinstance(result, dict) and result.get("rounds"):
+                yield strategy, [RoundUsage.from_dict(r) for r in result["rounds"]]
+
+
+def print_round_costs(costs: Sequence[RoundCost]):
+    """Table of mean tokens and latency per round, with each round's share of its strategy's tokens"""
+    strategy_tokens: Dict[str, int] = {}
+    for cost in costs:
+        strategy_tokens[cost.strategy] = strategy_tokens.get(cost.strategy, 0) + cost.total_tokens
+
+    print(f"{'Strategy':<24} {'Round':<20} {'Runs':>5} {'Prompt':>8} {'Completion':>11} "
+          f"{'Cached':>7} {'Latency':>8} {'Share':>6}")
+    print("-" * 100)
+    for cost in costs:
+        share = cost.total_tokens / strategy_tokens[cost.strategy] if strategy_tokens[cost.strategy] else 0.0
+        print(f"{cost.strategy:<24} {cost.round:<20} {cost.count:>5} "
+              f"{cost.prompt_tokens / cost.count:>8.0f} {cost.completion_tokens / cost.count:>11.0f} "
+              f"{cost.cached_tokens / cost.count:>7.0f} {cost.latency / cost.count:>7.2f}s {share:>6.0%}")
+
+
+def main():
+    paths = sys.argv[1:] or ["comprehensive_test_results.json"]
+    runs = [run for path in paths for run in entry_rounds(iter_result_entries(path))]
+
+    print("=" * 100)
+    print("Per-Round Cost (means per run)")
+    print(f"Files: {', '.join(paths)} | Strategy runs with a round breakdown: {len(runs)}")
+    print("=" * 100)
+    if not runs:
+        print("No per-round usage stored (results written before round accounting was added)")
+        return
+    print_round_costs(round_costs(runs))
+
+
+if __name__ == "__main__":
+    main()
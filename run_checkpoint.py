@@ -0,0 +1,114 @@
+"""
+Run Checkpoint
+Resume interrupted experiment runs without paying for finished API calls again.
+
+Every strategy round is appended to a JSONL checkpoint (see result_log) as
+soon as its reply arrives, keyed by (case id, strategy, round) and stored
+with the conversation up to that reply. Given a checkpoint,
+StrategyEngine.run() replays the stored conversation into its conversation
+tree first: finished rounds are reused instead of requested, and a
+multi-turn strategy interrupted after its first challenge continues with
+the second.
+
+A stored conversation is only replayed while the strategy's system prompt
+and the question are unchanged; a changed challenge prompt branches off and
+is requested again.
+
+Usage:
+    checkpoint = RunCheckpoint("advanced_tricky_test_checkpoint.jsonl")
+    result = engine.run("multi_turn_aggressive", question, checkpoint.case(case_id))
+    ...
+    checkpoint.clear()  # Run complete
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from result_log import ResultLog, iter_jsonl
+
+RoundKey = Tuple[Hashable, str, int]  # (case id, strategy name, round index)
+
+
+class RunCheckpoint:
+    """Completed strategy rounds of one run, persisted as they finish"""
+
+    def __init__(self, path: str):
+        """
+        Open a checkpoint, loading the rounds an earlier attempt finished
+
+        Args:
+            path: .jsonl checkpoint file (created if missing)
+        """
+        self.path = path
+        self._rounds: Dict[RoundKey, Dict] = {}
+        if os.path.exists(path):
+            for record in iter_jsonl(path):
+                self._rounds[(record["case_id"], record["strategy"], record["round"])] = record
+        # Rounds available from earlier attempts when this checkpoint was opened
+        self.restored_rounds = len(self._rounds)
+        self._lock = threading.Lock()
+        self._log = ResultLog(path)
+
+    def __contains__(self, key: RoundKey) -> bool:
+        return key in self._rounds
+
+    def __len__(self) -> int:
+        return len(self._rounds)
+
+    def get(self, case_id: Hashable, strategy: str, round_index: int) -> Optional[Dict]:
+        """Stored record of one round: case_id, strategy, round, tokens, conversation (, usage)"""
+        return self._rounds.get((case_id, strategy, round_index))
+
+    def last_round(self, case_id: Hashable, strategy: str) -> Optional[Dict]:
+        """Record of the latest finished round of a strategy on a case"""
+        round_index = 0
+        record = None
+        while (case_id, strategy, round_index) in self._rounds:
+            record = self._rounds[(case_id, strategy, round_index)]
+            round_index += 1
+        return record
+
+    def record(self, case_id: Hashable, strategy: str, round_index: int,
+               tokens: int, conversation: List[Dict], usage: Optional[Dict] = None):
+        """Persist a finished round (conversation ends with its reply; usage = RoundUsage.to_dict())"""
+        record = {"case_id": case_id, "strategy": strategy, "round": round_index,
+                  "tokens": tokens, "conversation": conversation}
+        if usage is not None:
+            record["usage"] = usage
+        with self._lock:
+            self._rounds[(case_id, strategy, round_index)] = record
+        self._log.write(record)
+
+    def case(self, case_id: Hashable) -> "CaseCheckpoint":
+        """View of this checkpoint for one case, to pass to StrategyEngine.run()"""
+        return CaseCheckpoint(self, case_id)
+
+    def close(self):
+        self._log.close()
+
+    def clear(self):
+        """Delete the checkpoint, e.g. once the run it protects has completed"""
+        self.close()
+        with self._lock:
+            self._rounds.clear()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@dataclass(frozen=True)
+class CaseCheckpoint:
+    """RunCheckpoint bound to one case id"""
+    checkpoint: RunCheckpoint
+    case_id: Hashable
+
+    def get(self, strategy: str, round_index: int) -> Optional[Dict]:
+        return self.checkpoint.get(self.case_id, strategy, round_index)
+
+    def last_round(self, strategy: str) -> Optional[Dict]:
+        return self.checkpoint.last_round(self.case_id, strategy)
+
+    def record(self, strategy: str, round_index: int, tokens: int, conversation: List[Dict],
+               usage: Optional[Dict] = None):
+        self.checkpoint.record(self.case_id, strategy, round_index, tokens, conversation, usage)
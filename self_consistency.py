@@ -0,0 +1,59 @@
+"""
+Self-Consistency
+Cluster several sampled answers to one question and turn their agreement into
+an empirical confidence.
+
+Instead of asking the model how sure it is, sample n answers at a non-zero
+temperature in a single request (the API's n parameter) and measure how many
+of them agree. Samples are grouped by the values stated in their final
+answer (the JSON "answer" field or the [Answer] section): "$0.05", "5 cents"
+and "0.05 dollars" agree. Final answers without values are compared as
+normalized text, and so are whole samples that state no final answer, so
+numbers from their reasoning ("Step 1 ...") never merge unrelated samples.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from answer_grading import extract_keys
+from structured_output import final_answer_text, normalize_answer
+
+# How a confidence value was obtained: agreement between samples
+SOURCE_AGREEMENT = "agreement"
+
+
+def answer_cluster_key(content: str) -> str:
+    """Key under which equivalent sampled answers are grouped"""
+    answer = final_answer_text(content)
+    if answer is None:
+        return f"text:{normalize_answer(content)}"
+    keys = extract_keys(answer)
+    if keys:
+        return "value:" + ",".join(f"{value}{unit or ''}" for value, unit in sorted(keys, key=str))
+    return f"text:{normalize_answer(answer)}"
+
+
+@dataclass
+class AnswerCluster:
+    """Samples that gave the same answer"""
+    key: str
+    indices: List[int] = field(default_factory=list)  # Sample indices, in order
+
+    @property
+    def size(self) -> int:
+        return len(self.indices)
+
+
+def cluster_answers(contents: Sequence[str]) -> List[AnswerCluster]:
+    """Group sampled answers (full response contents); largest cluster first (ties: the one seen first)"""
+    clusters: Dict[str, AnswerCluster] = {}
+    for i, content in enumerate(contents):
+        key = answer_cluster_key(content)
+        clusters.setdefault(key, AnswerCluster(key)).indices.append(i)
+    return sorted(clusters.values(), key=lambda c: (-c.size, c.indices[0]))
+
+
+def agreement_confidence(clusters: Sequence[AnswerCluster]) -> float:
+    """Share of samples in the largest cluster, 0-100"""
+    total = sum(c.size for c in clusters)
+    return 100.0 * clusters[0].size / total if total else 0.0
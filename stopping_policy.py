@@ -0,0 +1,62 @@
+"""
+Stopping Policies
+Decide when multi-round verification can end early.
+
+After each verification round, the policy compares the round's answer with the
+previous one. If it says stop, the remaining rounds are skipped.
+
+- NeverStop: always run every round (original behaviour)
+- AnswerEqualityPolicy: stop when the answer is unchanged and confidence is above the threshold
+- ConfidenceDeltaPolicy: stop when confidence is above the threshold and rose by at
+  least min_delta (by default: did not decrease)
+"""
+
+from dataclasses import dataclass
+
+from structured_output import normalize_answer
+
+
+@dataclass
+class VerificationRound:
+    """The outcome of one round, as seen by a stopping policy"""
+    answer: str  # Extracted answer text
+    confidence: float  # 0-100
+
+
+class StoppingPolicy:
+    """Base class: subclasses implement should_stop()"""
+
+    def should_stop(self, previous: VerificationRound, current: VerificationRound,
+                    threshold: float) -> bool:
+        raise NotImplementedError
+
+
+class NeverStop(StoppingPolicy):
+    """Always run every verification round"""
+
+    def should_stop(self, previous, current, threshold):
+        return False
+
+
+class AnswerEqualityPolicy(StoppingPolicy):
+    """Stop once the (normalized) answer is stable and confidence reaches the threshold"""
+
+    def should_stop(self, previous, current, threshold):
+        return (current.confidence >= threshold
+                and normalize_answer(current.answer) == normalize_answer(previous.answer))
+
+
+class ConfidenceDeltaPolicy(StoppingPolicy):
+    """
+    Stop once confidence reaches the threshold and changed by at least min_delta
+
+    With the default min_delta=0, stop when confidence is above the threshold and
+    did not decrease.
+    """
+
+    def __init__(self, min_delta: float = 0.0):
+        self.min_delta = min_delta
+
+    def should_stop(self, previous, current, threshold):
+        return (current.confidence >= threshold
+                and current.confidence - previous.confidence >= self.min_delta)
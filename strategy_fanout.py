@@ -0,0 +1,96 @@
+"""
+Strategy Fan-out
+Run independent strategies for one question at the same time.
+
+Strategies spend nearly all their time waiting on the API, so a thread pool
+turns the per-question latency from the sum of the strategies into the
+slowest one (the critical path). API calls still go through the shared rate
+limiter and response cache, which are thread-safe, and a ConfidenceProtocol
+shared by several tasks updates its counters (parse_stats, rounds skipped)
+under a lock.
+
+Results come back in the order the tasks were given, each with its own wall
+time; a failing task records its exception instead of stopping the others.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+@dataclass
+class TaskResult:
+    """Outcome of one fanned-out task"""
+    name: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    seconds: float = 0.0  # Wall time of this task alone
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class FanOutReport:
+    """Results in task order, with timing"""
+    results: List[TaskResult] = field(default_factory=list)
+    wall_seconds: float = 0.0  # Wall time of the whole fan-out
+
+    @property
+    def critical_path_seconds(self) -> float:
+        """Latency of the slowest task: the lower bound for the fan-out"""
+        return max((r.seconds for r in self.results), default=0.0)
+
+    @property
+    def sequential_seconds(self) -> float:
+        """Latency if the tasks had run one after another"""
+        return sum(r.seconds for r in self.results)
+
+    @property
+    def speedup(self) -> float:
+        return self.sequential_seconds / self.wall_seconds if self.wall_seconds else 1.0
+
+    def timing_table(self) -> str:
+        """Per-task wall time plus critical-path and total latency, for printing"""
+        lines = [f"{'Strategy':<40} {'Wall time (s)':>14}", "-" * 56]
+        for r in self.results:
+            status = "" if r.ok else "  (error)"
+            lines.append(f"{r.name:<40} {r.seconds:>14.2f}{status}")
+        lines.append("-" * 56)
+        lines.append(f"{'Critical path (slowest strategy)':<40} {self.critical_path_seconds:>14.2f}")
+        lines.append(f"{'Fan-out wall time':<40} {self.wall_seconds:>14.2f}")
+        lines.append(f"{'Sequential equivalent':<40} {self.sequential_seconds:>14.2f}")
+        lines.append(f"{'Speedup':<40} {self.speedup:>13.1f}x")
+        return "\n".join(lines)
+
+
+def _timed(name: str, task: Callable[[], Any]) -> TaskResult:
+    start = time.perf_counter()
+    try:
+        value = task()
+        return TaskResult(name, value=value, seconds=time.perf_counter() - start)
+    except Exception as e:
+        return TaskResult(name, error=e, seconds=time.perf_counter() - start)
+
+
+def fan_out(tasks: Sequence[Tuple[str, Callable[[], Any]]],
+            max_workers: Optional[int] = None) -> FanOutReport:
+    """
+    Run tasks concurrently in a thread pool
+
+    Args:
+        tasks: (name, zero-argument callable) pairs
+        max_workers: Thread limit (None = one thread per task; 1 = run sequentially)
+
+    Returns:
+        FanOutReport with one TaskResult per task, in task order
+    """
+    start = time.perf_counter()
+    if not tasks:
+        return FanOutReport()
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks)) as pool:
+        futures = [pool.submit(_timed, name, task) for name, task in tasks]
+        results = [future.result() for future in futures]
+    return FanOutReport(results=results, wall_seconds=time.perf_counter() - start)
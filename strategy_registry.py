@@ -0,0 +1,456 @@
+"""
+Strategy Registry
+Every prompting strategy used by the experiment scripts, declared once and run
+through one execution engine.
+
+A strategy is data: a system prompt, the challenge prompts of any follow-up
+rounds, a temperature and a parser for the final answer. StrategyEngine runs
+any of them on a conversation tree, through the shared response cache, rate
+limiter and concurrency limit, so those features reach every strategy and
+every script.
+
+Usage:
+    engine = StrategyEngine()
+    result = engine.run("multi_turn_aggressive", question)
+    results = engine.batch("basic", questions)           # concurrent, input order
+    report = engine.run_many(["basic", "self_reflection"], question)  # parallel fan-out
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from llm_client import ChatClient, client_from_env
+from rate_limiter import RateLimiter, get_shared_limiter
+from response_cache import ResponseCache, cache_from_env
+from conversation_tree import ConversationNode, ConversationTree
+from round_usage import RoundUsage, usage_fields
+from run_checkpoint import CaseCheckpoint
+from strategy_fanout import FanOutReport, fan_out
+from transcript_archive import CaseTranscript
+from structured_output import ParsedAnswer, parse_answer
+
+DEFAULT_MODEL = "gpt-4o-mini"
+
+
+@dataclass(frozen=True)
+class StrategySpec:
+    """Declaration of one strategy"""
+    name: str  # Registry key
+    label: str  # Display name
+    system_prompt: str
+    challenges: Tuple[str, ...] = ()  # One follow-up round per challenge prompt
+    temperature: float = 0.7
+    parser: Callable[[str], ParsedAnswer] = parse_answer  # Applied to the final answer
+
+    @property
+    def rounds(self) -> int:
+        return 1 + len(self.challenges)
+
+
+def round_name(round_index: int) -> str:
+    """Name of a strategy round in usage breakdowns: "initial", "challenge_1", ..."""
+    return "initial" if round_index == 0 else f"challenge_{round_index}"
+
+
+@dataclass
+class StrategyResult:
+    """Outcome of running one strategy on one question"""
+    strategy: str
+    label: str
+    rounds: List[str]  # Assistant reply of each round
+    tokens: int
+    parsed: ParsedAnswer
+    conversation: List[Dict] = field(default_factory=list)
+    usage: List[RoundUsage] = field(default_factory=list)  # Per-round tokens and latency
+
+    @property
+    def answer(self) -> str:
+        """The final round's reply"""
+        return self.rounds[-1]
+
+    @property
+    def confidence(self) -> Optional[float]:
+        return self.parsed.confidence
+
+    def usage_fields(self) -> Dict:
+        """prompt/completion/cached token totals, latency and per-round list for result dicts"""
+        return usage_fields(self.usage)
+
+
+STRATEGIES: Dict[str, StrategySpec] = {}
+
+
+def register(spec: StrategySpec) -> StrategySpec:
+    """Add a strategy to the registry"""
+    if spec.name in STRATEGIES:
+        raise ValueError(f"Strategy '{spec.name}' is already registered")
+    STRATEGIES[spec.name] = spec
+    return spec
+
+
+def get_strategy(strategy: Union[str, StrategySpec]) -> StrategySpec:
+    """Look up a strategy by name (specs are returned unchanged)"""
+    if isinstance(strategy, StrategySpec):
+        return strategy
+    try:
+        return STRATEGIES[strategy]
+    except KeyError:
+        raise KeyError(f"Unknown strategy '{strategy}'. Registered: {', '.join(STRATEGIES)}") from None
+
+
+class StrategyEngine:
+    """Runs registered strategies through the cache, rate limiter and concurrency limit"""
+
+    def __init__(self, client: Optional[ChatClient] = None,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 cache: Optional[ResponseCache] = None,
+                 model: str = DEFAULT_MODEL,
+                 max_concurrency: int = 8):
+        """
+        Initialize engine
+
+        Args:
+            client: Chat client (None = selected by LLM_BACKEND, see client_from_env)
+            rate_limiter: RPM/TPM scheduler (None = the process-wide shared limiter)
+            cache: Response cache (None = selected by RESPONSE_CACHE_PATH, see cache_from_env)
+            model: Model to use
+            max_concurrency: Maximum number of in-flight API calls for the async methods
+        """
+        self.client = client or client_from_env()
+        self.rate_limiter = rate_limiter or get_shared_limiter()
+        self.cache = cache if cache is not None else cache_from_env()
+        self.model = model
+        self.max_concurrency = max_concurrency
+
+        # The semaphore is bound to the event loop it was created in
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    def create(self, messages: List[Dict], temperature: float = 0.7):
+        """One chat completion through the cache and rate limiter"""
+        return self.cache.get_or_create(self.rate_limiter.wrap(self.client.create),
+                                        model=self.model, messages=messages, temperature=temperature)
+
+    async def acreate(self, messages: List[Dict], temperature: float = 0.7):
+        """Async version of create(), bounded by max_concurrency"""
+        return await self.cache.aget_or_create(self._acall_api, model=self.model,
+                                               messages=messages, temperature=temperature)
+
+    async def _acall_api(self, **kwargs):
+        async with self._get_semaphore():
+            return await self.rate_limiter.acall(self.client.acreate, **kwargs)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """Get the concurrency semaphore, recreating it when the event loop changes"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def _tree(self, spec: StrategySpec, question: str) -> ConversationTree:
+        return ConversationTree(
+            spec.system_prompt, question,
+            create_fn=lambda messages: self.create(messages, spec.temperature),
+            acreate_fn=lambda messages: self.acreate(messages, spec.temperature)
+        )
+
+    @staticmethod
+    def _result(spec: StrategySpec, tree: ConversationTree, nodes: List) -> StrategyResult:
+        rounds = [node.content for node in nodes]
+        return StrategyResult(
+            strategy=spec.name,
+            label=spec.label,
+            rounds=rounds,
+            tokens=tree.total_tokens_used,
+            parsed=spec.parser(rounds[-1]),
+            conversation=nodes[-1].messages(),
+            usage=[node.usage(round_name(i)) for i, node in enumerate(nodes)]
+        )
+
+    @staticmethod
+    def _restore(tree: ConversationTree, spec: StrategySpec, checkpoint: Optional[CaseCheckpoint]):
+        """Replay the checkpointed conversation of a strategy into its tree, so finished rounds are reused"""
+        last = checkpoint.last_round(spec.name) if checkpoint else None
+        if last is None or last["conversation"][:2] != tree.question_node.messages():
+            # Nothing stored, or stored under a different system prompt / question
+            return
+        node = tree.question_node
+        round_index = 0
+        for message in last["conversation"][2:]:
+            node = tree.add_turn(node, message["role"], message["content"])
+            if message["role"] == "assistant":
+                record = checkpoint.get(spec.name, round_index)
+                node.tokens_used = record["tokens"]
+                if "usage" in record:
+                    usage = RoundUsage.from_dict(record["usage"])
+                    node.prompt_tokens = usage.prompt_tokens
+                    node.completion_tokens = usage.completion_tokens
+                    node.cached_prompt_tokens = usage.cached_tokens
+                    node.latency = usage.latency
+                round_index += 1
+
+    @staticmethod
+    def _checkpoint(checkpoint: Optional[CaseCheckpoint], spec: StrategySpec, round_index: int,
+                    node: ConversationNode):
+        """Persist a round that was just requested (replayed rounds have no response)"""
+        if checkpoint is not None and node.response is not None:
+            checkpoint.record(spec.name, round_index, node.tokens_used, node.messages(),
+                              node.usage(round_name(round_index)).to_dict())
+
+    def run(self, strategy: Union[str, StrategySpec], question: str,
+            checkpoint: Optional[CaseCheckpoint] = None,
+            transcript: Optional[CaseTranscript] = None) -> StrategyResult:
+        """
+        Run one strategy on one question
+
+        Args:
+            strategy: Registry name or spec
+            question: User question
+            checkpoint: Resume from / record to this case's checkpoint (see run_checkpoint)
+            transcript: Append every round to this case's transcript archive (see transcript_archive)
+        """
+        spec = get_strategy(strategy)
+        tree = self._tree(spec, question)
+        self._restore(tree, spec, checkpoint)
+        nodes = [tree.reply(tree.question_node)]
+        self._checkpoint(checkpoint, spec, 0, nodes[-1])
+        for round_index, challenge in enumerate(spec.challenges, 1):
+            nodes.append(tree.challenge(nodes[-1], challenge))
+            self._checkpoint(checkpoint, spec, round_index, nodes[-1])
+        result = self._result(spec, tree, nodes)
+        if transcript is not None:
+            transcript.record_result(result)
+        return result
+
+    async def arun(self, strategy: Union[str, StrategySpec], question: str,
+                   checkpoint: Optional[CaseCheckpoint] = None,
+                   transcript: Optional[CaseTranscript] = None) -> StrategyResult:
+        """Async version of run()"""
+        spec = get_strategy(strategy)
+        tree = self._tree(spec, question)
+        self._restore(tree, spec, checkpoint)
+        nodes = [await tree.areply(tree.question_node)]
+        self._checkpoint(checkpoint, spec, 0, nodes[-1])
+        for round_index, challenge in enumerate(spec.challenges, 1):
+            nodes.append(await tree.achallenge(nodes[-1], challenge))
+            self._checkpoint(checkpoint, spec, round_index, nodes[-1])
+        result = self._result(spec, tree, nodes)
+        if transcript is not None:
+            transcript.record_result(result)
+        return result
+
+    def run_many(self, strategies: Sequence[Union[str, StrategySpec]], question: str,
+                 parallel: bool = True) -> FanOutReport:
+        """Run several strategies on one question; results keep strategy order"""
+        specs = [get_strategy(s) for s in strategies]
+        return fan_out([(spec.label, lambda spec=spec: self.run(spec, question)) for spec in specs],
+                       max_workers=None if parallel else 1)
+
+    async def abatch(self, strategy: Union[str, StrategySpec], questions: List[str]) -> List[StrategyResult]:
+        """Run one strategy on many questions concurrently; results keep input order"""
+        return await asyncio.gather(*(self.arun(strategy, q) for q in questions))
+
+    def batch(self, strategy: Union[str, StrategySpec], questions: List[str]) -> List[StrategyResult]:
+        """Synchronous wrapper around abatch()"""
+        return asyncio.run(self.abatch(strategy, questions))
+
+
+# ---------------------------------------------------------------------------
+# Built-in strategies
+# ---------------------------------------------------------------------------
+
+GENERIC_ASSISTANT = "You are a helpful AI assistant."
+
+# comprehensive_test.py
+
+register(StrategySpec(
+    name="basic",
+    label="Basic",
+    system_prompt="You are a helpful AI assistant. Please answer the question directly and concisely.",
+))
+
+register(StrategySpec(
+    name="self_reflection",
+    label="Self-Reflection",
+    system_prompt="""You are a rigorous AI assistant. For this question:
+
+1. First give your immediate answer
+2. Then STOP and question yourself: "Wait, is this correct? What are common mistakes people make on this type of problem?"
+3. Re-examine the problem carefully, checking your logic step by step
+4. Provide your final answer with confidence level
+
+Format:
+[Initial thought]: ...
+[Self-check]: (What could go wrong? Common traps?)
+[Step-by-step verification]: ...
+[Final Answer]: ...
+[Confidence]: (0-100%)
+""",
+))
+
+register(StrategySpec(
+    name="multi_turn",
+    label="Multi-turn Verification",
+    system_prompt=GENERIC_ASSISTANT,
+    challenges=(
+        "Wait, are you SURE that's correct? This type of question often has a trap. Please reconsider carefully and verify your answer step by step.",
+    ),
+))
+
+# advanced_tricky_test.py
+
+register(StrategySpec(
+    name="basic_direct",
+    label="Basic",
+    system_prompt="You are a helpful AI assistant. Please answer the question directly.",
+))
+
+register(StrategySpec(
+    name="self_reflection_trap",
+    label="Self-Reflection (trap-focused)",
+    system_prompt="""You are an extremely careful AI assistant. This question is TRICKY and has a common WRONG answer that most people give.
+
+Your task:
+1. Think about what the OBVIOUS answer is
+2. Consider: "This feels too easy - what's the TRAP?"
+3. Question EVERY assumption you're making
+4. Work through the problem step-by-step VERY carefully
+5. Double-check your logic
+6. Provide final answer with confidence
+
+Format:
+[Obvious Answer]: (What's the first answer that comes to mind?)
+[Wait - What's the Trap?]: (Why might that be wrong?)
+[Careful Analysis]: (Step by step reasoning)
+[Verification]: (Check the logic)
+[Final Answer]: ...
+[Confidence]: (0-100%)
+""",
+))
+
+register(StrategySpec(
+    name="multi_turn_aggressive",
+    label="Aggressive Multi-turn",
+    system_prompt=GENERIC_ASSISTANT,
+    challenges=(
+        """STOP! I think you made a mistake. This question has a TRAP that most people fall into.
+        
+Your answer seems like the obvious one, but the obvious answer is usually WRONG on these tricky questions.
+
+Please:
+1. Identify what trap you might have fallen into
+2. Reconsider EVERY step of your reasoning
+3. Look for the counter-intuitive answer
+4. Work through it again from scratch
+
+What's your revised answer?""",
+        "OK, walk me through your logic one more time step-by-step to make absolutely sure it's correct. Final answer?",
+    ),
+))
+
+# llm_confidence_experiment.py
+
+register(StrategySpec(
+    name="baseline",
+    label="Basic Strategy",
+    system_prompt="You are a helpful AI assistant. Please answer the user's question.",
+))
+
+register(StrategySpec(
+    name="with_confidence",
+    label="Confidence Strategy",
+    system_prompt="""You are a helpful AI assistant. When answering questions, you need to:
+1. Give your answer
+2. Assess your confidence in this answer (0-100%)
+3. Briefly explain your confidence source (based on certain knowledge, reasoning, or uncertain information)
+
+Please answer in the following format:
+[Answer]: (Your answer)
+[Confidence]: (0-100%)
+[Confidence Explanation]: (Why this confidence level)
+""",
+))
+
+register(StrategySpec(
+    name="self_reflection_guided",
+    label="Self-Reflection Strategy",
+    system_prompt="""You are a rigorous AI assistant. When answering questions, follow this thinking process:
+
+1. **Preliminary Answer**: First give your initial reaction answer
+2. **Self-Questioning**: Question your answer, ask yourself "Am I sure?" "Did I miss anything?" "Are there other possibilities?"
+3. **Re-verification**: Based on questioning, rethink and verify your answer
+4. **Final Answer**: Give a well-considered final answer and confidence
+
+Please answer in the following format:
+[Thinking Process]:
+- Preliminary answer: ...
+- Self-questioning: ...
+- Re-verification: ...
+
+[Final Answer]: (Your answer)
+[Confidence]: (0-100%)
+""",
+))
+
+register(StrategySpec(
+    name="multi_turn_verification",
+    label="Multi-turn Verification Strategy",
+    system_prompt="You are a helpful AI assistant. Please answer the user's question and assess your confidence (0-100%) at the end.",
+    challenges=(
+        "Are you sure? Please think carefully again and ensure it's correct. If you find issues, please correct them. If you're confident it's correct, please restate your answer.",
+        "Final confirmation, please give your final answer and confidence (0-100%).",
+    ),
+))
+
+register(StrategySpec(
+    name="chain_of_verification",
+    label="Chain of Verification Strategy",
+    system_prompt="""You are a rigorous AI assistant. When answering questions, please follow the "Chain of Verification" method:
+
+1. **Baseline Answer**: Give preliminary answer
+2. **Generate Verification Questions**: List 2-3 questions that can verify your answer
+3. **Answer Verification Questions**: Answer these verification questions independently
+4. **Cross-Check**: Check if verification answers are consistent with baseline answer
+5. **Final Answer**: Based on verification results, give corrected final answer
+
+Please answer in the following format:
+[Baseline Answer]: ...
+[Verification Questions]:
+1. ...
+2. ...
+[Verification Answers]:
+1. ...
+2. ...
+[Cross-Check]: ...
+[Final Answer]: ...
+[Confidence]: (0-100%)
+""",
+))
+
+# ultra_hard_cases.py (lower temperature for more consistent reasoning)
+
+register(StrategySpec(
+    name="basic_careful",
+    label="Basic",
+    system_prompt="You are a helpful AI assistant. Think carefully and provide your answer.",
+    temperature=0.3,
+))
+
+register(StrategySpec(
+    name="self_reflection_puzzle",
+    label="Enhanced Self-Reflection",
+    system_prompt="""You are solving a FAMOUS LOGIC PUZZLE that has tricked many people.
+
+Steps:
+1. What's the naive/obvious answer most people give?
+2. Why is that answer often WRONG?
+3. What subtle logical trap exists?
+4. Work through step-by-step VERY carefully
+5. Check: Does my reasoning have any circular logic or hidden assumptions?
+6. Final answer with confidence and explanation
+
+This puzzle is HARD - take your time and be extra careful!""",
+    temperature=0.3,
+))
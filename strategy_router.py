@@ -0,0 +1,350 @@
+"""
+Strategy Router
+Send each question to the cheapest strategy that is expected to be accurate enough.
+
+Strategies get steadily more expensive (Basic ~130 tokens, Multi-turn ~400+),
+but many questions are answered correctly by Basic. The router predicts, for
+each candidate strategy, the probability of a correct answer and the expected
+tokens from cheap features:
+- category (when the question has one seen in past results)
+- question length (tercile of the lengths seen in past results)
+- historical accuracy of the strategy in stored result JSONs (graded with
+  answer_grading against each case's correct/common-wrong answers)
+
+Accuracy estimates are smoothed towards the broader estimate (category ->
+length bucket -> strategy overall -> uninformed prior), so sparse history
+does not produce overconfident 0% or 100% predictions.
+
+- route(): cheapest strategy whose predicted accuracy reaches the target
+- plan(): for a batch, the cheapest assignment whose mean predicted accuracy
+  reaches the target (greedy upgrades by accuracy gained per extra token)
+- evaluate_offline(): leave-one-out replay over stored results, comparing
+  the router against always using one strategy
+
+Usage:
+    python3 strategy_router.py [target_accuracy] [results.jsonl|results.json ...]
+"""
+
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from answer_grading import grade_answer
+from result_log import iter_result_entries
+from strategy_registry import STRATEGIES, StrategyEngine, StrategyResult
+
+# Candidate strategies, cheapest first (registry names)
+ROUTE_STRATEGIES = ("basic", "self_reflection", "chain_of_verification", "multi_turn")
+
+# Prior used when a strategy has no graded history at all
+PRIOR_ACCURACY = 0.7
+# Weight (in pseudo-observations) of the broader estimate when smoothing
+PRIOR_STRENGTH = 2.0
+# Rough tokens per question character, for scaling expected tokens with length
+TOKENS_PER_CHAR = 0.25
+
+# Registry names of the result keys of scripts that store their runs under generic keys,
+# by result file name prefix (used for results written before runs were tagged with
+# their registry name)
+RESULT_KEY_STRATEGIES = {
+    "advanced_tricky_test": {"basic": "basic_direct", "self_reflection": "self_reflection_trap",
+                             "multi_turn": "multi_turn_aggressive"},
+}
+
+
+@dataclass
+class Observation:
+    """One stored strategy run"""
+    question: str
+    category: Optional[str]
+    strategy: str  # Registry name
+    tokens: int
+    correct: Optional[bool]  # None = not graded
+
+
+@dataclass
+class RouteDecision:
+    """Routing outcome for one question"""
+    question: str
+    strategy: str
+    predicted_accuracy: float
+    expected_tokens: float
+    candidates: Dict[str, Tuple[float, float]]  # strategy -> (predicted accuracy, expected tokens)
+
+
+def _key_strategies(path: str) -> Dict[str, str]:
+    """Result key -> registry name overrides for a result file"""
+    name = os.path.basename(path)
+    for prefix, keys in RESULT_KEY_STRATEGIES.items():
+        if name.startswith(prefix):
+            return keys
+    return {}
+
+
+def _strategy_name(key: str, key_strategies: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """Registry name for a result key or display label"""
+    if key_strategies and key in key_strategies:
+        return key_strategies[key]
+    if key in STRATEGIES:
+        return key
+    for name, spec in STRATEGIES.items():
+        if spec.label == key:
+            return name
+    return None
+
+
+def load_observations(paths: Iterable[str]) -> List[Observation]:
+    """
+    Read stored results, .jsonl logs or .json arrays (comprehensive_test /
+    advanced_tricky_test format with "case" and "strategies", or
+    llm_confidence_experiment format with "question" and "results"; the
+    latter has no reference answer and only contributes token costs)
+
+    Runs are attributed by the registry name stored with them ("strategy"),
+    or else by their result key, read per source file (see RESULT_KEY_STRATEGIES)
+    """
+    observations = []
+    for path in paths:
+        key_strategies = _key_strategies(path)
+        for case_result in iter_result_entries(path):
+            if "strategies" in case_result:
+                case = case_result.get("case", {})
+                for key, result in case_result["strategies"].items():
+                    name = result.get("strategy") or _strategy_name(key, key_strategies)
+                    if name is None or "error" in result:
+                        continue
+                    correct = None
+                    if case.get("correct_answer"):
+                        correct = grade_answer(result.get("answer", ""), case["correct_answer"],
+                                               case.get("common_wrong_answer", ""))
+                    observations.append(Observation(case.get("question", ""), case.get("category"),
+                                                    name, result.get("tokens", 0), correct))
+            else:
+                for result in case_result.get("results", []):
+                    name = _strategy_name(result.get("strategy", ""))
+                    if name is None or "error" in result:
+                        continue
+                    observations.append(Observation(case_result.get("question", ""), None, name,
+                                                    result.get("total_tokens", 0), None))
+    return observations
+
+
+class StrategyRouter:
+    """Predicts per-strategy accuracy and cost, and picks the cheapest sufficient strategy"""
+
+    def __init__(self, observations: Sequence[Observation],
+                 strategies: Sequence[str] = ROUTE_STRATEGIES,
+                 target_accuracy: float = 0.8):
+        """
+        Initialize router
+
+        Args:
+            observations: Stored strategy runs (see load_observations)
+            strategies: Candidate strategies (registry names); those never seen in the
+                observations are skipped, unless none has been seen
+            target_accuracy: Accuracy a routed strategy should reach (0-1)
+        """
+        self.target_accuracy = target_accuracy
+        self.observations = list(observations)
+        seen = {o.strategy for o in self.observations}
+        self.strategies = tuple(s for s in strategies if s in seen) or tuple(strategies)
+
+        lengths = sorted(len(o.question) for o in self.observations if o.question)
+        # Tercile boundaries of question length
+        self._length_cuts = (lengths[len(lengths) // 3], lengths[2 * len(lengths) // 3]) if lengths else (0, 0)
+
+        # (scope, key, strategy) -> [correct, graded, token sum, token count, question length sum]
+        self._stats: Dict[Tuple[str, object, str], List[float]] = {}
+        for o in self.observations:
+            for scope, key in (("all", None), ("category", o.category),
+                               ("length", self._length_bucket(o.question))):
+                if scope == "category" and key is None:
+                    continue
+                stats = self._stats.setdefault((scope, key, o.strategy), [0, 0, 0, 0, 0])
+                if o.correct is not None:
+                    stats[0] += o.correct
+                    stats[1] += 1
+                stats[2] += o.tokens
+                stats[3] += 1
+                stats[4] += len(o.question)
+
+    @classmethod
+    def from_results(cls, paths: Iterable[str], **kwargs) -> "StrategyRouter":
+        """Build a router from stored result JSONs"""
+        return cls(load_observations(paths), **kwargs)
+
+    def _length_bucket(self, question: str) -> int:
+        low, high = self._length_cuts
+        length = len(question)
+        return 0 if length <= low else (1 if length <= high else 2)
+
+    def _smoothed(self, scope: str, key, strategy: str, prior: float) -> float:
+        stats = self._stats.get((scope, key, strategy))
+        if not stats or not stats[1]:
+            return prior
+        return (stats[0] + PRIOR_STRENGTH * prior) / (stats[1] + PRIOR_STRENGTH)
+
+    def predict_accuracy(self, question: str, strategy: str, category: Optional[str] = None) -> float:
+        """Probability that strategy answers the question correctly"""
+        overall = self._smoothed("all", None, strategy, PRIOR_ACCURACY)
+        by_length = self._smoothed("length", self._length_bucket(question), strategy, overall)
+        if category is not None:
+            return self._smoothed("category", category, strategy, by_length)
+        return by_length
+
+    def expected_tokens(self, question: str, strategy: str, category: Optional[str] = None) -> float:
+        """Expected total tokens of running strategy on the question"""
+        stats = self._stats.get(("category", category, strategy)) if category is not None else None
+        if not stats or not stats[3]:
+            stats = self._stats.get(("all", None, strategy))
+        rounds = STRATEGIES[strategy].rounds if strategy in STRATEGIES else 1
+        if not stats or not stats[3]:
+            # Never run: assume the system prompt, question and a short answer per round
+            return rounds * (len(STRATEGIES[strategy].system_prompt) + len(question)) * TOKENS_PER_CHAR + 100 * rounds
+        # Every round resends the question, so longer questions cost more per round; the mean
+        # already reflects the questions it was measured on, so adjust by the difference only
+        mean_length = stats[4] / stats[3]
+        return max(1.0, stats[2] / stats[3] + rounds * (len(question) - mean_length) * TOKENS_PER_CHAR)
+
+    def candidates(self, question: str, category: Optional[str] = None) -> Dict[str, Tuple[float, float]]:
+        return {s: (self.predict_accuracy(question, s, category), self.expected_tokens(question, s, category))
+                for s in self.strategies}
+
+    def route(self, question: str, category: Optional[str] = None,
+              target_accuracy: Optional[float] = None) -> RouteDecision:
+        """
+        Cheapest strategy whose predicted accuracy reaches the target
+
+        If no strategy is predicted to reach it, the most accurate one is used.
+        """
+        target = self.target_accuracy if target_accuracy is None else target_accuracy
+        candidates = self.candidates(question, category)
+        sufficient = [s for s, (accuracy, _) in candidates.items() if accuracy >= target]
+        if sufficient:
+            strategy = min(sufficient, key=lambda s: candidates[s][1])
+        else:
+            strategy = max(candidates, key=lambda s: (candidates[s][0], -candidates[s][1]))
+        accuracy, tokens = candidates[strategy]
+        return RouteDecision(question, strategy, accuracy, tokens, candidates)
+
+    def plan(self, questions: Sequence[str], categories: Optional[Sequence[Optional[str]]] = None,
+             target_accuracy: Optional[float] = None) -> List[RouteDecision]:
+        """
+        Route a batch so that the mean predicted accuracy reaches the target at minimum tokens
+
+        Every question starts on its cheapest strategy; then the upgrade with the
+        most accuracy gained per extra token is applied until the target is met
+        or nothing improves accuracy.
+        """
+        target = self.target_accuracy if target_accuracy is None else target_accuracy
+        categories = categories or [None] * len(questions)
+        options = []
+        for question, category in zip(questions, categories):
+            candidates = self.candidates(question, category)
+            # Cheapest first; drop options that cost more without being more accurate
+            frontier = []
+            for s in sorted(candidates, key=lambda s: candidates[s][1]):
+                if not frontier or candidates[s][0] > candidates[frontier[-1]][0]:
+                    frontier.append(s)
+            options.append((candidates, frontier))
+
+        choice = [0] * len(questions)
+        total_accuracy = sum(c[f[0]][0] for c, f in options)
+        while questions and total_accuracy / len(questions) < target:
+            best, best_rate = None, 0.0
+            for i, (candidates, frontier) in enumerate(options):
+                if choice[i] + 1 < len(frontier):
+                    current, upgrade = candidates[frontier[choice[i]]], candidates[frontier[choice[i] + 1]]
+                    rate = (upgrade[0] - current[0]) / max(1.0, upgrade[1] - current[1])
+                    if rate > best_rate:
+                        best, best_rate = i, rate
+            if best is None:
+                break
+            candidates, frontier = options[best]
+            total_accuracy += candidates[frontier[choice[best] + 1]][0] - candidates[frontier[choice[best]]][0]
+            choice[best] += 1
+
+        decisions = []
+        for question, (candidates, frontier), index in zip(questions, options, choice):
+            strategy = frontier[index]
+            decisions.append(RouteDecision(question, strategy, *candidates[strategy], candidates))
+        return decisions
+
+    def ask(self, question: str, category: Optional[str] = None,
+            engine: Optional[StrategyEngine] = None) -> Tuple[RouteDecision, StrategyResult]:
+        """Route the question and run the chosen strategy"""
+        decision = self.route(question, category)
+        engine = engine or StrategyEngine()
+        return decision, engine.run(decision.strategy, question)
+
+
+def evaluate_offline(observations: Sequence[Observation],
+                     target_accuracy: float = 0.8) -> Dict[str, Dict[str, float]]:
+    """
+    Replay stored results: leave each question out, fit the router on the
+    rest, route it among the strategies that were actually run on it, and
+    score the stored outcome of the chosen strategy
+
+    Returns:
+        policy -> {"questions", "graded", "accuracy", "mean_tokens"}; policies are
+        "router" and "always_<strategy>"
+    """
+    by_question: Dict[str, Dict[str, Observation]] = {}
+    for o in observations:
+        by_question.setdefault(o.question, {})[o.strategy] = o
+
+    strategies = [s for s in ROUTE_STRATEGIES if any(s in runs for runs in by_question.values())]
+    outcomes: Dict[str, List[Observation]] = {"router": []}
+    outcomes.update({f"always_{s}": [] for s in strategies})
+
+    for question, runs in by_question.items():
+        available = [s for s in strategies if s in runs]
+        history = [o for o in observations if o.question != question]
+        router = StrategyRouter(history, strategies=available, target_accuracy=target_accuracy)
+        category = next(iter(runs.values())).category
+        outcomes["router"].append(runs[router.route(question, category).strategy])
+        for s in available:
+            outcomes[f"always_{s}"].append(runs[s])
+
+    report = {}
+    for policy, chosen in outcomes.items():
+        graded = [o.correct for o in chosen if o.correct is not None]
+        report[policy] = {
+            "questions": len(chosen),
+            "graded": len(graded),
+            "accuracy": sum(graded) / len(graded) if graded else float("nan"),
+            "mean_tokens": sum(o.tokens for o in chosen) / len(chosen) if chosen else 0.0,
+        }
+    return report
+
+
+def main():
+    target = float(sys.argv[1]) if len(sys.argv) > 1 else 0.8
+    paths = sys.argv[2:] or ["comprehensive_test_results.json"]
+    observations = load_observations(paths)
+
+    print("=" * 100)
+    print("Strategy Router - Offline Evaluation (leave-one-out replay of stored results)")
+    print(f"Results: {', '.join(paths)} | Target accuracy: {target:.0%}")
+    print("=" * 100)
+    print(f"{'Policy':<28} {'Questions':>10} {'Graded':>8} {'Accuracy':>10} {'Mean tokens':>12}")
+    print("-" * 100)
+    for policy, row in evaluate_offline(observations, target).items():
+        print(f"{policy:<28} {row['questions']:>10} {row['graded']:>8} {row['accuracy']:>10.1%} "
+              f"{row['mean_tokens']:>12.1f}")
+
+    router = StrategyRouter(observations, target_accuracy=target)
+    print("\nRoutes with the full history:")
+    seen = set()
+    for o in observations:
+        if o.question in seen:
+            continue
+        seen.add(o.question)
+        decision = router.route(o.question, o.category)
+        print(f"  [{o.category}] -> {decision.strategy} "
+              f"(predicted accuracy {decision.predicted_accuracy:.0%}, ~{decision.expected_tokens:.0f} tokens)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Structured Output
+JSON-schema response mode for answers, replacing regex scraping of the
+[Answer]/[Confidence] blocks.
+
+With the schema enforced by the API, parsing is a single json.loads. Answers
+that are not valid JSON (e.g. from models without structured outputs) fall
+back to the free-text confidence extractor.
+"""
+
+import json
+import re
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+from confidence_extractor import extract_confidence_or_none
+
+ANSWER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "answer": {"type": "string", "description": "Your final answer"},
+        "confidence": {"type": "number", "description": "Confidence in the answer, 0-100"},
+        "reasoning": {"type": "string", "description": "Reasoning, uncertainties and any verification steps"},
+    },
+    "required": ["answer", "confidence", "reasoning"],
+    "additionalProperties": False,
+}
+
+# Passed as response_format to chat.completions.create
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "confident_answer", "strict": True, "schema": ANSWER_SCHEMA},
+}
+
+# Appended to system prompts in structured mode
+STRUCTURED_OUTPUT_INSTRUCTIONS = """
+Respond with a JSON object only:
+- "reasoning": your reasoning process, uncertainties and any verification steps
+- "answer": your final answer
+- "confidence": a number from 0-100
+"""
+
+# How a confidence value was obtained
+SOURCE_JSON = "json"
+SOURCE_TEXT = "text"
+SOURCE_DEFAULT = "default"
+
+
+# [Answer]: ... or [Final Answer]: ... up to the next bracketed section
+_ANSWER_SECTION_RE = re.compile(
+    r"\[(?:final\s+)?answer\]\s*[：:]\s*(.+?)(?=\n\s*\[|\Z)", re.IGNORECASE | re.DOTALL
+)
+_NON_WORD_RE = re.compile(r"[^\w\s./%$-]+")
+
+
+def _answer_section(content: str) -> Optional[str]:
+    """The last [Answer]/[Final Answer] section of a free-text answer, or None"""
+    sections = _ANSWER_SECTION_RE.findall(content or "")
+    return sections[-1].strip() if sections else None
+
+
+def extract_answer_text(content: str) -> str:
+    """The last [Answer]/[Final Answer] section of a free-text answer (whole text if none)"""
+    section = _answer_section(content)
+    return section if section is not None else (content or "").strip()
+
+
+def normalize_answer(text: str) -> str:
+    """Lowercase, drop markdown and punctuation, collapse whitespace"""
+    text = _NON_WORD_RE.sub(" ", text.lower())
+    return " ".join(text.split()).strip(" .")
+
+
+@dataclass
+class ParsedAnswer:
+    """Parsed answer fields"""
+    answer: str
+    confidence: Optional[float]
+    reasoning: Optional[str]
+    source: str  # SOURCE_JSON, SOURCE_TEXT or SOURCE_DEFAULT
+
+
+def parse_answer(content: str) -> ParsedAnswer:
+    """Parse a JSON answer, falling back to free-text extraction"""
+    try:
+        data = json.loads(content)
+    except (TypeError, ValueError):
+        data = None
+
+    if isinstance(data, dict) and isinstance(data.get("confidence"), (int, float)):
+        return ParsedAnswer(
+            answer=str(data.get("answer", "")),
+            confidence=min(100.0, max(0.0, float(data["confidence"]))),
+            reasoning=data.get("reasoning"),
+            source=SOURCE_JSON,
+        )
+
+    confidence = extract_confidence_or_none(content or "")
+    return ParsedAnswer(
+        answer=extract_answer_text(content),
+        confidence=confidence,
+        reasoning=None,
+        source=SOURCE_TEXT if confidence is not None else SOURCE_DEFAULT,
+    )
+
+
+def final_answer_text(content: str) -> Optional[str]:
+    """The stated final answer: the JSON "answer" field or the last [Answer] section (None if neither)"""
+    parsed = parse_answer(content)
+    if parsed.source == SOURCE_JSON:
+        return parsed.answer
+    return _answer_section(content)
+
+
+@dataclass
+class ParseStats:
+    """Counts of parse outcomes, and of verifications caused by parse failures"""
+    json: int = 0
+    text: int = 0
+    default: int = 0
+    verifications: int = 0
+    verifications_from_parse_failure: int = 0
+
+    def record(self, source: str):
+        setattr(self, source, getattr(self, source) + 1)
+
+    @property
+    def failure_rate(self) -> float:
+        """Fraction of parses that fell back to the default confidence"""
+        total = self.json + self.text + self.default
+        return self.default / total if total else 0.0
+
+    def as_dict(self) -> Dict:
+        return {**asdict(self), "failure_rate": self.failure_rate}
@@ -3,11 +3,11 @@ Test questions prone to hallucination
 Choose questions where LLMs might "confidently give wrong answers"
 """
 
-import openai
-import os
 from datetime import datetime
 
-openai.api_key = os.environ.get("OPENAI_API_KEY", "your-api-key-here")
+from llm_client import client_from_env
+
+CLIENT = client_from_env()
 
 MODEL = "gpt-4o-mini"
 
@@ -37,7 +37,7 @@ messages = [
     {"role": "user", "content": TRICKY_QUESTION}
 ]
 
-response = openai.chat.completions.create(
+response = CLIENT.create(
     model=MODEL,
     messages=messages,
     temperature=0.7
@@ -55,7 +55,7 @@ messages.append({
     "content": "Are you sure this method can distinguish all three lights? Please carefully check your logic."
 })
 
-response2 = openai.chat.completions.create(
+response2 = CLIENT.create(
     model=MODEL,
     messages=messages,
     temperature=0.7
@@ -83,7 +83,7 @@ messages_advanced = [
     {"role": "user", "content": TRICKY_QUESTION}
 ]
 
-response_advanced = openai.chat.completions.create(
+response_advanced = CLIENT.create(
     model=MODEL,
     messages=messages_advanced,
     temperature=0.7
@@ -119,7 +119,7 @@ messages_logic = [
     {"role": "user", "content": LOGIC_QUESTION}
 ]
 
-response_logic = openai.chat.completions.create(
+response_logic = CLIENT.create(
     model=MODEL,
     messages=messages_logic,
     temperature=0.7
@@ -136,7 +136,7 @@ messages_logic_reflect = [
     {"role": "user", "content": LOGIC_QUESTION}
 ]
 
-response_logic_reflect = openai.chat.completions.create(
+response_logic_reflect = CLIENT.create(
     model=MODEL,
     messages=messages_logic_reflect,
     temperature=0.7
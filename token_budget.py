@@ -0,0 +1,70 @@
+"""
+Token Budget
+Caps on the tokens a question or a batch of questions may spend.
+
+A TokenBudget is charged with the usage of every response. Budgets nest: a
+per-question budget created under a batch budget charges both, and its
+remaining allowance is the smaller of the two. ConfidenceProtocol checks a
+verification round's estimated cost against the remaining allowance before
+sending it, and skips the round (keeping the answer it has) when it does
+not fit; it never cancels a request in flight, so a budget can be overrun
+by at most one response.
+
+Usage:
+    batch = TokenBudget(50_000)
+    question = TokenBudget(2_000, parent=batch)
+    question.charge(response.usage.total_tokens)
+    if question.can_afford(estimated_tokens): ...
+"""
+
+import threading
+from typing import Dict, List, Optional
+
+from llm_client import estimate_tokens
+
+
+class TokenBudget:
+    """Token allowance, optionally nested in a parent allowance; thread-safe"""
+
+    def __init__(self, limit: Optional[int] = None, parent: Optional["TokenBudget"] = None):
+        """
+        Initialize budget
+
+        Args:
+            limit: Tokens that may be spent (None = no limit of its own)
+            parent: Budget that is charged as well, e.g. the batch a question belongs to
+        """
+        self.limit = limit
+        self.parent = parent
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Tokens left, counting the parents (None = unlimited)"""
+        own = None if self.limit is None else max(0, self.limit - self.spent)
+        inherited = self.parent.remaining if self.parent is not None else None
+        if own is None:
+            return inherited
+        return own if inherited is None else min(own, inherited)
+
+    @property
+    def exhausted(self) -> bool:
+        return self.remaining == 0
+
+    def can_afford(self, tokens: int) -> bool:
+        """Whether an estimated cost fits in what is left"""
+        remaining = self.remaining
+        return remaining is None or tokens <= remaining
+
+    def charge(self, tokens: int):
+        """Record spent tokens here and in every parent"""
+        with self._lock:
+            self.spent += tokens
+        if self.parent is not None:
+            self.parent.charge(tokens)
+
+
+def estimate_prompt_tokens(messages: List[Dict]) -> int:
+    """Rough prompt size of a message list (see llm_client.estimate_tokens)"""
+    return sum(estimate_tokens(m["content"]) for m in messages)
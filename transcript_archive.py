@@ -0,0 +1,326 @@
+"""
+Transcript Archive
+Append-only binary archive of strategy transcripts with random access by
+(run, case id, strategy, round).
+
+Two files:
+
+    <path>      "TRANSCR1" header, then one compact-JSON payload per round
+                ({"messages": [...new turns of the round], "usage": {...}})
+    <path>.idx  one binary index record per round:
+                offset u64 | length u32 | round u32 | case id type u8 (0 str, 1 int) |
+                run, case id, strategy byte lengths u16 each | the three as UTF-8
+
+Rounds store only the turns they add (round 0: system prompt, question and
+first reply; later rounds: challenge and reply), so a conversation is the
+concatenation of its rounds. Data is written before its index record, so
+an interrupted write leaves at most an unindexed tail, which the next
+writer truncates.
+
+TranscriptArchive maps the data file and loads only the index: a lookup is
+a dict hit plus an mmap slice; raw() returns that slice as a zero-copy
+memoryview, round() / conversation() decode just the requested payloads.
+refresh() picks up rounds appended since, so a dashboard can keep an
+archive open while a run writes to it.
+
+Usage:
+    writer = TranscriptWriter("transcripts.bin", run_id="2025-11-13T10:00")
+    engine.run("multi_turn", question, transcript=writer.case(case_id))
+
+    archive = TranscriptArchive("transcripts.bin")
+    messages = archive.conversation("2025-11-13T10:00", 3, "multi_turn")
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+
+MAGIC = b"TRANSCR1"
+INDEX_SUFFIX = ".idx"
+
+# offset, length, round, case id type, run / case id / strategy byte lengths
+_INDEX_HEADER = struct.Struct("<QIIBHHH")
+_CASE_STR = 0
+_CASE_INT = 1
+
+TranscriptKey = Tuple[str, Hashable, str, int]  # (run, case id, strategy, round)
+
+
+def _index_record(key: TranscriptKey, offset: int, length: int) -> bytes:
+    run, case_id, strategy, round_index = key
+    case_type = _CASE_INT if isinstance(case_id, int) else _CASE_STR
+    run, case_id, strategy = (str(value).encode("utf-8") for value in (run, case_id, strategy))
+    return _INDEX_HEADER.pack(offset, length, round_index, case_type,
+                              len(run), len(case_id), len(strategy)) + run + case_id + strategy
+
+
+def _read_index(data: bytes, index: Dict[TranscriptKey, Tuple[int, int]]) -> Tuple[int, int]:
+    """Parse index records into index (key -> (offset, length)); returns (records read, end of the last complete one)"""
+    count = 0
+    position = 0
+    # Runs and strategies repeat in every record: keep one string object each
+    strings: Dict[bytes, str] = {}
+    while position + _INDEX_HEADER.size <= len(data):
+        offset, length, round_index, case_type, run_length, case_length, strategy_length = \
+            _INDEX_HEADER.unpack_from(data, position)
+        run_start = position + _INDEX_HEADER.size
+        case_start = run_start + run_length
+        strategy_start = case_start + case_length
+        end = strategy_start + strategy_length
+        if end > len(data):
+            break
+        run = data[run_start:case_start]
+        strategy = data[strategy_start:end]
+        run = strings.get(run) or strings.setdefault(run, run.decode("utf-8"))
+        strategy = strings.get(strategy) or strings.setdefault(strategy, strategy.decode("utf-8"))
+        case_id = data[case_start:strategy_start]
+        case_id = int(case_id) if case_type == _CASE_INT else case_id.decode("utf-8")
+        index[(run, case_id, strategy, round_index)] = (offset, length)
+        count += 1
+        position = end
+    return count, position
+
+
+def split_rounds(conversation: List[Dict]) -> List[List[Dict]]:
+    """Split a conversation into rounds, each ending with an assistant reply"""
+    rounds = []
+    current = []
+    for message in conversation:
+        current.append(message)
+        if message["role"] == "assistant":
+            rounds.append(current)
+            current = []
+    return rounds
+
+
+class TranscriptWriter:
+    """Appends the rounds of one run to an archive; thread-safe"""
+
+    def __init__(self, path: str, run_id: str, fsync: bool = False):
+        """
+        Open an archive for appending (created if missing)
+
+        Args:
+            path: Archive data file (the index is path + ".idx")
+            run_id: Run the written rounds belong to, e.g. a timestamp
+            fsync: Also fsync after every round (survives power loss, slower)
+        """
+        self.path = path
+        self.run_id = run_id
+        self.fsync = fsync
+        self.rounds_written = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._data = open(path, "ab")
+        self._index = open(path + INDEX_SUFFIX, "ab")
+        self._recover()
+
+    def _recover(self):
+        """Drop an unindexed data tail and a partial index record left by an interrupted write"""
+        index = {}
+        with open(self.path + INDEX_SUFFIX, "rb") as f:
+            _, index_end = _read_index(f.read(), index)
+        self._index.truncate(index_end)
+        data_end = max((offset + length for offset, length in index.values()), default=len(MAGIC))
+        if self._data.seek(0, os.SEEK_END) == 0:
+            self._data.write(MAGIC)
+            self._data.flush()
+        else:
+            self._data.truncate(data_end)
+        self._data.seek(0, os.SEEK_END)
+
+    def record(self, case_id: Hashable, strategy: str, round_index: int,
+               messages: List[Dict], usage: Optional[Dict] = None):
+        """
+        Append one round
+
+        Args:
+            case_id: Case the round belongs to
+            strategy: Strategy name
+            round_index: 0 for the first reply
+            messages: Turns the round added (ending with the reply)
+            usage: RoundUsage.to_dict() of the round
+        """
+        payload = {"messages": messages}
+        if usage is not None:
+            payload["usage"] = usage
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            offset = self._data.tell()
+            self._data.write(data)
+            self._data.flush()
+            if self.fsync:
+                os.fsync(self._data.fileno())
+            # Indexed only once the data is on disk
+            self._index.write(_index_record((self.run_id, case_id, strategy, round_index),
+                                            offset, len(data)))
+            self._index.flush()
+            if self.fsync:
+                os.fsync(self._index.fileno())
+            self.rounds_written += 1
+
+    def record_result(self, case_id: Hashable, result):
+        """Append every round of a StrategyResult (conversation split per round, with its usage)"""
+        for round_index, messages in enumerate(split_rounds(result.conversation)):
+            usage = result.usage[round_index].to_dict() if round_index < len(result.usage) else None
+            self.record(case_id, result.strategy, round_index, messages, usage)
+
+    def case(self, case_id: Hashable) -> "CaseTranscript":
+        """View of this writer for one case, to pass to StrategyEngine.run()"""
+        return CaseTranscript(self, case_id)
+
+    def close(self):
+        with self._lock:
+            for f in (self._data, self._index):
+                if not f.closed:
+                    f.close()
+
+    def __enter__(self) -> "TranscriptWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@dataclass(frozen=True)
+class CaseTranscript:
+    """TranscriptWriter bound to one case id"""
+    writer: TranscriptWriter
+    case_id: Hashable
+
+    def record_result(self, result):
+        self.writer.record_result(self.case_id, result)
+
+
+class TranscriptArchive:
+    """
+    Read side of an archive: memory-mapped data, in-memory index
+
+    Usage:
+        archive = TranscriptArchive("transcripts.bin")
+        for run in archive.runs(): ...
+        archive.round(run, case_id, "multi_turn_aggressive", 2)["usage"]
+    """
+
+    def __init__(self, path: str):
+        """
+        Open an archive
+
+        Args:
+            path: Archive data file written by TranscriptWriter
+        """
+        self.path = path
+        self._index: Dict[TranscriptKey, Tuple[int, int]] = {}
+        # run -> case id -> strategies, in first-seen order; built on first listing call
+        self._tree: Optional[Dict[str, Dict[Hashable, Dict[str, None]]]] = None
+        self._index_end = 0
+        self._file = open(path, "rb")
+        if os.fstat(self._file.fileno()).st_size < len(MAGIC):
+            self._file.close()
+            raise ValueError(f"{path}: not a transcript archive (file too short for the header)")
+        self._data = None
+        # Maps replaced by refresh() that memoryviews from raw() still point into
+        self._retired: List[mmap.mmap] = []
+        self.refresh()
+        if self._data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a transcript archive")
+
+    def refresh(self) -> int:
+        """Load rounds appended since the archive was opened; returns how many were added"""
+        with open(self.path + INDEX_SUFFIX, "rb") as f:
+            f.seek(self._index_end)
+            added, end = _read_index(f.read(), self._index)
+        self._index_end += end
+        if added:
+            self._tree = None
+        size = os.fstat(self._file.fileno()).st_size
+        if self._data is None or len(self._data) < size:
+            if self._data is not None:
+                self._retired.append(self._data)
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._close_retired()
+        return added
+
+    def _close_retired(self):
+        """Close replaced maps, except those still exported through a raw() memoryview"""
+        still_used = []
+        for data in self._retired:
+            try:
+                data.close()
+            except BufferError:
+                still_used.append(data)
+        self._retired = still_used
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: TranscriptKey) -> bool:
+        return key in self._index
+
+    def _listing(self) -> Dict[str, Dict[Hashable, Dict[str, None]]]:
+        if self._tree is None:
+            self._tree = {}
+            for run, case_id, strategy, _ in self._index:
+                self._tree.setdefault(run, {}).setdefault(case_id, {})[strategy] = None
+        return self._tree
+
+    def runs(self) -> List[str]:
+        return list(self._listing())
+
+    def cases(self, run: str) -> List[Hashable]:
+        return list(self._listing().get(run, {}))
+
+    def strategies(self, run: str, case_id: Hashable) -> List[str]:
+        return list(self._listing().get(run, {}).get(case_id, {}))
+
+    def round_count(self, run: str, case_id: Hashable, strategy: str) -> int:
+        count = 0
+        while (run, case_id, strategy, count) in self._index:
+            count += 1
+        return count
+
+    def raw(self, run: str, case_id: Hashable, strategy: str, round_index: int) -> memoryview:
+        """
+        Payload bytes of one round, without copying (KeyError if absent)
+
+        Release the memoryview when done: a map it points into cannot be
+        closed by refresh() or close() while it is alive.
+        """
+        offset, length = self._index[(run, case_id, strategy, round_index)]
+        return memoryview(self._data)[offset:offset + length]
+
+    def round(self, run: str, case_id: Hashable, strategy: str, round_index: int) -> Dict:
+        """One round: {"messages": [...], "usage": {...}}"""
+        offset, length = self._index[(run, case_id, strategy, round_index)]
+        return json.loads(self._data[offset:offset + length])
+
+    def conversation(self, run: str, case_id: Hashable, strategy: str) -> List[Dict]:
+        """Full message list of one strategy run (KeyError if the archive has none)"""
+        count = self.round_count(run, case_id, strategy)
+        if count == 0:
+            raise KeyError((run, case_id, strategy))
+        messages = []
+        for round_index in range(count):
+            messages.extend(self.round(run, case_id, strategy, round_index)["messages"])
+        return messages
+
+    def close(self):
+        """Close the file and its maps (BufferError if a raw() memoryview is still alive)"""
+        self._close_retired()
+        if self._retired:
+            raise BufferError("release the memoryviews returned by raw() before close()")
+        self._data.close()
+        self._file.close()
+
+    def __enter__(self) -> "TranscriptArchive":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -5,13 +5,31 @@ These are legendary puzzles that even humans struggle with.
 Goal: Find where Basic strategy fails and Advanced strategies help.
 """
 
-import openai
-import os
 from datetime import datetime
+from typing import Optional
+
+from llm_client import client_from_env
+from rate_limiter import get_shared_limiter
+from response_cache import cache_from_env
+from run_checkpoint import CaseCheckpoint, RunCheckpoint
+from strategy_registry import StrategyEngine
+from transcript_archive import CaseTranscript, TranscriptWriter
 
-openai.api_key = os.environ.get("OPENAI_API_KEY", "your-key")
 MODEL = "gpt-4o-mini"
 
+# Chat client (set LLM_BACKEND=mock to run offline against recorded answers)
+CLIENT = client_from_env()
+
+# Shared RPM/TPM scheduler (replaces fixed sleeps between cases)
+LIMITER = get_shared_limiter()
+
+# Response cache (set RESPONSE_CACHE_PATH to reuse responses across runs)
+CACHE = cache_from_env()
+
+# Runs the strategies declared in strategy_registry
+ENGINE = StrategyEngine(CLIENT, LIMITER, CACHE, model=MODEL)
+
+
 ULTRA_HARD_CASES = [
     {
         "name": "Cheryl's Birthday",
@@ -107,7 +125,8 @@ Should you switch to door #2? Is this different from the classic Monty Hall prob
     }
 ]
 
-def test_case(question, name):
+def test_case(question, name, checkpoint: Optional[CaseCheckpoint] = None,
+              transcript: Optional[CaseTranscript] = None):
     """Test one case with both strategies"""
     print(f"\n{'='*100}")
     print(f"TEST: {name}")
@@ -119,46 +138,21 @@ def test_case(question, name):
     print("[BASIC STRATEGY]")
     print("-"*100)
     
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": "You are a helpful AI assistant. Think carefully and provide your answer."},
-            {"role": "user", "content": question}
-        ],
-        temperature=0.3  # Lower temperature for more consistent reasoning
-    )
-    basic_answer = response.choices[0].message.content
+    # Lower temperature for more consistent reasoning
+    result = ENGINE.run("basic_careful", question, checkpoint, transcript)
+    basic_answer = result.answer
     print(basic_answer[:500] + "..." if len(basic_answer) > 500 else basic_answer)
-    print(f"\nTokens: {response.usage.total_tokens}")
+    print(f"\nTokens: {result.tokens}")
     
     # Self-Reflection with Strong Prompting
     print(f"\n{'-'*100}")
     print("[ENHANCED SELF-REFLECTION STRATEGY]")
     print("-"*100)
     
-    enhanced_prompt = """You are solving a FAMOUS LOGIC PUZZLE that has tricked many people.
-
-Steps:
-1. What's the naive/obvious answer most people give?
-2. Why is that answer often WRONG?
-3. What subtle logical trap exists?
-4. Work through step-by-step VERY carefully
-5. Check: Does my reasoning have any circular logic or hidden assumptions?
-6. Final answer with confidence and explanation
-
-This puzzle is HARD - take your time and be extra careful!"""
-    
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": enhanced_prompt},
-            {"role": "user", "content": question}
-        ],
-        temperature=0.3
-    )
-    reflection_answer = response.choices[0].message.content
+    result = ENGINE.run("self_reflection_puzzle", question, checkpoint, transcript)
+    reflection_answer = result.answer
     print(reflection_answer[:600] + "..." if len(reflection_answer) > 600 else reflection_answer)
-    print(f"\nTokens: {response.usage.total_tokens}")
+    print(f"\nTokens: {result.tokens}")
     
     return {"basic": basic_answer, "reflection": reflection_answer}
 
@@ -167,22 +161,32 @@ print("="*100)
 print("ULTRA HARD TEST - Famous Logic Puzzles")
 print(f"Model: {MODEL}")
 print(f"Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+# Finished (case, strategy, round) triples; a rerun after an interruption reuses them
+checkpoint = RunCheckpoint("/Users/zeyu/research/ultra_hard_checkpoint.jsonl")
+# Every round's messages, indexed by (run, case name, strategy, round) for later inspection
+transcripts = TranscriptWriter("/Users/zeyu/research/ultra_hard_transcripts.bin",
+                               run_id=datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
+if checkpoint.restored_rounds:
+    print(f"Resuming: {checkpoint.restored_rounds} finished rounds restored from {checkpoint.path}")
 print("="*100)
 
 results = {}
 
 # Test each case
 for case in ULTRA_HARD_CASES[:4]:  # Test first 4 to save tokens
-    results[case['name']] = test_case(case['question'], case['name'])
+    results[case['name']] = test_case(case['question'], case['name'], checkpoint.case(case['name']),
+                                      transcripts.case(case['name']))
     print(f"\n{'*'*100}")
     print(f"CORRECT ANSWER: {case['correct_answer']}")
     print(f"WHY HARD: {case['why_hard']}")
     print(f"{'*'*100}\n")
-    
-    import time
-    time.sleep(2)  # Rate limiting
+
+transcripts.close()
+# Run complete: the next run starts fresh
+checkpoint.clear()
 
 print("\n" + "="*100)
 print("Test complete! Review answers above.")
+print(f"Transcripts: {transcripts.path} (run {transcripts.run_id}, {transcripts.rounds_written} rounds)")
 print("="*100)
 